@@ -0,0 +1,222 @@
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import events
+from hero import Hero
+from map_binary import json_to_binary, open_binary_map
+from maze_engine import MazeEngine
+from policies import POLICIES, PolicyController, ScriptedPolicy, make_policy
+
+DEFAULT_MAX_ROUNDS = 500
+DEATH_CAUSES = ("wall", "fire", "golem", "scared", "attacked")
+
+_worker_maps = {}  # The maps opened by a worker process, by binary file name
+
+
+class MatchSpec:
+    """Settings of one simulated match."""
+
+    def __init__(self, seed: int, hero_names: List[str],
+                 policy: Union[str, Dict[str, List[str]]] = "random",
+                 max_rounds: int = DEFAULT_MAX_ROUNDS, map_file: Optional[str] = None):
+        """
+        Initialize a MatchSpec object.
+
+        Args:
+            seed (int): The seed of the match, used for the fire cells and the policy.
+            hero_names (List[str]): The names of the heroes, all starting on the start cell.
+            policy (str or dict): The name of a built-in policy in POLICIES, or the scripted
+                actions of each hero by name. A hero whose script ran out skips its turns.
+            max_rounds (int): The number of rounds after which the match is stopped.
+            map_file (str, optional): The map of the match, in the JSON or binary format,
+                the map of the batch by default.
+        """
+        self.seed = seed
+        self.hero_names = hero_names
+        self.policy = policy
+        self.max_rounds = max_rounds
+        self.map_file = map_file
+
+
+class MatchResult:
+    """Outcome of one simulated match."""
+
+    def __init__(self, seed: int, winner: Optional[str], rounds: int, deaths: Dict[str, int]):
+        """
+        Initialize a MatchResult object.
+
+        Args:
+            seed (int): The seed of the match.
+            winner (str, optional): The name of the winning hero, None if nobody won.
+            rounds (int): The number of rounds played.
+            deaths (Dict[str, int]): The number of eliminated heroes by cause of death.
+        """
+        self.seed = seed
+        self.winner = winner
+        self.rounds = rounds
+        self.deaths = deaths
+
+    def to_json(self) -> dict:
+        return {
+            "seed": self.seed,
+            "winner": self.winner,
+            "rounds": self.rounds,
+            "deaths": self.deaths,
+        }
+
+
+class BatchResult:
+    """Aggregated outcome of a batch of matches."""
+
+    def __init__(self, matches: List[MatchResult]):
+        """
+        Initialize a BatchResult object.
+
+        Args:
+            matches (List[MatchResult]): The results of the matches.
+        """
+        self.__matches = matches
+
+    @property
+    def matches(self) -> List[MatchResult]:
+        """Get the results of the matches."""
+        return self.__matches
+
+    @property
+    def win_rate(self) -> float:
+        """Get the share of matches won by a hero."""
+        if not self.__matches:
+            return 0.0
+        return sum(match.winner is not None for match in self.__matches) / len(self.__matches)
+
+    @property
+    def mean_rounds(self) -> float:
+        """Get the mean number of rounds to finish a won match."""
+        rounds = [match.rounds for match in self.__matches if match.winner is not None]
+        return sum(rounds) / len(rounds) if rounds else 0.0
+
+    @property
+    def deaths_by_cause(self) -> Dict[str, int]:
+        """Get the number of eliminated heroes by cause of death over all matches."""
+        deaths = Counter({cause: 0 for cause in DEATH_CAUSES})
+        for match in self.__matches:
+            deaths.update(match.deaths)
+        return dict(deaths)
+
+    def to_json(self) -> dict:
+        return {
+            "matches": len(self.__matches),
+            "win_rate": self.win_rate,
+            "mean_rounds_to_win": self.mean_rounds,
+            "deaths_by_cause": self.deaths_by_cause,
+        }
+
+
+def run_batch(map_file: str, specs: Iterable[MatchSpec], processes: Optional[int] = None,
+              chunksize: int = 16) -> BatchResult:
+    """
+    Runs independent matches over a pool of processes.
+
+    Every JSON map is converted to the binary format once. A worker memory-maps each binary map
+    the first time one of its matches plays on it, so the pages are shared through the page cache
+    and each worker only copies the pages its fire cells write to.
+
+    Args:
+        map_file (str): The map of the matches without a map of their own, in the JSON or
+            binary format.
+        specs (Iterable[MatchSpec]): The matches to run.
+        processes (int, optional): The number of worker processes, the CPU count by default.
+        chunksize (int): The number of matches sent to a worker at a time.
+
+    Returns:
+        BatchResult: The aggregated results.
+    """
+    specs = list(specs)
+    binary_files: Dict[str, str] = {}
+    temp_files = []
+    try:
+        for name in {map_file, *(spec.map_file for spec in specs if spec.map_file is not None)}:
+            binary_files[name] = name
+            if os.path.splitext(name)[1].lower() == ".json":
+                descriptor, temp_file = tempfile.mkstemp(suffix=".bin")
+                os.close(descriptor)
+                temp_files.append(temp_file)
+                json_to_binary(name, temp_file)
+                binary_files[name] = temp_file
+
+        jobs = [(binary_files[spec.map_file or map_file], spec) for spec in specs]
+        with multiprocessing.Pool(processes) as pool:
+            matches = list(pool.imap_unordered(_run_match, jobs, chunksize))
+    finally:
+        for temp_file in temp_files:
+            os.remove(temp_file)
+
+    matches.sort(key=lambda match: match.seed)
+    return BatchResult(matches)
+
+
+def _run_match(job: Tuple[str, MatchSpec]) -> MatchResult:
+    """Play one match in a worker process, on a map opened once per worker."""
+    binary_file, spec = job
+    binary_map = _worker_maps.get(binary_file)
+    if binary_map is None:
+        binary_map = _worker_maps[binary_file] = open_binary_map(binary_file)
+    return play_match(binary_map, spec)
+
+
+def play_match(binary_map, spec: MatchSpec) -> MatchResult:
+    """
+    Plays one match headlessly.
+
+    Args:
+        binary_map (BinaryMap): The map to play on.
+        spec (MatchSpec): The settings of the match.
+
+    Returns:
+        MatchResult: The outcome of the match.
+    """
+    engine = MazeEngine(seed=spec.seed)
+    engine.load_binary_map(binary_map)
+    start = engine.maze.find_cell("start") or (0, 0)
+    policy = make_policy(spec.policy, spec.seed) if isinstance(spec.policy, str) else ScriptedPolicy(spec.policy)
+    bots = PolicyController(engine)
+    for name in spec.hero_names:
+        engine.add_hero(Hero(start[0], start[1], name))
+        bots.assign(name, policy)
+
+    winner = None
+    deaths = Counter()
+
+    while not engine.is_over and engine.round_number < spec.max_rounds:
+        for event in bots.play_round():
+            if event.kind == events.WON:
+                winner = event.hero
+            elif event.kind == events.HERO_ELIMINATED and event.data["cause"] is not None:
+                deaths[event.data["cause"]] += 1
+
+    return MatchResult(spec.seed, winner, engine.round_number, dict(deaths))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run matches of bot heroes in parallel")
+    parser.add_argument("map_file", help="map in the JSON or binary format")
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--heroes", type=int, default=2)
+    parser.add_argument("--policy", choices=POLICIES, default="random")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    names = [str(i + 1) for i in range(args.heroes)]
+    batch = run_batch(
+        args.map_file,
+        (MatchSpec(args.seed + i, names, args.policy, args.max_rounds) for i in range(args.matches)),
+        args.processes,
+    )
+    print(json.dumps(batch.to_json(), indent=2))
@@ -0,0 +1,405 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+from cell import Cell
+from hero import Hero
+from instrumentation import Metrics
+from item import Item
+from map_stream import MapStreamReader
+from maze import Maze
+from maze_engine import MazeEngine
+from maze_generator import generate_maze
+
+# Maze size in generator cells and number of heroes of each scale
+SCALES = {
+    "small": {"cells": 25, "heroes": 10},
+    "medium": {"cells": 100, "heroes": 100},
+    "large": {"cells": 300, "heroes": 1000},
+}
+DEFAULT_REPEATS = 5
+DEFAULT_ROUNDS = 20
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown against the baseline before a regression is flagged
+DEFAULT_MIN_SECONDS = 0.001  # Shorter baseline timings are dominated by noise and never compared
+LOOKUPS = 100_000
+FIRE_ROUNDS = 1000
+MEMORY_OBJECTS = 10_000
+
+MOVES = ("l", "r", "u", "d")
+OPPOSITE = {"l": "r", "r": "l", "u": "d", "d": "u"}
+STEPS = {"l": (-1, 0), "r": (1, 0), "u": (0, -1), "d": (0, 1)}
+
+
+class BenchmarkResult:
+    """Timing of one benchmark at one scale."""
+
+    def __init__(self, name: str, scale: str, seconds: float, operations: int, unit: str):
+        """
+        Initialize a BenchmarkResult object.
+
+        Args:
+            name (str): The name of the benchmark.
+            scale (str): The name of the scale.
+            seconds (float): The best time of a repeat.
+            operations (int): The number of operations in a repeat.
+            unit (str): The name of an operation, such as "rounds".
+        """
+        self.name = name
+        self.scale = scale
+        self.seconds = seconds
+        self.operations = operations
+        self.unit = unit
+
+    @property
+    def key(self) -> str:
+        """Get the name of the benchmark and scale, unique in a run."""
+        return f"{self.name}[{self.scale}]"
+
+    @property
+    def per_second(self) -> float:
+        """Get the number of operations per second."""
+        return self.operations / self.seconds if self.seconds > 0 else 0.0
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "scale": self.scale,
+            "seconds": self.seconds,
+            "operations": self.operations,
+            "unit": self.unit,
+            "per_second": self.per_second,
+        }
+
+
+class Regression:
+    """A benchmark slower than its baseline."""
+
+    def __init__(self, key: str, baseline_seconds: float, seconds: float):
+        """
+        Initialize a Regression object.
+
+        Args:
+            key (str): The key of the benchmark.
+            baseline_seconds (float): The time in the baseline.
+            seconds (float): The time in the current run.
+        """
+        self.key = key
+        self.baseline_seconds = baseline_seconds
+        self.seconds = seconds
+
+    @property
+    def slowdown(self) -> float:
+        """Get the relative slowdown, 0.5 for 50% slower."""
+        return self.seconds / self.baseline_seconds - 1
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.baseline_seconds:.6f}s -> {self.seconds:.6f}s (+{self.slowdown:.0%})"
+
+
+def measure(function: Callable[[], None], repeats: int = DEFAULT_REPEATS,
+            setup: Optional[Callable[[], None]] = None) -> float:
+    """
+    Times a function, keeping the best of several repeats as timeit does.
+
+    Args:
+        function (callable): The code to time.
+        repeats (int): The number of repeats.
+        setup (callable, optional): Called before every repeat, not timed.
+
+    Returns:
+        float: The best time in seconds.
+    """
+    return min(measure_repeats(function, repeats, setup))
+
+
+def measure_repeats(function: Callable[[], None], repeats: int = DEFAULT_REPEATS,
+                    setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """
+    Times every repeat of a function.
+
+    Args:
+        function (callable): The code to time.
+        repeats (int): The number of repeats.
+        setup (callable, optional): Called before every repeat, not timed.
+
+    Returns:
+        List[float]: The time of each repeat in seconds, in order.
+    """
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def spawn_heroes(maze: Maze, count: int, rng: random.Random) -> List[Hero]:
+    """
+    Creates heroes on random passage cells.
+
+    Args:
+        maze (Maze): The maze.
+        count (int): The number of heroes.
+        rng (random.Random): The source of the positions.
+
+    Returns:
+        List[Hero]: The heroes, named by their index.
+    """
+    passages = maze.find_cells("passage")
+    return [Hero(*rng.choice(passages), str(i + 1)) for i in range(count)]
+
+
+def wander(maze: Maze, hero: Hero, rng: random.Random) -> str:
+    """
+    Picks a random move that neither hits a wall nor turns back, so heroes live long enough
+    to keep the rounds full.
+
+    Args:
+        maze (Maze): The maze.
+        hero (Hero): The hero.
+        rng (random.Random): The source of the moves.
+
+    Returns:
+        str: The direction to move in.
+    """
+    moves = []
+    for move in MOVES:
+        if move == OPPOSITE.get(hero.old_direction):
+            continue
+        x, y = hero.x + STEPS[move][0], hero.y + STEPS[move][1]
+        if 0 <= x < maze.width and 0 <= y < maze.height and maze.get_cell_type(x, y) != "wall":
+            moves.append(move)
+    return rng.choice(moves) if moves else rng.choice(MOVES)
+
+
+def run_scale(scale: str, repeats: int = DEFAULT_REPEATS, rounds: int = DEFAULT_ROUNDS,
+              seed: int = 0) -> List[BenchmarkResult]:
+    """
+    Runs every benchmark on a synthetic map and hero population.
+
+    Args:
+        scale (str): The name of a scale in SCALES.
+        repeats (int): The number of repeats of each benchmark.
+        rounds (int): The number of rounds of the round benchmark.
+        seed (int): The seed of the map, the heroes and their moves.
+
+    Returns:
+        List[BenchmarkResult]: The results.
+    """
+    cells = SCALES[scale]["cells"]
+    hero_count = SCALES[scale]["heroes"]
+    maze, items = generate_maze(cells, cells, seed=seed, extra_passages=cells, hearts=cells)
+    tiles = maze.width * maze.height
+    results = []
+
+    def add(name: str, seconds: float, operations: int, unit: str):
+        results.append(BenchmarkResult(name, scale, seconds, operations, unit))
+
+    descriptor, map_file = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(descriptor, "w") as file:
+        file.write(maze.to_json())
+    rows = json.loads(maze.to_json())["game_map"]
+    try:
+        add("load_map_from_json", measure(lambda: Maze().load_map_from_json(rows), repeats), tiles, "cells")
+        add("load_map_from_file",
+            measure(lambda: Maze().load_map_from_json(MapStreamReader(map_file).rows()), repeats),
+            tiles, "cells")
+
+        add("to_json", measure(maze.to_json, repeats), tiles, "cells")
+        cold_maze = Maze()
+        add("to_json_cold",
+            measure(cold_maze.to_json, repeats, lambda: cold_maze.load_grid(maze.width, maze.height, maze.grid)),
+            tiles, "cells")
+
+        def burn_rows():
+            maze.init_fire_cells()
+            maze.put_out_fire_cell()
+
+        add("to_json_dirty", measure(maze.to_json, repeats, burn_rows), tiles, "cells")
+
+        rng = random.Random(seed)
+        engine = MazeEngine(spawn_heroes(maze, hero_count, rng), maze, seed)
+        engine.set_items(items)
+        add("save_json", measure(lambda: engine.save_json(map_file), repeats), tiles + hero_count, "objects")
+
+        def fire_rounds():
+            for _ in range(FIRE_ROUNDS):
+                maze.init_fire_cells()
+                maze.put_out_fire_cell()
+
+        add("fire_cells", measure(fire_rounds, repeats), FIRE_ROUNDS, "rounds")
+
+        positions = [(rng.randrange(maze.width), rng.randrange(maze.height)) for _ in range(LOOKUPS)]
+
+        def lookups():
+            objects_at = engine.objects_at
+            for position in positions:
+                objects_at(position)
+
+        add("object_lookup", measure(lookups, repeats), LOOKUPS, "lookups")
+    finally:
+        os.remove(map_file)
+
+    played = []  # Rounds and hero moves of each repeat
+    engines = []
+    metrics = [None]
+
+    def setup_round():
+        move_rng = random.Random(seed)
+        round_engine = MazeEngine(spawn_heroes(maze, hero_count, move_rng), maze, seed, metrics[0])
+        round_engine.set_items(items)
+        engines[:] = [(round_engine, move_rng)]
+
+    def play_rounds():
+        round_engine, move_rng = engines[0]
+        played_rounds = moves = 0
+        for _ in range(rounds):
+            if round_engine.is_over:
+                break
+            played_rounds += 1
+            moves += len(round_engine.heroes)
+            round_engine.play_round(lambda hero: wander(maze, hero, move_rng))
+        played.append((played_rounds, moves))
+
+    def add_rounds(name: str):
+        played.clear()
+        times = measure_repeats(play_rounds, repeats, setup_round)
+        best = times.index(min(times))
+        played_rounds, moves = played[best]
+        add(name, times[best], played_rounds, "rounds")
+        return times[best], moves
+
+    seconds, moves = add_rounds("rounds")
+    add("hero_moves", seconds, moves, "moves")
+
+    metrics[0] = Metrics()
+    add_rounds("rounds_instrumented")
+    return results
+
+
+def measure_memory(count: int = MEMORY_OBJECTS) -> dict:
+    """
+    Measures the memory of game objects and the allocations of reading positions.
+
+    Args:
+        count (int): The number of objects created of each class.
+
+    Returns:
+        dict: The bytes per object of each class, and the memory blocks allocated by reading
+        the position of a hero, kept alive so they can be counted.
+    """
+    names = [str(i) for i in range(count)]  # Hero names are created before measuring
+    factories = {
+        "hero": lambda i: Hero(i % 200, i % 100, names[i]),
+        "item": lambda i: Item(i % 200, i % 100, "key"),
+        "cell": lambda i: Cell(i % 200, i % 100, "passage"),
+    }
+    report = {}
+    for name, factory in factories.items():
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        objects = [factory(i) for i in range(count)]
+        report[f"{name}_bytes"] = (tracemalloc.get_traced_memory()[0] - start - sys.getsizeof(objects)) / count
+        tracemalloc.stop()
+        del objects
+    del names
+
+    hero = Hero(1, 1, "hero")
+    positions = [None] * count
+    blocks = sys.getallocatedblocks()
+    for i in range(count):
+        positions[i] = hero.position
+    report["position_read_blocks"] = (sys.getallocatedblocks() - blocks) / count
+    return report
+
+
+def run_benchmarks(scales: List[str], repeats: int = DEFAULT_REPEATS, rounds: int = DEFAULT_ROUNDS,
+                   seed: int = 0) -> dict:
+    """
+    Runs the benchmarks at several scales.
+
+    Args:
+        scales (List[str]): The names of the scales.
+        repeats (int): The number of repeats of each benchmark.
+        rounds (int): The number of rounds of the round benchmark.
+        seed (int): The seed of the maps, the heroes and their moves.
+
+    Returns:
+        dict: The report, with the results by key.
+    """
+    results = {}
+    for scale in scales:
+        for result in run_scale(scale, repeats, rounds, seed):
+            results[result.key] = result.to_json()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeats": repeats,
+        "results": results,
+        "memory": measure_memory(),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE,
+            min_seconds: float = DEFAULT_MIN_SECONDS) -> List[Regression]:
+    """
+    Finds the benchmarks slower than a baseline report.
+
+    Benchmarks missing from either report are ignored, and so are benchmarks faster than
+    min_seconds in the baseline, whose timings vary by more than the tolerance from run to run.
+
+    Args:
+        report (dict): The current report.
+        baseline (dict): The baseline report.
+        tolerance (float): The allowed relative slowdown.
+        min_seconds (float): The shortest baseline time compared.
+
+    Returns:
+        List[Regression]: The regressions.
+    """
+    regressions = []
+    for key, result in report["results"].items():
+        base = baseline["results"].get(key)
+        if base is None or base["seconds"] < min_seconds:
+            continue
+        if result["seconds"] > base["seconds"] * (1 + tolerance):
+            regressions.append(Regression(key, base["seconds"], result["seconds"]))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the Maze Game")
+    parser.add_argument("--scales", nargs="+", choices=SCALES, default=["small", "medium"])
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON report to, stdout by default")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help="shortest baseline time compared, shorter benchmarks are too noisy")
+    args = parser.parse_args()
+
+    benchmark_report = run_benchmarks(args.scales, args.repeats, args.rounds, args.seed)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(benchmark_report, output, indent=2)
+    else:
+        print(json.dumps(benchmark_report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = compare(benchmark_report, json.load(baseline_file), args.tolerance, args.min_seconds)
+        for regression in found:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if found else 0)
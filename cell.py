@@ -2,9 +2,12 @@ from game_object import GameObject
 
 
 class Cell(GameObject):
-    def __init__(self, x: int, y: int, cell_type: str):
+    __slots__ = ("__cell_type", "__maze")
+
+    def __init__(self, x: int, y: int, cell_type: str, maze=None):
         super().__init__(x, y, "cell")
         self.__cell_type = cell_type
+        self.__maze = maze
 
     @property
     def cell_type(self) -> str:
@@ -13,6 +16,8 @@ class Cell(GameObject):
     @cell_type.setter
     def cell_type(self, cell_type: str):
         self.__cell_type = cell_type
+        if self.__maze is not None:
+            self.__maze.set_cell_type(self._position[0], self._position[1], cell_type)
 
     def to_json(self) -> dict:
         json_str_data = super().to_json()
@@ -0,0 +1,162 @@
+from typing import Dict, List
+
+# Registry of the cell types and item types of the game. A cell type is stored in the grid as
+# its byte code, the index of its name in CELL_TYPES, and the tables below give the behaviour
+# of every code, so the engine resolves a move with a lookup instead of comparing names.
+# Names are only parsed when a map is loaded and written when it is saved. The tables are
+# lists that grow when a type is registered, so modules importing them always see new types.
+MAX_CELL_TYPES = 256  # Codes are stored in one byte
+
+
+class CellType:
+    """Behaviour of the cells of one type."""
+
+    def __init__(self, code: int, name: str, passable: bool = True, damage: int = 0,
+                 turn_back: bool = False, wins: bool = False):
+        """
+        Initialize a CellType object.
+
+        Args:
+            code (int): The byte code of the type in the grid.
+            name (str): The name of the type in map files, also the cause of the damage it deals.
+            passable (bool): False if heroes bounce back instead of entering the cell.
+            damage (int): The health a hero loses when moving into the cell.
+            turn_back (bool): True if heroes may turn back when leaving the cell. Moves into
+                or out of such a cell do not change the last direction of a hero.
+            wins (bool): True if a hero carrying a key wins when entering the cell, a hero
+                without one is killed.
+        """
+        self.code = code
+        self.name = name
+        self.passable = passable
+        self.damage = damage
+        self.turn_back = turn_back
+        self.wins = wins
+
+    def __repr__(self) -> str:
+        return f"CellType({self.code}, {self.name!r})"
+
+
+class ItemType:
+    """Behaviour of the items with one name."""
+
+    def __init__(self, code: int, name: str, pickable: bool = False, heals: bool = False,
+                 opens_end: bool = False):
+        """
+        Initialize an ItemType object.
+
+        Args:
+            code (int): The code of the type.
+            name (str): The name of the items.
+            pickable (bool): True if heroes can put the item in their pocket.
+            heals (bool): True if the item restores the health of heroes meeting it.
+            opens_end (bool): True if a hero carrying the item wins on the end cell.
+        """
+        self.code = code
+        self.name = name
+        self.pickable = pickable
+        self.heals = heals
+        self.opens_end = opens_end
+
+    def __repr__(self) -> str:
+        return f"ItemType({self.code}, {self.name!r})"
+
+
+CELL_TYPES: List[str] = []  # Names of the cell types, the index of a name is its code
+CELL_CODES: Dict[str, int] = {}
+CELL_BEHAVIOURS: List[CellType] = []
+
+# Behaviour tables indexed by cell code
+PASSABLE: List[bool] = []
+DAMAGE: List[int] = []
+TURN_BACK: List[bool] = []
+WINS: List[bool] = []
+
+ITEM_TYPES: Dict[str, ItemType] = {}
+UNKNOWN_ITEM_TYPE = ItemType(-1, "unknown")  # Shared by the items of every unregistered name
+
+
+def register_cell_type(name: str, passable: bool = True, damage: int = 0, turn_back: bool = False,
+                       wins: bool = False) -> int:
+    """
+    Adds a cell type to the registry.
+
+    Register new types before loading maps that use them. Map files store the names of
+    their types, so files written before a type was added still load.
+
+    Args:
+        name (str): The name of the type.
+        passable (bool): False if heroes bounce back instead of entering the cell.
+        damage (int): The health a hero loses when moving into the cell.
+        turn_back (bool): True if heroes may turn back when leaving the cell.
+        wins (bool): True if the cell is an exit for heroes carrying a key.
+
+    Returns:
+        int: The code of the type.
+
+    Raises:
+        ValueError: If the name is taken or every code is used.
+    """
+    if name in CELL_CODES:
+        raise ValueError(f"Cell type {name} is already registered")
+    if len(CELL_TYPES) >= MAX_CELL_TYPES:
+        raise ValueError(f"No cell code left for {name}")
+
+    code = len(CELL_TYPES)
+    CELL_TYPES.append(name)
+    CELL_CODES[name] = code
+    CELL_BEHAVIOURS.append(CellType(code, name, passable, damage, turn_back, wins))
+    PASSABLE.append(passable)
+    DAMAGE.append(damage)
+    TURN_BACK.append(turn_back)
+    WINS.append(wins)
+    return code
+
+
+def register_item_type(name: str, pickable: bool = False, heals: bool = False,
+                       opens_end: bool = False) -> ItemType:
+    """
+    Adds an item type to the registry.
+
+    Args:
+        name (str): The name of the items.
+        pickable (bool): True if heroes can put the item in their pocket.
+        heals (bool): True if the item restores the health of heroes meeting it.
+        opens_end (bool): True if a hero carrying the item wins on the end cell.
+
+    Returns:
+        ItemType: The type.
+
+    Raises:
+        ValueError: If the name is taken.
+    """
+    if name in ITEM_TYPES:
+        raise ValueError(f"Item type {name} is already registered")
+    item_type = ItemType(len(ITEM_TYPES), name, pickable, heals, opens_end)
+    ITEM_TYPES[name] = item_type
+    return item_type
+
+
+def item_type(name: str) -> ItemType:
+    """
+    Get the type of the items with a name.
+
+    Args:
+        name (str): The name of the item.
+
+    Returns:
+        ItemType: The registered type, UNKNOWN_ITEM_TYPE without behaviour for unknown names.
+    """
+    return ITEM_TYPES.get(name, UNKNOWN_ITEM_TYPE)
+
+
+# The codes of the built-in types are part of the binary formats, keep their order
+WALL = register_cell_type("wall", passable=False, damage=1)
+PASSAGE = register_cell_type("passage")
+EXTRA_PASSAGE = register_cell_type("extra_passage", turn_back=True)
+FIRE = register_cell_type("fire", damage=1)
+END = register_cell_type("end", wins=True)
+START = register_cell_type("start")
+
+KEY = register_item_type("key", pickable=True, opens_end=True)
+HEART = register_item_type("heart", heals=True)
@@ -0,0 +1,412 @@
+import random
+import struct
+import tempfile
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from cell import Cell
+from map_binary import open_binary_map, pack_name, read_items, read_name, write_items
+from cell_types import CELL_CODES, CELL_TYPES, FIRE, PASSAGE, WALL
+from maze import FIRE_CELLS_COUNT
+
+# File layout, all numbers little-endian:
+#   header      magic, version, cell type count, width, height, chunk size, offset of the chunks
+#   type table  for each cell type: name length (u8) and utf-8 name, the index is its code
+#   chunks      chunk size x chunk size bytes each, in row-major chunk order, tiles of a chunk
+#               in row-major order, tiles past the edge of the map are walls
+#   items       the item table of the binary map format
+MAGIC = b"MAZC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIHQ")
+CHUNK_ALIGNMENT = 4096
+DEFAULT_CHUNK_SIZE = 64
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # Bytes of chunks kept in memory
+FIRE_SAMPLING_ATTEMPTS = 1000  # Random tiles tried per fire cell before giving up
+
+
+def write_chunked_map(file_name: str, width: int, height: int, grid, items: List[dict],
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    Writes a map in the chunked format.
+
+    The grid is read one band of chunk_size rows at a time, so a memory-mapped grid never
+    has to fit in memory.
+
+    Args:
+        file_name (str): The name of the chunked file.
+        width (int): The width of the map.
+        height (int): The height of the map.
+        grid: The cell type codes of the map, indexed by y * width + x.
+        items (List[dict]): The items of the map as dictionaries with x, y and name.
+        chunk_size (int): The number of tiles on a side of a chunk.
+    """
+    type_table = b"".join(pack_name(cell_type) for cell_type in CELL_TYPES)
+    header_size = HEADER.size + len(type_table)
+    chunks_offset = -(-header_size // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT
+    chunks_x = -(-width // chunk_size)
+
+    with open(file_name, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(CELL_TYPES), width, height, chunk_size, chunks_offset))
+        f.write(type_table)
+        f.write(bytes(chunks_offset - header_size))
+
+        padded_width = chunks_x * chunk_size
+        for band_y in range(0, height, chunk_size):
+            band = bytearray((WALL,)) * (padded_width * chunk_size)
+            for row in range(min(chunk_size, height - band_y)):
+                start = (band_y + row) * width
+                band[row * padded_width:row * padded_width + width] = grid[start:start + width]
+            for chunk_x in range(chunks_x):
+                for row in range(chunk_size):
+                    start = row * padded_width + chunk_x * chunk_size
+                    f.write(band[start:start + chunk_size])
+
+        write_items(f, items)
+
+
+def binary_to_chunked(binary_file: str, chunked_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    Converts a map in the binary format to the chunked format.
+
+    Args:
+        binary_file (str): The name of the binary file.
+        chunked_file (str): The name of the chunked file to write.
+        chunk_size (int): The number of tiles on a side of a chunk.
+    """
+    binary_map = open_binary_map(binary_file)
+    write_chunked_map(chunked_file, binary_map.width, binary_map.height, binary_map.grid,
+                      binary_map.items, chunk_size)
+
+
+class ChunkedMaze:
+    """A maze read from disk in square chunks kept in a least recently used cache.
+
+    It offers the methods of Maze that MazeEngine uses, so a game can run on a map larger
+    than memory: only the chunks around the heroes are loaded, and changed chunks are written
+    to a scratch file of the game when they are evicted. The map file is only read, so games
+    sharing it never see each other's fire. Whole-grid features such as snapshots, to_json
+    and NumPy rounds need a Maze.
+    """
+
+    def __init__(self, file_name: str, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 fire_cells_count: int = FIRE_CELLS_COUNT, seed: Optional[int] = None):
+        """
+        Initialize a ChunkedMaze object.
+
+        Args:
+            file_name (str): The name of the chunked map file, opened for reading only.
+            memory_budget (int): The number of bytes of chunks kept in memory.
+            fire_cells_count (int): The number of cells set on fire every round.
+            seed (int, optional): The seed of the fire cells, random by default.
+        """
+        self.__file = open(file_name, "rb")
+        try:
+            magic, version, type_count, width, height, chunk_size, chunks_offset = \
+                HEADER.unpack(self.__file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{file_name} is not a chunked maze map")
+            if version != VERSION:
+                raise ValueError(f"{file_name} has unsupported version {version}")
+            if [read_name(self.__file) for _ in range(type_count)] != list(CELL_TYPES[:type_count]):
+                raise ValueError(f"{file_name} has a different cell type table")
+        except Exception:
+            self.__file.close()
+            raise
+
+        self.__width = width
+        self.__height = height
+        self.__chunk_size = chunk_size
+        self.__chunk_bytes = chunk_size * chunk_size
+        self.__chunks_x = -(-width // chunk_size)
+        self.__chunks_offset = chunks_offset
+        self.__max_chunks = max(1, memory_budget // self.__chunk_bytes)
+
+        self.__chunks = OrderedDict()  # Chunk number to its tiles, least recently used first
+        self.__dirty = set()  # Chunk numbers changed since they were read
+        self.__scratch = None  # Temporary file of the changed chunks, created on the first write-back
+        self.__scratch_chunks = set()  # Chunk numbers kept in the scratch file
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__write_backs = 0
+
+        self.__file.seek(chunks_offset + self.__chunks_x * -(-height // chunk_size) * self.__chunk_bytes)
+        self.__items = read_items(self.__file)
+
+        self.__coord_fire_cells = []
+        self.__fire_cells_count = fire_cells_count
+        self.__random = random.Random(seed)
+        self.__change_listeners = []
+        self.__version = 0
+
+    @property
+    def items(self) -> List[dict]:
+        """Get the items of the map as dictionaries with x, y and name."""
+        return self.__items
+
+    @property
+    def width(self) -> int:
+        """Get the width of the maze."""
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        """Get the height of the maze."""
+        return self.__height
+
+    @property
+    def version(self) -> int:
+        """Get a number that changes whenever a cell of the maze changes."""
+        return self.__version
+
+    @property
+    def coord_fire_cells(self) -> List[tuple]:
+        """Get the coordinates of fire cells."""
+        return self.__coord_fire_cells
+
+    @property
+    def fire_cells_count(self) -> int:
+        """Get the number of cells set on fire every round."""
+        return self.__fire_cells_count
+
+    @fire_cells_count.setter
+    def fire_cells_count(self, fire_cells_count: int):
+        self.__fire_cells_count = fire_cells_count
+
+    @property
+    def cache_stats(self) -> dict:
+        """Get the counters of the chunk cache."""
+        return {
+            "loaded_chunks": len(self.__chunks),
+            "max_chunks": self.__max_chunks,
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "evictions": self.__evictions,
+            "write_backs": self.__write_backs,
+        }
+
+    def seed(self, seed: Optional[int]):
+        """Reseed the random choice of fire cells.
+
+        Args:
+            seed (int, optional): The new seed, None for a random one.
+        """
+        self.__random.seed(seed)
+
+    @property
+    def random_state(self) -> tuple:
+        """Get the state of the random choice of fire cells, as returned by random.getstate."""
+        return self.__random.getstate()
+
+    @random_state.setter
+    def random_state(self, state: tuple):
+        self.__random.setstate(state)
+
+    def get_cell(self, x_or_position, y=None) -> Cell:
+        """Get the cell at the specified position, changing its type updates the maze.
+
+        Args:
+            x_or_position (int or tuple): The x coordinate of the cell or its position as a tuple.
+            y (int, optional): The y coordinate of the cell.
+
+        Returns:
+            Cell: The cell at the specified position.
+        """
+        if y is None:
+            x, y = x_or_position[0], x_or_position[1]
+        else:
+            x = x_or_position
+        return Cell(x, y, self.get_cell_type(x, y), self)
+
+    def get_cell_type(self, x: int, y: int) -> str:
+        """Get the type of the cell at the specified position.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+
+        Returns:
+            str: The type of the cell.
+        """
+        chunk_number, offset = self.__locate(x, y)
+        return CELL_TYPES[self.__chunk(chunk_number)[offset]]
+
+    def get_cell_code(self, x: int, y: int) -> int:
+        """Get the code of the type of the cell at the specified position.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+
+        Returns:
+            int: The code of the type, see cell_types.
+        """
+        chunk_number, offset = self.__locate(x, y)
+        return self.__chunk(chunk_number)[offset]
+
+    def set_cell_type(self, x: int, y: int, cell_type: str):
+        """Change the type of the cell at the specified position.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+            cell_type (str): The new type of the cell.
+        """
+        self.set_cell_code(x, y, CELL_CODES[cell_type])
+
+    def set_cell_code(self, x: int, y: int, code: int):
+        """Change the type of the cell at the specified position to the type with a code.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+            code (int): The code of the new type.
+        """
+        chunk_number, offset = self.__locate(x, y)
+        self.__chunk(chunk_number)[offset] = code
+        self.__dirty.add(chunk_number)
+        self.__version += 1
+        for listener in self.__change_listeners:
+            listener(y * self.__width + x)
+
+    def add_change_listener(self, listener: Callable[[int], None]):
+        """Register a function called with the grid index of every cell whose type changes.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        self.__change_listeners.append(listener)
+
+    def remove_change_listener(self, listener: Callable[[int], None]):
+        """Unregister a function added with add_change_listener.
+
+        Args:
+            listener (callable): The function to remove.
+        """
+        self.__change_listeners.remove(listener)
+
+    def find_cell(self, cell_type: str) -> Optional[tuple]:
+        """Find the first cell of a type, scanning rows from the top.
+
+        Chunks are read straight from the file without entering the cache.
+
+        Args:
+            cell_type (str): The type of the cell, such as "start".
+
+        Returns:
+            tuple: The position of the cell, None if the maze has none.
+        """
+        code = bytes((CELL_CODES[cell_type],))
+        size = self.__chunk_size
+        for chunk_y in range(-(-self.__height // size)):
+            found = []
+            for chunk_x in range(self.__chunks_x):
+                chunk_number = chunk_y * self.__chunks_x + chunk_x
+                chunk = self.__chunks.get(chunk_number) or self.__read_chunk(chunk_number)
+                offset = chunk.find(code)
+                while offset != -1:
+                    x, y = chunk_x * size + offset % size, chunk_y * size + offset // size
+                    if x < self.__width and y < self.__height:
+                        found.append((y, x))
+                        break
+                    offset = chunk.find(code, offset + 1)
+            if found:
+                y, x = min(found)
+                return x, y
+        return None
+
+    def init_fire_cells(self):
+        """Set random passage cells on fire.
+
+        Tiles of the whole map are drawn from the seed until passages are hit, reading their
+        chunks when needed, so a seed gives the same fire cells whatever chunks are in memory.
+        Maps with very few passages may get fewer fire cells.
+        """
+        attempts = self.__fire_cells_count * FIRE_SAMPLING_ATTEMPTS
+        while len(self.__coord_fire_cells) < self.__fire_cells_count and attempts > 0:
+            attempts -= 1
+            x = self.__random.randrange(self.__width)
+            y = self.__random.randrange(self.__height)
+            if self.get_cell_code(x, y) == PASSAGE:
+                self.set_cell_code(x, y, FIRE)
+                self.__coord_fire_cells.append((x, y))
+
+    def put_out_fire_cell(self):
+        """Remove fire cells from the maze."""
+        for x, y in self.__coord_fire_cells:
+            self.set_cell_code(x, y, PASSAGE)
+
+        self.__coord_fire_cells.clear()
+
+    def set_fire_cells(self, coords: List[tuple]):
+        """Replace the coordinates of fire cells.
+
+        Args:
+            coords (List[tuple]): The coordinates of the fire cells.
+        """
+        self.__coord_fire_cells = [tuple(coord) for coord in coords]
+
+    def flush(self):
+        """Write every changed chunk to the scratch file."""
+        for chunk_number in sorted(self.__dirty):
+            self.__write_chunk(chunk_number, self.__chunks[chunk_number])
+        self.__dirty.clear()
+
+    def close(self):
+        """Close the map file and drop the changes of the game."""
+        self.__file.close()
+        if self.__scratch is not None:
+            self.__scratch.close()
+
+    def __enter__(self) -> "ChunkedMaze":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __locate(self, x: int, y: int) -> tuple:
+        """Get the chunk number and the offset in the chunk of a position."""
+        if not (0 <= x < self.__width and 0 <= y < self.__height):
+            raise IndexError(f"Position {(x, y)} is outside the maze")
+        size = self.__chunk_size
+        return (y // size) * self.__chunks_x + x // size, (y % size) * size + x % size
+
+    def __chunk(self, chunk_number: int) -> bytearray:
+        """Get a chunk from the cache, reading it and evicting the oldest one when needed."""
+        chunk = self.__chunks.get(chunk_number)
+        if chunk is not None:
+            self.__hits += 1
+            self.__chunks.move_to_end(chunk_number)
+            return chunk
+
+        self.__misses += 1
+        if len(self.__chunks) >= self.__max_chunks:
+            old_number, old_chunk = self.__chunks.popitem(last=False)
+            self.__evictions += 1
+            if old_number in self.__dirty:
+                self.__dirty.discard(old_number)
+                self.__write_chunk(old_number, old_chunk)
+
+        chunk = self.__read_chunk(chunk_number)
+        self.__chunks[chunk_number] = chunk
+        return chunk
+
+    def __read_chunk(self, chunk_number: int) -> bytearray:
+        """Read a chunk from the scratch file if the game changed it, from the map file otherwise."""
+        chunk = bytearray(self.__chunk_bytes)
+        if chunk_number in self.__scratch_chunks:
+            self.__scratch.seek(chunk_number * self.__chunk_bytes)
+            self.__scratch.readinto(chunk)
+        else:
+            self.__file.seek(self.__chunks_offset + chunk_number * self.__chunk_bytes)
+            self.__file.readinto(chunk)
+        return chunk
+
+    def __write_chunk(self, chunk_number: int, chunk: bytearray):
+        """Write a changed chunk to the scratch file."""
+        if self.__scratch is None:
+            self.__scratch = tempfile.TemporaryFile()
+        self.__write_backs += 1
+        self.__scratch.seek(chunk_number * self.__chunk_bytes)
+        self.__scratch.write(chunk)
+        self.__scratch_chunks.add(chunk_number)
@@ -0,0 +1,321 @@
+import os
+import struct
+import sys
+from array import array
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from cell_types import (CELL_BEHAVIOURS, CELL_CODES, ITEM_TYPES, MAX_CELL_TYPES, register_cell_type,
+                        register_item_type)
+from map_binary import pack_name, read_exact, read_items, read_name, write_items
+from maze import Maze, build_passage_slots
+
+if TYPE_CHECKING:
+    # Imported on first use, so a worker starting a game from a compiled map only loads this
+    # module, the map format and the maze
+    from map_validator import ConnectivityIndex
+    from pathfinding import PathFinder
+
+# A compiled map holds a validated map, its derived data and the rules it was compiled with,
+# so a worker process starts a game from it without parsing, hashing, scanning or validating.
+# All numbers are little-endian:
+#   header      magic, version, key, width, height, cell type count, item type count,
+#               passage count, component count
+#   cell types  for each cell code: name length (u8) and utf-8 name, passable (u8),
+#               damage (i32), turn_back (u8) and wins (u8)
+#   item types  for each: name length (u8) and utf-8 name, pickable, heals and opens_end (u8)
+#   grid        one byte per tile, indexed by y * width + x
+#   passages    the passage index as int64, then the place in it of every cell as int64
+#   components  the component label of every cell as int32, then the exit flag of every component
+#   items       as written by map_binary.write_items
+COMPILED_MAGIC = b"MAZC"
+COMPILED_VERSION = 1
+COMPILED_HEADER = struct.Struct("<4sH32sIIHHQI")
+CELL_RULE = struct.Struct("<BiBB")
+ITEM_RULE = struct.Struct("<BBB")
+COMPILED_EXTENSION = ".mazc"
+
+
+class MapEntry:
+    """A parsed map and its derived data, shared by every game played on it."""
+
+    def __init__(self, key: str, source: str, width: int, height: int, grid: bytes, items: List[dict],
+                 passages: array, connectivity: "ConnectivityIndex", field_file: Optional[str] = None,
+                 passage_slots: Optional[array] = None):
+        """
+        Initialize a MapEntry object.
+
+        Args:
+            key (str): The content hash of the map.
+            source (str): The name of the map file.
+            width (int): The width of the map.
+            height (int): The height of the map.
+            grid (bytes): The cell type codes, indexed by y * width + x.
+            items (List[dict]): The items as dictionaries with x, y and name.
+            passages (array): The grid indexes of the passage cells in ascending order.
+            connectivity (ConnectivityIndex): The connected components of the map.
+            field_file (str, optional): The file keeping the distance field to the end, None
+                to compute it in memory only.
+            passage_slots (array, optional): The place of every cell in passages, built on
+                first use by default.
+        """
+        self.__key = key
+        self.__source = source
+        self.__width = width
+        self.__height = height
+        self.__grid = grid
+        self.__items = items
+        self.__passages = passages
+        self.__connectivity = connectivity
+        self.__field_file = field_file
+        self.__passage_slots = passage_slots
+        self.__pathfinder = None
+
+    @property
+    def key(self) -> str:
+        """Get the content hash of the map."""
+        return self.__key
+
+    @property
+    def source(self) -> str:
+        """Get the name of the map file."""
+        return self.__source
+
+    @property
+    def width(self) -> int:
+        """Get the width of the map."""
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        """Get the height of the map."""
+        return self.__height
+
+    @property
+    def grid(self) -> bytes:
+        """Get the cell type codes of the map, read-only."""
+        return self.__grid
+
+    @property
+    def items(self) -> List[dict]:
+        """Get the items of the map."""
+        return self.__items
+
+    @property
+    def passages(self) -> array:
+        """Get the grid indexes of the passage cells, in the form Maze.load_grid takes."""
+        return self.__passages
+
+    @property
+    def passage_slots(self) -> array:
+        """Get the place of every cell in passages, read-only and shared by the mazes of the games."""
+        if self.__passage_slots is None:
+            self.__passage_slots = build_passage_slots(self.__passages, len(self.__grid))
+        return self.__passage_slots
+
+    @property
+    def connectivity(self) -> "ConnectivityIndex":
+        """Get the connected components of the map."""
+        return self.__connectivity
+
+    @property
+    def size(self) -> int:
+        """Get the approximate bytes of memory held by the entry."""
+        size = len(self.__grid) + len(self.__passages) * self.__passages.itemsize
+        size += len(self.__connectivity.labels) * self.__connectivity.labels.itemsize
+        if self.__passage_slots is not None:
+            size += len(self.__passage_slots) * self.__passage_slots.itemsize
+        if self.__pathfinder is not None:
+            size += self.__width * self.__height * 5 * 4  # The distance field to the end
+        return size
+
+    def new_grid(self) -> bytearray:
+        """Get a writable copy of the grid for one game, whose fire cells stay its own."""
+        return bytearray(self.__grid)
+
+    def pathfinder(self) -> "PathFinder":
+        """
+        Get a pathfinder over the map without fire, such as PlannerPolicy searches.
+
+        The distance field to the end is read from the cache the first time, or computed and
+        written to it, so planners of later games and processes skip the search.
+
+        Returns:
+            PathFinder: The pathfinder, shared by the games of the map.
+        """
+        if self.__pathfinder is None:
+            from pathfinding import PathFinder
+
+            maze = Maze()
+            maze.load_grid(self.__width, self.__height, self.new_grid(), self.__passages, self.passage_slots)
+            pathfinder = PathFinder(maze, avoid_fire=False)
+            if read_cache(lambda: pathfinder.load_field(self.__field_file), self.__field_file) is None:
+                field = pathfinder.field_to_end()
+                if self.__field_file is not None:
+                    write_cache(self.__field_file, field.save)
+            self.__pathfinder = pathfinder
+        return self.__pathfinder
+
+
+def compile_map(entry: MapEntry, file_name: str) -> None:
+    """
+    Writes a map and its derived data, with the registered rules, to a compiled map file.
+
+    Args:
+        entry (MapEntry): The map, as loaded and validated by a MapRegistry.
+        file_name (str): The name of the compiled map file, usually ending in COMPILED_EXTENSION.
+    """
+    connectivity = entry.connectivity
+    passages = array("q", entry.passages)
+    slots = array("q", entry.passage_slots)
+    labels = array("i", connectivity.labels)
+    if sys.byteorder != "little":
+        passages.byteswap()
+        slots.byteswap()
+        labels.byteswap()
+
+    temp_file = f"{file_name}.{os.getpid()}.tmp"
+    with open(temp_file, "wb") as f:
+        f.write(COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, entry.key.encode("ascii"), entry.width,
+                                     entry.height, len(CELL_BEHAVIOURS), len(ITEM_TYPES), len(passages),
+                                     connectivity.count))
+        for cell in CELL_BEHAVIOURS:
+            f.write(pack_name(cell.name))
+            f.write(CELL_RULE.pack(cell.passable, cell.damage, cell.turn_back, cell.wins))
+        for item in ITEM_TYPES.values():
+            f.write(pack_name(item.name))
+            f.write(ITEM_RULE.pack(item.pickable, item.heals, item.opens_end))
+        f.write(entry.grid)
+        f.write(passages.tobytes())
+        f.write(slots.tobytes())
+        f.write(labels.tobytes())
+        f.write(connectivity.exits)
+        write_items(f, entry.items)
+    os.replace(temp_file, file_name)
+
+
+def load_compiled_map(file_name: str) -> MapEntry:
+    """
+    Reads a compiled map written by compile_map.
+
+    Cell and item types of the file that are not registered yet are registered, once every
+    rule of the file was checked, so a process only needs the built-in types to play maps
+    compiled with custom ones.
+
+    Args:
+        file_name (str): The name of the compiled map file.
+
+    Returns:
+        MapEntry: The map, whose key is the key it was compiled under.
+
+    Raises:
+        ValueError: If the file is not a compiled map, is truncated, or was compiled with
+            rules that differ from the registered ones.
+    """
+    with open(file_name, "rb") as f:
+        (magic, version, key, width, height, cell_count, item_count, passage_count,
+         component_count) = COMPILED_HEADER.unpack(read_exact(f, COMPILED_HEADER.size))
+        if magic != COMPILED_MAGIC:
+            raise ValueError(f"{file_name} is not a compiled maze map")
+        if version != COMPILED_VERSION:
+            raise ValueError(f"{file_name} has unsupported version {version}")
+
+        cell_rules = []
+        for _ in range(cell_count):
+            name = read_name(f)
+            passable, damage, turn_back, wins = CELL_RULE.unpack(read_exact(f, CELL_RULE.size))
+            cell_rules.append((name, bool(passable), damage, bool(turn_back), bool(wins)))
+        item_rules = []
+        for _ in range(item_count):
+            name = read_name(f)
+            item_rules.append((name, *(bool(flag) for flag in ITEM_RULE.unpack(read_exact(f, ITEM_RULE.size)))))
+
+        size = width * height
+        grid = read_exact(f, size)
+        passages = array("q")
+        passages.frombytes(read_exact(f, passage_count * passages.itemsize))
+        slots = array("q")
+        slots.frombytes(read_exact(f, size * slots.itemsize))
+        labels = array("i")
+        labels.frombytes(read_exact(f, size * labels.itemsize))
+        exits = bytearray(read_exact(f, component_count))
+        items = read_items(f)
+    if sys.byteorder != "little":
+        passages.byteswap()
+        slots.byteswap()
+        labels.byteswap()
+
+    _register_rules(file_name, cell_rules, item_rules)
+
+    from map_validator import ConnectivityIndex
+
+    return MapEntry(key.decode("ascii"), file_name, width, height, grid, items, passages,
+                    ConnectivityIndex(width, height, labels, exits), passage_slots=slots)
+
+
+def read_cache(read: Callable, file_name: Optional[str]):
+    """
+    Reads a derived data file, None if it is missing, unreadable, corrupt or from another version.
+
+    The cache is an optimization, any failure to decode a file makes the data be derived again.
+
+    Args:
+        read (callable): Reads the file and returns its data.
+        file_name (str, optional): The name of the file, None when there is no cache.
+
+    Returns:
+        The data returned by read, None on a cache miss.
+    """
+    if file_name is None or not os.path.exists(file_name):
+        return None
+    try:
+        return read()
+    except Exception:
+        return None
+
+
+def write_cache(file_name: str, write: Callable[[str], None]) -> None:
+    """
+    Writes a derived data file through a temporary file, so readers never see a partial file.
+
+    The cache is an optimization, a file that cannot be written is skipped.
+
+    Args:
+        file_name (str): The name of the file.
+        write (callable): Writes the data to the file name it is given.
+    """
+    temp_file = f"{file_name}.{os.getpid()}.tmp"
+    try:
+        write(temp_file)
+        os.replace(temp_file, file_name)
+    except OSError:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+
+
+def _register_rules(file_name: str, cell_rules: List[tuple], item_rules: List[tuple]) -> None:
+    """Check the rules of a compiled map against the registered ones, then register the new types.
+
+    Nothing is registered unless every rule matches, so a file rejected for one rule leaves
+    the registry as it was.
+    """
+    for code, rule in enumerate(cell_rules[:len(CELL_BEHAVIOURS)]):
+        cell = CELL_BEHAVIOURS[code]
+        if (cell.name, cell.passable, cell.damage, cell.turn_back, cell.wins) != rule:
+            raise ValueError(f"{file_name} was compiled with other rules for cell code {code} ({rule[0]})")
+    new_names = [rule[0] for rule in cell_rules[len(CELL_BEHAVIOURS):]]
+    if len(cell_rules) > MAX_CELL_TYPES:
+        raise ValueError(f"{file_name} has more than {MAX_CELL_TYPES} cell types")
+    if len(set(new_names)) != len(new_names) or any(name in CELL_CODES for name in new_names):
+        raise ValueError(f"{file_name} has a cell type at another code")
+    for name, *rule in item_rules:
+        item = ITEM_TYPES.get(name)
+        if item is not None and (item.pickable, item.heals, item.opens_end) != tuple(rule):
+            raise ValueError(f"{file_name} was compiled with other rules for item type {name}")
+
+    for rule in cell_rules[len(CELL_BEHAVIOURS):]:
+        register_cell_type(*rule)
+    for name, *rule in item_rules:
+        if name not in ITEM_TYPES:
+            register_item_type(name, *rule)
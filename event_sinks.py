@@ -0,0 +1,205 @@
+import json
+import sys
+from collections import deque
+from typing import List, Optional, TextIO
+
+from events import GameEvent, format_event
+
+DEFAULT_RING_CAPACITY = 10_000  # Events kept by a RingBufferSink
+DEFAULT_BUFFER_SIZE = 1 << 16  # Bytes buffered by a JsonLinesEventSink between writes
+
+
+class NullSink:
+    """Drops every event, for headless runs that only need the outcome."""
+
+    needs_text = False
+
+    def write(self, events: List[GameEvent], texts: Optional[List[str]]) -> None:
+        """Ignore a batch of events."""
+
+    def flush(self) -> None:
+        """Do nothing."""
+
+    def close(self) -> None:
+        """Do nothing."""
+
+
+class ConsoleSink:
+    """Prints the console text of the events, one write per batch."""
+
+    needs_text = True
+
+    def __init__(self, file: Optional[TextIO] = None):
+        """
+        Initialize a ConsoleSink object.
+
+        Args:
+            file (TextIO, optional): The file to write to, the standard output by default.
+        """
+        self.__file = file
+
+    def write(self, events: List[GameEvent], texts: Optional[List[str]]) -> None:
+        """
+        Write the text of a batch of events, a line per event.
+
+        Args:
+            events (List[GameEvent]): The events.
+            texts (List[str]): The console text of each event.
+        """
+        file = self.__file if self.__file is not None else sys.stdout
+        file.write("\n".join(texts) + "\n")
+
+    def flush(self) -> None:
+        """Flush the file, so the text shows before the game waits for input."""
+        (self.__file if self.__file is not None else sys.stdout).flush()
+
+    def close(self) -> None:
+        """Flush the file, which stays open."""
+        self.flush()
+
+
+class JsonLinesEventSink:
+    """Appends the events to a file as JSON lines, through a write buffer."""
+
+    needs_text = False
+
+    def __init__(self, file_name: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Initialize a JsonLinesEventSink object.
+
+        Args:
+            file_name (str): The name of the file, appended to.
+            buffer_size (int): The bytes buffered before they are written to the file.
+        """
+        self.__file = open(file_name, "a", buffering=buffer_size)
+
+    def write(self, events: List[GameEvent], texts: Optional[List[str]]) -> None:
+        """
+        Buffer a batch of events, a JSON object per line.
+
+        Args:
+            events (List[GameEvent]): The events.
+            texts (List[str], optional): Not used.
+        """
+        self.__file.write("".join(json.dumps(event.to_json()) + "\n" for event in events))
+
+    def flush(self) -> None:
+        """Write the buffered lines to the file."""
+        self.__file.flush()
+
+    def close(self) -> None:
+        """Write the buffered lines and close the file."""
+        self.__file.close()
+
+
+class RingBufferSink:
+    """Keeps the latest events in memory, for tests, debugging and spectators joining late."""
+
+    needs_text = False
+
+    def __init__(self, capacity: int = DEFAULT_RING_CAPACITY):
+        """
+        Initialize a RingBufferSink object.
+
+        Args:
+            capacity (int): The number of events kept, older events are dropped.
+        """
+        self.__events = deque(maxlen=capacity)
+
+    @property
+    def events(self) -> List[GameEvent]:
+        """Get the kept events, oldest first."""
+        return list(self.__events)
+
+    def write(self, events: List[GameEvent], texts: Optional[List[str]]) -> None:
+        """
+        Keep a batch of events.
+
+        Args:
+            events (List[GameEvent]): The events.
+            texts (List[str], optional): Not used.
+        """
+        self.__events.extend(events)
+
+    def flush(self) -> None:
+        """Do nothing, the events are already in memory."""
+
+    def close(self) -> None:
+        """Do nothing."""
+
+
+class EventStream:
+    """Collects the events of an engine and passes them to a chain of sinks in batches.
+
+    Events are only appended to a list as they happen. At the end of every round, or when
+    flush is called, the batch goes to every sink and the sinks are flushed, so files see
+    one write per round. Events are formatted as console text once per batch, and only if
+    a sink needs text.
+    """
+
+    def __init__(self, sinks: Optional[List] = None):
+        """
+        Initialize an EventStream object.
+
+        Args:
+            sinks (List, optional): The sinks, objects with a needs_text attribute and write,
+                flush and close methods, such as ConsoleSink or NullSink.
+        """
+        self.__sinks = list(sinks or [])
+        self.__needs_text = any(sink.needs_text for sink in self.__sinks)
+        self.__pending: List[GameEvent] = []
+
+    @property
+    def sinks(self) -> List:
+        """Get the sinks."""
+        return list(self.__sinks)
+
+    def add_sink(self, sink) -> None:
+        """
+        Adds a sink to the chain, it receives the events from the next flush.
+
+        Args:
+            sink: The sink.
+        """
+        self.__sinks.append(sink)
+        self.__needs_text = self.__needs_text or sink.needs_text
+
+    def attach(self, engine) -> None:
+        """
+        Collects the events of an engine, flushing them at the end of every round.
+
+        Args:
+            engine (MazeEngine): The engine.
+        """
+        engine.add_event_listener(self.__pending.append)
+        engine.add_round_listener(self.__on_round)
+
+    def emit(self, event: GameEvent) -> None:
+        """
+        Adds an event to the current batch.
+
+        Args:
+            event (GameEvent): The event.
+        """
+        self.__pending.append(event)
+
+    def flush(self) -> None:
+        """Pass the collected events to the sinks and flush them."""
+        if not self.__pending:
+            return
+        batch = self.__pending[:]
+        self.__pending.clear()
+        texts = [format_event(event) for event in batch] if self.__needs_text else None
+        for sink in self.__sinks:
+            sink.write(batch, texts)
+            sink.flush()
+
+    def close(self) -> None:
+        """Flush the collected events and close the sinks."""
+        self.flush()
+        for sink in self.__sinks:
+            sink.close()
+
+    def __on_round(self, round_number: int, round_events: List[GameEvent]) -> None:
+        """Flush the events of a finished round."""
+        self.flush()
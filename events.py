@@ -0,0 +1,108 @@
+from typing import Optional
+
+# Kinds of events produced by the engine
+ROUND_STARTED = "round_started"
+TURN_STARTED = "turn_started"
+TURN_ENDED = "turn_ended"
+TURN_SKIPPED = "turn_skipped"
+INVALID_ACTION = "invalid_action"
+HERO_MOVED = "hero_moved"
+HIT_WALL = "hit_wall"
+ON_FIRE = "on_fire"
+SCARED = "scared"
+WON = "won"
+KILLED_BY_GOLEM = "killed_by_golem"
+HERO_MET = "hero_met"
+HEART_FOUND = "heart_found"
+ITEM_FOUND = "item_found"
+HEALED = "healed"
+NO_MEDICAL_KITS = "no_medical_kits"
+ATTACKED = "attacked"
+NOTHING_TO_ATTACK = "nothing_to_attack"
+ITEM_PICKED = "item_picked"
+NOTHING_TO_PICK = "nothing_to_pick"
+HERO_ELIMINATED = "hero_eliminated"
+ITEM_DROPPED = "item_dropped"
+GAME_OVER = "game_over"
+ALL_ELIMINATED = "all_eliminated"
+
+# Console text of every kind of event, formatted with the hero name and the event data
+EVENT_MESSAGES = {
+    ROUND_STARTED: "\n\n{line}ROUND - {round}{line}",
+    TURN_STARTED: "\n------------------------------\nBurning cells {fire_cells}\nHero {hero} is moving ",
+    TURN_ENDED: "------------------------------",
+    TURN_SKIPPED: "{hero} skipped the turn",
+    INVALID_ACTION: "Invalid input",
+    HERO_MOVED: "Position of {hero} is {position}",
+    HIT_WALL: "{hero} hit the wall, -1 health| Current health: {health}",
+    ON_FIRE: "{hero} is on fire, -1 health| Current health: {health}",
+    SCARED: "{hero} got scared and ran away",
+    WON: "{hero} reached the end and won!!!",
+    KILLED_BY_GOLEM: "{hero} killed by the golem because he didn't have the key",
+    HERO_MET: "Hero {other} at this position",
+    HEART_FOUND: "Hero stepped on a green heart and regained health| Current health: {health}",
+    ITEM_FOUND: "Object '{item}' at this position ",
+    HEALED: "{hero} healed| Current health {health} | Medical kits left: {medical_kits}",
+    NO_MEDICAL_KITS: "{hero} has no medical kits",
+    ATTACKED: "Hero {hero} attacked hero {target}, now his health is {health}",
+    NOTHING_TO_ATTACK: "There is no one to attack at this position",
+    ITEM_PICKED: "Hero picked up {item}",
+    NOTHING_TO_PICK: "There is nothing to pick up at this position",
+    HERO_ELIMINATED: "Hero has 0 health points and is eliminated",
+    ITEM_DROPPED: "Object '{item}' dropped at position {position}",
+    GAME_OVER: "***Game Over***",
+    ALL_ELIMINATED: "All heroes have been eliminated from the game",
+}
+
+
+class GameEvent:
+    """A single outcome produced by the engine."""
+
+    def __init__(self, kind: str, hero: Optional[str] = None, **data):
+        """
+        Initialize a GameEvent object.
+
+        Args:
+            kind (str): The kind of the event, one of the constants of this module.
+            hero (str, optional): The name of the hero the event is about.
+            **data: The details of the event, such as health or position.
+        """
+        self.__kind = kind
+        self.__hero = hero
+        self.__data = data
+
+    @property
+    def kind(self) -> str:
+        """Get the kind of the event."""
+        return self.__kind
+
+    @property
+    def hero(self) -> Optional[str]:
+        """Get the name of the hero the event is about."""
+        return self.__hero
+
+    @property
+    def data(self) -> dict:
+        """Get the details of the event."""
+        return self.__data
+
+    def to_json(self) -> dict:
+        json_data = {"kind": self.__kind, "hero": self.__hero}
+        json_data.update(self.__data)
+        return json_data
+
+    def __repr__(self) -> str:
+        return f"GameEvent({self.__kind!r}, {self.__hero!r}, {self.__data!r})"
+
+
+def format_event(event: GameEvent) -> str:
+    """
+    Formats an event as the text shown in the console.
+
+    Args:
+        event (GameEvent): The event to format.
+
+    Returns:
+        str: The text of the event.
+    """
+    return EVENT_MESSAGES[event.kind].format(hero=event.hero, line="-" * 10, **event.data)
@@ -1,24 +1,29 @@
 class GameObject:
+    __slots__ = ("_position", "_object_type", "_index")
+
     def __init__(self, x: int, y: int, object_type: str):
-        self._x = x
-        self._y = y
+        self._position = (x, y)  # Kept as one tuple, so reading the position allocates nothing
         self._object_type = object_type
+        self._index = None  # Spatial index tracking this object, if any
 
     @property
     def position(self) -> tuple:
-        return self._x, self._y
+        return self._position
 
     @position.setter
     def position(self, position: tuple):
-        self._x, self._y = position[0], position[1]
+        old_position = self._position
+        self._position = position if type(position) is tuple else (position[0], position[1])
+        if self._index is not None:
+            self._index.move(self, old_position)
 
     @property
     def x(self) -> int:
-        return self._x
+        return self._position[0]
 
     @property
     def y(self) -> int:
-        return self._y
+        return self._position[1]
 
     @property
     def object_type(self) -> str:
@@ -26,8 +31,8 @@ class GameObject:
 
     def to_json(self) -> dict:
         return {
-            "x": self._x,
-            "y": self._y,
+            "x": self._position[0],
+            "y": self._position[1],
             "object_type": self._object_type,
         }
 
@@ -8,6 +8,8 @@ KNIGHTS_MEDICAL_KIT = 3
 
 
 class Hero(GameObject):
+    __slots__ = ("__name", "__health", "__count_medical_kit", "__pocket", "__old_direction")
+
     def __init__(self, x: int, y: int, name: str):
         super().__init__(x, y, "hero")
         self.__name = name
@@ -17,15 +19,19 @@ class Hero(GameObject):
         self.__old_direction = ""
 
     def move(self, direction: str):
+        old_position = self._position
+        x, y = old_position
         match direction:
             case "l":
-                self._x -= 1
+                self._position = (x - 1, y)
             case "r":
-                self._x += 1
+                self._position = (x + 1, y)
             case "u":
-                self._y -= 1
+                self._position = (x, y - 1)
             case "d":
-                self._y += 1
+                self._position = (x, y + 1)
+        if self._index is not None:
+            self._index.move(self, old_position)
 
     def heal(self):
         self.__health += 1
@@ -77,6 +83,10 @@ class Hero(GameObject):
     def count_medical_kit(self) -> int:
         return self.__count_medical_kit
 
+    @count_medical_kit.setter
+    def count_medical_kit(self, count_medical_kit: int):
+        self.__count_medical_kit = count_medical_kit
+
     def to_json(self) -> dict:
         json_str_data = super().to_json()
         json_str_data['name'] = self.__name
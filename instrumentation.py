@@ -0,0 +1,325 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds of the buckets of timing histograms, from 1 microsecond to 1 second
+DEFAULT_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 1e-1, 5e-1, 1.0)
+METRIC_PREFIX = "maze_"
+
+# Spans and counters recorded by MazeEngine
+ROUND_SPAN = "round_seconds"
+FIRE_INIT_SPAN = "fire_init_seconds"
+FIRE_CLEANUP_SPAN = "fire_cleanup_seconds"
+ACTION_SPAN = "action_seconds"  # Labelled with the action: move, heal, attack or pick
+COLLISION_SPAN = "collision_seconds"
+DECIDE_SPAN = "decide_seconds"
+ROUNDS = "rounds_total"
+WALLS_HIT = "walls_hit_total"
+FIRE_DAMAGE = "fire_damage_total"
+DEATHS = "deaths_total"  # Labelled with the cause of death
+LOOKUPS = "object_lookups_total"
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """Counts of observed values in fixed buckets, with their sum."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize a Histogram object.
+
+        Args:
+            buckets (Tuple[float, ...]): The sorted upper bounds of the buckets.
+        """
+        self.__buckets = buckets
+        self.__counts = [0] * (len(buckets) + 1)  # The last bucket has no upper bound
+        self.__count = 0
+        self.__sum = 0.0
+
+    @property
+    def buckets(self) -> Tuple[float, ...]:
+        """Get the upper bounds of the buckets."""
+        return self.__buckets
+
+    @property
+    def counts(self) -> List[int]:
+        """Get the number of values of each bucket, not cumulative."""
+        return self.__counts
+
+    @property
+    def count(self) -> int:
+        """Get the number of observed values."""
+        return self.__count
+
+    @property
+    def sum(self) -> float:
+        """Get the sum of the observed values."""
+        return self.__sum
+
+    def observe(self, value: float):
+        """Add a value.
+
+        Args:
+            value (float): The value.
+        """
+        self.__counts[bisect_left(self.__buckets, value)] += 1
+        self.__count += 1
+        self.__sum += value
+
+    def to_json(self) -> dict:
+        return {
+            "buckets": list(self.__buckets),
+            "counts": self.__counts,
+            "count": self.__count,
+            "sum": self.__sum,
+        }
+
+
+class Metrics:
+    """Counters and timing histograms of a game, passed to a sink when flushed.
+
+    Turned off by not giving one to MazeEngine, which then skips every measurement.
+    """
+
+    def __init__(self, sink=None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize a Metrics object.
+
+        Args:
+            sink (optional): Receives the metrics on every flush, such as a MemorySink,
+                JsonLinesSink or PrometheusSink.
+            buckets (Tuple[float, ...]): The upper bounds of the histogram buckets in seconds.
+        """
+        self.__sink = sink
+        self.__buckets = buckets
+        self.__counters: Dict[LabelKey, int] = {}
+        self.__histograms: Dict[LabelKey, Histogram] = {}
+
+    @property
+    def counters(self) -> Dict[LabelKey, int]:
+        """Get the counters by name and sorted labels."""
+        return self.__counters
+
+    @property
+    def histograms(self) -> Dict[LabelKey, Histogram]:
+        """Get the histograms by name and sorted labels."""
+        return self.__histograms
+
+    def increment(self, name: str, amount: int = 1, **labels: str):
+        """Increase a counter.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The increase.
+            **labels: The labels of the counter, such as cause="fire".
+        """
+        key = (name, tuple(sorted(labels.items())))
+        self.__counters[key] = self.__counters.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        """Add a duration to a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            seconds (float): The duration.
+            **labels: The labels of the histogram, such as action="move".
+        """
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.__histograms.get(key)
+        if histogram is None:
+            histogram = self.__histograms[key] = Histogram(self.__buckets)
+        histogram.observe(seconds)
+
+    def span(self, name: str, **labels: str) -> "Span":
+        """Time a block of code into a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            **labels: The labels of the histogram.
+
+        Returns:
+            Span: A context manager observing the time spent inside it.
+        """
+        return Span(self, name, labels)
+
+    def counter(self, name: str, **labels: str) -> int:
+        """Get the value of a counter.
+
+        Args:
+            name (str): The name of the counter.
+            **labels: The labels of the counter.
+
+        Returns:
+            int: The value, 0 for a counter never increased.
+        """
+        return self.__counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """Get a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            **labels: The labels of the histogram.
+
+        Returns:
+            Histogram: The histogram, None if nothing was observed.
+        """
+        return self.__histograms.get((name, tuple(sorted(labels.items()))))
+
+    def flush(self):
+        """Pass the metrics to the sink."""
+        if self.__sink is not None:
+            self.__sink.write(self)
+
+    def to_json(self) -> dict:
+        return {
+            "time": time.time(),
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self.__counters.items()
+            ],
+            "histograms": [
+                {"name": name, "labels": dict(labels), **histogram.to_json()}
+                for (name, labels), histogram in self.__histograms.items()
+            ],
+        }
+
+
+class Span:
+    """Context manager timing a block of code into a histogram of Metrics."""
+
+    def __init__(self, metrics: Metrics, name: str, labels: dict):
+        """
+        Initialize a Span object.
+
+        Args:
+            metrics (Metrics): The metrics to record into.
+            name (str): The name of the histogram.
+            labels (dict): The labels of the histogram.
+        """
+        self.__metrics = metrics
+        self.__name = name
+        self.__labels = labels
+        self.__start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__metrics.observe(self.__name, time.perf_counter() - self.__start, **self.__labels)
+
+
+class MemorySink:
+    """Keeps the flushed metrics in memory, for tests and notebooks."""
+
+    def __init__(self):
+        """Initialize an empty MemorySink."""
+        self.__records = []
+
+    @property
+    def records(self) -> List[dict]:
+        """Get the flushed metrics, oldest first."""
+        return self.__records
+
+    def write(self, metrics: Metrics):
+        """Store the metrics.
+
+        Args:
+            metrics (Metrics): The metrics.
+        """
+        self.__records.append(metrics.to_json())
+
+
+class JsonLinesSink:
+    """Appends the flushed metrics to a file, one JSON object per line."""
+
+    def __init__(self, file_name: str):
+        """
+        Initialize a JsonLinesSink object.
+
+        Args:
+            file_name (str): The name of the file.
+        """
+        self.__file_name = file_name
+
+    def write(self, metrics: Metrics):
+        """Append the metrics.
+
+        Args:
+            metrics (Metrics): The metrics.
+        """
+        with open(self.__file_name, "a") as file:
+            file.write(json.dumps(metrics.to_json()) + "\n")
+
+
+class PrometheusSink:
+    """Writes the flushed metrics in the Prometheus text format, for the textfile collector.
+
+    The file is replaced atomically, so a scrape never reads half of it.
+    """
+
+    def __init__(self, file_name: str, prefix: str = METRIC_PREFIX):
+        """
+        Initialize a PrometheusSink object.
+
+        Args:
+            file_name (str): The name of the file.
+            prefix (str): Put before every metric name.
+        """
+        self.__file_name = file_name
+        self.__prefix = prefix
+
+    def write(self, metrics: Metrics):
+        """Replace the file with the metrics.
+
+        Args:
+            metrics (Metrics): The metrics.
+        """
+        temp_file = self.__file_name + ".tmp"
+        with open(temp_file, "w") as file:
+            file.write(self.format(metrics))
+        os.replace(temp_file, self.__file_name)
+
+    def format(self, metrics: Metrics) -> str:
+        """Format metrics in the Prometheus text format.
+
+        Args:
+            metrics (Metrics): The metrics.
+
+        Returns:
+            str: The text.
+        """
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(metrics.counters.items()):
+            name = self.__prefix + name
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), histogram in sorted(metrics.histograms.items(), key=lambda entry: entry[0]):
+            name = self.__prefix + name
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Format labels as {name="value",...}, empty without labels."""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
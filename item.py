@@ -2,6 +2,8 @@ from game_object import GameObject
 
 
 class Item(GameObject):
+    __slots__ = ("__name",)
+
     def __init__(self, x: int, y: int, name: str):
         super().__init__(x, y, "item")
         self.__name = name
@@ -12,7 +14,7 @@ class Item(GameObject):
 
     def to_json(self) -> dict:
         return {
-            "x": self._x,
-            "y": self._y,
+            "x": self._position[0],
+            "y": self._position[1],
             "name": self.__name
         }
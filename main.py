@@ -1,6 +1,15 @@
+import sys
+
+from compiled_map import COMPILED_EXTENSION, load_compiled_map
 from maze_gama import MazeGame
 
 if __name__ == '__main__':
+    map_file = sys.argv[1] if len(sys.argv) > 1 else "JSON/game_map.json"
     game = MazeGame()
-    game.load_game_map_from_json("JSON/game_map.json")
+    if map_file.endswith(COMPILED_EXTENSION):
+        game.load_map_entry(load_compiled_map(map_file))
+    else:
+        from map_registry import MapRegistry  # Imported on first use, compiled maps need no registry
+
+        game.load_map_entry(MapRegistry().get(map_file))
     game.start()
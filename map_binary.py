@@ -0,0 +1,291 @@
+import mmap
+import os
+import struct
+import sys
+from typing import List
+
+from cell_types import CELL_CODES, CELL_TYPES
+
+# File layout, all numbers little-endian:
+#   header      magic, version, cell type count, width, height, grid offset
+#   type table  for each cell type: name length (u8) and utf-8 name, the index is its code
+#   padding     zeros up to the grid offset, aligned so the grid can be memory-mapped
+#   grid        one byte per tile, indexed by y * width + x
+#   items       item count (u32), then for each item: x (i32), y (i32), name length (u8) and name
+MAGIC = b"MAZB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIQ")
+POSITION = struct.Struct("<ii")  # Items dropped by heroes off the map lie outside it
+COUNT = struct.Struct("<I")
+GRID_ALIGNMENT = 4096
+
+
+class BinaryMap:
+    """A game map opened from the binary format."""
+
+    def __init__(self, width: int, height: int, grid, items: List[dict]):
+        """
+        Initialize a BinaryMap object.
+
+        Args:
+            width (int): The width of the map.
+            height (int): The height of the map.
+            grid: The cell type codes, a copy-on-write memory map when possible.
+            items (List[dict]): The items of the map as dictionaries with x, y and name.
+        """
+        self.__width = width
+        self.__height = height
+        self.__grid = grid
+        self.__items = items
+
+    @property
+    def width(self) -> int:
+        """Get the width of the map."""
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        """Get the height of the map."""
+        return self.__height
+
+    @property
+    def grid(self):
+        """Get the cell type codes of the map."""
+        return self.__grid
+
+    @property
+    def items(self) -> List[dict]:
+        """Get the items of the map."""
+        return self.__items
+
+
+def write_binary_map(file_name: str, width: int, height: int, grid, items: List[dict]) -> None:
+    """
+    Writes a map in the binary format.
+
+    Args:
+        file_name (str): The name of the binary file.
+        width (int): The width of the map.
+        height (int): The height of the map.
+        grid: The cell type codes of the map, indexed by y * width + x.
+        items (List[dict]): The items of the map as dictionaries with x, y and name.
+    """
+    type_table = b"".join(pack_name(cell_type) for cell_type in CELL_TYPES)
+    header_size = HEADER.size + len(type_table)
+    grid_offset = -(-header_size // GRID_ALIGNMENT) * GRID_ALIGNMENT
+
+    with open(file_name, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(CELL_TYPES), width, height, grid_offset))
+        f.write(type_table)
+        f.write(bytes(grid_offset - header_size))
+        f.write(grid)
+        write_items(f, items)
+
+
+def open_binary_map(file_name: str) -> BinaryMap:
+    """
+    Opens a map in the binary format.
+
+    The grid is memory-mapped copy-on-write, so opening costs almost nothing, pages are read
+    lazily and changes such as fire cells never reach the file.
+
+    Args:
+        file_name (str): The name of the binary file.
+
+    Returns:
+        BinaryMap: The opened map.
+
+    Raises:
+        ValueError: If the file is not a binary map of this version, or is truncated.
+    """
+    with open(file_name, "rb") as f:
+        magic, version, type_count, width, height, grid_offset = HEADER.unpack(read_exact(f, HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{file_name} is not a binary maze map")
+        if version != VERSION:
+            raise ValueError(f"{file_name} has unsupported version {version}")
+
+        file_types = [read_name(f) for _ in range(type_count)]
+        size = width * height
+
+        if size == 0:
+            grid = bytearray()
+        elif grid_offset % mmap.ALLOCATIONGRANULARITY == 0:
+            grid = mmap.mmap(f.fileno(), size, offset=grid_offset, access=mmap.ACCESS_COPY)
+        else:
+            f.seek(grid_offset)
+            grid = bytearray(read_exact(f, size))
+
+        if file_types != list(CELL_TYPES[:type_count]):
+            grid = bytearray(grid).translate(translation_table(file_name, file_types))
+
+        f.seek(grid_offset + size)
+        items = read_items(f)
+
+    return BinaryMap(width, height, grid, items)
+
+
+def write_items(f, items: List[dict]) -> None:
+    """
+    Writes an item table to a binary file.
+
+    Args:
+        f: The file, open for writing in binary mode.
+        items (List[dict]): The items as dictionaries with x, y and name.
+    """
+    f.write(COUNT.pack(len(items)))
+    for item in items:
+        f.write(POSITION.pack(item["x"], item["y"]))
+        f.write(pack_name(item["name"]))
+
+
+def read_items(f) -> List[dict]:
+    """
+    Reads an item table written by write_items.
+
+    Args:
+        f: The file, open for reading in binary mode at the start of the table.
+
+    Returns:
+        List[dict]: The items as dictionaries with x, y and name.
+
+    Raises:
+        ValueError: If the table is truncated or a name is not utf-8.
+    """
+    items = []
+    for _ in range(COUNT.unpack(read_exact(f, COUNT.size))[0]):
+        x, y = POSITION.unpack(read_exact(f, POSITION.size))
+        items.append({"x": x, "y": y, "name": read_name(f)})
+    return items
+
+
+def json_to_binary(json_file: str, binary_file: str) -> None:
+    """
+    Converts a JSON map to the binary format.
+
+    Accepts files in the format of JSON/game_map.json, the output of Maze.to_json and the
+    list of single-key dictionaries written by MazeEngine.save_json. Heroes are not part of
+    the binary format and are dropped.
+
+    Args:
+        json_file (str): The name of the JSON file.
+        binary_file (str): The name of the binary file to write.
+    """
+    import json  # Imported on first use, like MapStreamReader, reading binary maps never parses JSON
+
+    from map_stream import MapStreamReader
+
+    with open(json_file, "rb") as f:
+        first_char = f.read(64).lstrip()[:1]
+
+    if first_char == b"[":
+        with open(json_file, "r") as f:
+            json_data = {}
+            for part in json.load(f):
+                json_data.update(part)
+        rows = json_data.get("game_map", [])
+    else:
+        reader = MapStreamReader(json_file)
+        rows = reader.rows()
+
+    grid = bytearray()
+    width = None
+    height = 0
+    for row in rows:
+        if width is None:
+            width = len(row)
+        elif len(row) != width:
+            raise ValueError(f"Row {height} of {json_file} has {len(row)} cells, expected {width}")
+        grid += bytes(CELL_CODES[cell["cell_type"]] for cell in row)
+        height += 1
+    width = width or 0
+
+    if first_char != b"[":
+        json_data = reader.values()
+    items = json_data.get("items", json_data.get("item", []))
+    write_binary_map(binary_file, width, height, grid, items)
+
+
+def binary_to_json(binary_file: str, json_file: str) -> None:
+    """
+    Converts a binary map to JSON in the format of JSON/game_map.json.
+
+    Rows are written one at a time, the whole map is never built in memory.
+
+    Args:
+        binary_file (str): The name of the binary file.
+        json_file (str): The name of the JSON file to write.
+    """
+    import json
+
+    binary_map = open_binary_map(binary_file)
+    width = binary_map.width
+    grid = binary_map.grid
+
+    with open(json_file, "w") as f:
+        f.write('{"game_map": [')
+        for y in range(binary_map.height):
+            if y:
+                f.write(", ")
+            f.write(json.dumps([
+                {"x": x, "y": y, "object_type": "cell", "cell_type": CELL_TYPES[code]}
+                for x, code in enumerate(grid[y * width:(y + 1) * width])
+            ]))
+        f.write('], "items": ')
+        f.write(json.dumps(binary_map.items))
+        f.write("}")
+
+
+def pack_name(name: str) -> bytes:
+    """Encode a name as its length byte followed by utf-8."""
+    data = name.encode("utf-8")
+    if len(data) > 255:
+        raise ValueError(f"Name {name!r} is too long")
+    return bytes((len(data),)) + data
+
+
+def read_name(f) -> str:
+    """Read a name written by pack_name, raising ValueError if it is truncated or not utf-8."""
+    return read_exact(f, read_exact(f, 1)[0]).decode("utf-8")
+
+
+def read_exact(f, size: int) -> bytes:
+    """Read exactly size bytes, raising ValueError at the end of a truncated file."""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError(f"{getattr(f, 'name', 'File')} is truncated")
+    return data
+
+
+def translation_table(source: str, file_types: List[str]) -> bytes:
+    """Build a table translating the cell codes of a file to the codes of CELL_TYPES.
+
+    Args:
+        source (str): The file the codes come from, named in errors.
+        file_types (List[str]): The cell types of the file, the index is its code.
+
+    Returns:
+        bytes: The table, for bytes.translate.
+
+    Raises:
+        ValueError: If a cell type of the file is not registered.
+    """
+    table = bytearray(range(256))
+    for code, cell_type in enumerate(file_types):
+        if cell_type not in CELL_CODES:
+            raise ValueError(f"{source} has unknown cell type {cell_type!r}")
+        table[code] = CELL_CODES[cell_type]
+    return bytes(table)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python map_binary.py <source> <destination>")
+        print("Converts .json maps to the binary format and binary maps back to .json")
+        sys.exit(1)
+
+    source, destination = sys.argv[1], sys.argv[2]
+    if os.path.splitext(source)[1].lower() == ".json":
+        json_to_binary(source, destination)
+    else:
+        binary_to_json(source, destination)
@@ -0,0 +1,292 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from cell_types import CELL_BEHAVIOURS, ITEM_TYPES
+from compiled_map import (COMPILED_EXTENSION, MapEntry, compile_map, load_compiled_map, read_cache,
+                          write_cache)
+from map_binary import open_binary_map, write_binary_map
+from map_stream import MapStreamReader
+from map_validator import ConnectivityIndex, ValidationReport, check_rows, validate_map
+from maze import Maze
+
+# Derived data of maps is kept in the cache directory of the registry, by default CACHE_DIR_NAME
+# in the cache directory of the user, one file of each kind per content hash:
+#   <hash>.mazb  the map in the binary format, for maps loaded from JSON
+#   <hash>.mazl  the connectivity index, written once the map is validated
+#   <hash>.mazp  the passage index: header (magic, version, count), then the grid index of
+#                every passage cell in ascending order as little-endian int64
+#   <hash>.mazd  the distance field to the end over the maze without fire, once computed
+CACHE_DIR_NAME = "maze_game"
+PASSAGES_MAGIC = b"MAZP"
+PASSAGES_VERSION = 1
+PASSAGES_HEADER = struct.Struct("<4sHQ")
+DEFAULT_MEMORY_BUDGET = 64 << 20  # Bytes of parsed maps kept in memory by a MapRegistry
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class MapRegistry:
+    """Loads maps once and keeps them in memory by content hash, least recently used first out.
+
+    The first load of a map parses and validates it and writes its derived data to disk, so
+    later processes load it without parsing JSON or searching the maze again. Later loads in
+    the same process hash the file again, only if its size or modification time changed, and
+    return the entry kept in memory. Maps with the same content share an entry whatever their
+    file names.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        """
+        Initialize a MapRegistry object.
+
+        Args:
+            cache_dir (str, optional): The directory of the derived data, user_cache_dir() by
+                default. Nothing is written if it cannot be created.
+            memory_budget (int): The bytes of maps kept in memory, the least recently used maps
+                are dropped beyond it. The last loaded map is always kept.
+        """
+        self.__cache_dir = cache_dir if cache_dir is not None else user_cache_dir()
+        self.__cache_dir_made = False
+        self.__memory_budget = memory_budget
+        self.__entries: "OrderedDict[str, MapEntry]" = OrderedDict()
+        self.__keys: Dict[str, tuple] = {}  # File name to its size, modification time and key
+        self.__hits = 0
+        self.__misses = 0
+        self.__disk_hits = 0
+
+    @property
+    def memory_budget(self) -> int:
+        """Get the bytes of maps kept in memory."""
+        return self.__memory_budget
+
+    @property
+    def memory_bytes(self) -> int:
+        """Get the bytes held by the maps in memory."""
+        return sum(entry.size for entry in self.__entries.values())
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, file_name: str) -> bool:
+        return self.key(file_name) in self.__entries
+
+    def key(self, file_name: str) -> str:
+        """
+        Get the content hash of a map file, which also covers the registered cell and item
+        types since the derived data depends on them.
+
+        Args:
+            file_name (str): The name of the map.
+
+        Returns:
+            str: The hash as hexadecimal digits.
+        """
+        stat = os.stat(file_name)
+        known = self.__keys.get(file_name)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+
+        import hashlib  # Imported on first use, loading a compiled map never hashes
+
+        digest = hashlib.blake2b(_rules_fingerprint(), digest_size=16)
+        with open(file_name, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        key = digest.hexdigest()
+        self.__keys[file_name] = (stat.st_size, stat.st_mtime_ns, key)
+        return key
+
+    def get(self, file_name: str) -> MapEntry:
+        """
+        Get a map, loading it on first use.
+
+        Args:
+            file_name (str): The name of the map in the JSON or binary format.
+
+        Returns:
+            MapEntry: The map.
+
+        Raises:
+            MapValidationError: If the map is invalid or cannot be won.
+        """
+        key = self.key(file_name)
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+            return entry
+
+        self.__misses += 1
+        entry = self.__load(key, file_name)
+        self.__entries[key] = entry
+        self.__trim()
+        return entry
+
+    def preload(self, file_names: Iterable[str]) -> List[str]:
+        """
+        Loads a pool of maps ahead of the games played on them.
+
+        Args:
+            file_names (Iterable[str]): The names of the maps.
+
+        Returns:
+            List[str]: The keys of the maps.
+        """
+        return [self.get(file_name).key for file_name in file_names]
+
+    def clear(self) -> None:
+        """Drops every map from memory, the derived data on disk is kept."""
+        self.__entries.clear()
+
+    def stats(self) -> dict:
+        """Get the counts of the registry as a JSON-compatible dictionary."""
+        return {
+            "maps": len(self.__entries),
+            "memory_bytes": self.memory_bytes,
+            "memory_budget": self.__memory_budget,
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "disk_hits": self.__disk_hits,
+        }
+
+    def __load(self, key: str, source: str) -> MapEntry:
+        """Load a map from its derived data on disk, or parse and validate it and write the data."""
+        base = os.path.join(self.__cache_directory(), key)
+        binary_file, index_file, passages_file, field_file = (base + extension for extension in
+                                                              (".mazb", ".mazl", ".mazp", ".mazd"))
+        extension = os.path.splitext(source)[1].lower()
+        if extension == COMPILED_EXTENSION:
+            self.__disk_hits += 1
+            return load_compiled_map(source)
+        is_json = extension == ".json"
+
+        report = ValidationReport()
+        maze = Maze()
+        if is_json:
+            binary_map = read_cache(lambda: open_binary_map(binary_file), binary_file)
+        else:
+            binary_map = open_binary_map(source)
+        if binary_map is not None:
+            items = binary_map.items
+            maze.load_grid(binary_map.width, binary_map.height, bytearray(binary_map.grid))
+        else:
+            reader = MapStreamReader(source)
+            maze.load_map_from_json(check_rows(reader.rows(), report))
+            items = reader.values().get("items", [])
+
+        connectivity = read_cache(lambda: ConnectivityIndex.load(index_file), index_file)
+        if connectivity is not None and (connectivity.width, connectivity.height) == (maze.width, maze.height):
+            self.__disk_hits += 1
+        else:
+            # Only valid maps are cached, so a map with an index was validated when it was written
+            report = validate_map(maze, items, report)
+            report.raise_for_errors()
+            connectivity = report.index
+            if is_json:
+                write_cache(binary_file, lambda temp_file: write_binary_map(
+                    temp_file, maze.width, maze.height, maze.grid, items))
+            write_cache(index_file, connectivity.save)
+
+        passages = read_cache(lambda: _load_passages(passages_file), passages_file)
+        if passages is None:
+            passages = maze.passage_indexes()
+            write_cache(passages_file, lambda temp_file: _save_passages(temp_file, passages))
+
+        return MapEntry(key, source, maze.width, maze.height, bytes(maze.grid), items, passages, connectivity,
+                        field_file if os.path.isdir(os.path.dirname(field_file)) else None)
+
+    def __cache_directory(self) -> str:
+        """Get the directory of the derived data, created on first use if missing."""
+        if not self.__cache_dir_made:
+            self.__cache_dir_made = True
+            try:
+                os.makedirs(self.__cache_dir, exist_ok=True)
+            except OSError:
+                pass
+        return self.__cache_dir
+
+    def __trim(self) -> None:
+        """Drop the least recently used maps until the memory budget is met."""
+        size = self.memory_bytes
+        while size > self.__memory_budget and len(self.__entries) > 1:
+            size -= self.__entries.popitem(last=False)[1].size
+
+
+def user_cache_dir() -> str:
+    """
+    Get the default directory of the derived data, shared by the games of the user.
+
+    Returns:
+        str: CACHE_DIR_NAME in $XDG_CACHE_HOME, %LOCALAPPDATA% on Windows, or ~/.cache.
+    """
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base and os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA")
+    return os.path.join(base or os.path.join(os.path.expanduser("~"), ".cache"), CACHE_DIR_NAME)
+
+
+def _rules_fingerprint() -> bytes:
+    """Get a description of the registered cell and item types, mixed into the content hashes."""
+    cells = ";".join(f"{cell.name}:{cell.passable:d}{cell.damage}{cell.turn_back:d}{cell.wins:d}"
+                     for cell in CELL_BEHAVIOURS)
+    items = ";".join(f"{item.name}:{item.pickable:d}{item.heals:d}{item.opens_end:d}" for item in ITEM_TYPES.values())
+    return f"{cells}|{items}".encode("utf-8")
+
+
+def _save_passages(file_name: str, passages: array) -> None:
+    """Write a passage index file."""
+    data = array("q", passages)
+    if sys.byteorder != "little":
+        data.byteswap()
+    with open(file_name, "wb") as f:
+        f.write(PASSAGES_HEADER.pack(PASSAGES_MAGIC, PASSAGES_VERSION, len(data)))
+        f.write(data.tobytes())
+
+
+def _load_passages(file_name: str) -> array:
+    """Read a passage index file written by _save_passages."""
+    with open(file_name, "rb") as f:
+        magic, version, count = PASSAGES_HEADER.unpack(f.read(PASSAGES_HEADER.size))
+        if magic != PASSAGES_MAGIC or version != PASSAGES_VERSION:
+            raise ValueError(f"{file_name} is not a passage index of this version")
+        passages = array("q")
+        passages.frombytes(f.read(count * passages.itemsize))
+    if len(passages) != count:
+        raise ValueError(f"{file_name} is truncated")
+    if sys.byteorder != "little":
+        passages.byteswap()
+    return passages
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate maps and write their derived data ahead of the games")
+    parser.add_argument("maps", nargs="+", help="maps in the JSON or binary format")
+    parser.add_argument("--cache-dir", help="directory of the derived data, in the cache directory of the user by default")
+    parser.add_argument("--fields", action="store_true", help="also compute the distance fields to the end")
+    parser.add_argument("--compile", action="store_true",
+                        help=f"also write each map with its derived data and rules next to it, as <map>{COMPILED_EXTENSION}")
+    args = parser.parse_args()
+
+    registry = MapRegistry(args.cache_dir)
+    failed = 0
+    for map_file in args.maps:
+        try:
+            entry = registry.get(map_file)
+        except (OSError, ValueError) as error:
+            failed += 1
+            print(json.dumps({"map": map_file, "ok": False, "error": str(error)}))
+            continue
+        if args.fields:
+            entry.pathfinder()
+        if args.compile:
+            compile_map(entry, os.path.splitext(map_file)[0] + COMPILED_EXTENSION)
+        print(json.dumps({"map": map_file, "ok": True, "key": entry.key, "width": entry.width,
+                          "height": entry.height}))
+        registry.clear()
+    sys.exit(1 if failed else 0)
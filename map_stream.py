@@ -0,0 +1,297 @@
+import codecs
+import json
+import os
+import time
+from typing import Callable, Iterator, Optional
+
+READ_CHUNK_SIZE = 1 << 20  # Bytes read from the file at a time
+PROGRESS_INTERVAL = 0.5  # Seconds between two progress reports
+
+
+class LoadProgress:
+    """Progress of a streaming map load."""
+
+    def __init__(self, rows: int, bytes_read: int, total_bytes: int, elapsed: float):
+        """
+        Initialize a LoadProgress object.
+
+        Args:
+            rows (int): The number of map rows loaded so far.
+            bytes_read (int): The number of bytes read from the file so far.
+            total_bytes (int): The size of the file.
+            elapsed (float): Seconds since the load started.
+        """
+        self.__rows = rows
+        self.__bytes_read = bytes_read
+        self.__total_bytes = total_bytes
+        self.__elapsed = elapsed
+
+    @property
+    def rows(self) -> int:
+        """Get the number of rows loaded so far."""
+        return self.__rows
+
+    @property
+    def bytes_read(self) -> int:
+        """Get the number of bytes read so far."""
+        return self.__bytes_read
+
+    @property
+    def total_bytes(self) -> int:
+        """Get the size of the file."""
+        return self.__total_bytes
+
+    @property
+    def elapsed(self) -> float:
+        """Get the seconds since the load started."""
+        return self.__elapsed
+
+    @property
+    def fraction(self) -> float:
+        """Get the part of the file read so far, from 0 to 1."""
+        return self.__bytes_read / self.__total_bytes if self.__total_bytes else 1.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """Get the row throughput."""
+        return self.__rows / self.__elapsed if self.__elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Get the byte throughput."""
+        return self.__bytes_read / self.__elapsed if self.__elapsed > 0 else 0.0
+
+
+def print_progress(progress: LoadProgress) -> None:
+    """
+    Prints a one-line progress report of a map load.
+
+    Args:
+        progress (LoadProgress): The progress to report.
+    """
+    print(f"Loaded {progress.rows} rows, {progress.bytes_read / 1e6:.1f} MB "
+          f"({progress.fraction:.0%}) at {progress.bytes_per_second / 1e6:.1f} MB/s, "
+          f"{progress.rows_per_second:.0f} rows/s")
+
+
+class MapStreamReader:
+    """Reads a game map JSON file incrementally, one game_map row at a time."""
+
+    def __init__(self, file_name: str, progress: Optional[Callable[[LoadProgress], None]] = None,
+                 chunk_size: int = READ_CHUNK_SIZE):
+        """
+        Initialize a MapStreamReader object.
+
+        Args:
+            file_name (str): The name of the JSON file with the game map.
+            progress (callable, optional): Called with a LoadProgress while loading.
+            chunk_size (int): The number of bytes read from the file at a time.
+        """
+        self.__file_name = file_name
+        self.__progress = progress
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        self.__values = {}  # Top-level values other than game_map
+        self.__rows_done = False
+        self.__in_object = False  # True once a top-level key has been read
+        self.__object_closed = False
+
+        self.__file = None
+        self.__text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__buffer = ""
+        self.__pos = 0
+        self.__eof = False
+        self.__bytes_read = 0
+        self.__total_bytes = 0
+        self.__rows = 0
+        self.__started = 0.0
+        self.__last_report = 0.0
+
+    def rows(self) -> Iterator[list]:
+        """
+        Yield the rows of the game map as lists of cell dictionaries.
+
+        Top-level values met before the game map are kept for values(). The file is closed
+        when reading fails, when the progress callback raises or when the rows are abandoned.
+        """
+        try:
+            yield from self.__read_rows()
+        except BaseException:
+            self.__close()
+            raise
+
+    def values(self) -> dict:
+        """
+        Read the rest of the file and return its top-level values except the game map.
+
+        Returns:
+            dict: The top-level values by key, such as "items".
+        """
+        try:
+            if not self.__rows_done:
+                for _ in self.rows():
+                    pass
+            self.__seek_key(None)
+        finally:
+            self.__close()
+        return self.__values
+
+    def __read_rows(self) -> Iterator[list]:
+        """Yield the rows of the game map, see rows()."""
+        self.__open()
+        if not self.__seek_key("game_map"):
+            self.__rows_done = True
+            return
+
+        self.__expect("[")
+        if self.__peek() == "]":
+            self.__pos += 1
+        else:
+            while True:
+                yield self.__decode_value()
+                self.__rows += 1
+                self.__report()
+                if self.__next_separator("]"):
+                    break
+        self.__rows_done = True
+        self.__report(force=True)
+
+    def __open(self):
+        """Open the file and read the start of the top-level object."""
+        if self.__file is not None:
+            return
+        self.__file = open(self.__file_name, "rb")
+        try:
+            self.__total_bytes = os.fstat(self.__file.fileno()).st_size
+            self.__started = self.__last_report = time.perf_counter()
+            self.__expect("{")
+        except BaseException:
+            self.__close()
+            raise
+
+    def __close(self):
+        """Close the file."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __seek_key(self, key: Optional[str]) -> bool:
+        """
+        Read top-level entries until the given key, storing the others.
+
+        Args:
+            key (str, optional): The key to stop at, None reads to the end of the object.
+
+        Returns:
+            bool: True if the reader stopped in front of the value of the key.
+        """
+        if self.__file is None:
+            self.__open()
+        while not self.__object_closed:
+            if self.__in_object:
+                self.__object_closed = self.__next_separator("}")
+            elif self.__peek() == "}":
+                self.__pos += 1
+                self.__object_closed = True
+            if self.__object_closed:
+                break
+
+            self.__in_object = True
+            name = self.__decode_value()
+            self.__expect(":")
+            if name == key:
+                return True
+            if name == "game_map":
+                for _ in self.__skip_rows():
+                    pass
+            else:
+                self.__values[name] = self.__decode_value()
+        return False
+
+    def __skip_rows(self) -> Iterator[list]:
+        """Read the game map rows without keeping them."""
+        self.__expect("[")
+        if self.__peek() == "]":
+            self.__pos += 1
+            return
+        while True:
+            yield self.__decode_value()
+            if self.__next_separator("]"):
+                return
+
+    def __next_separator(self, closing: str) -> bool:
+        """Read a ',' or the closing bracket, returning True for the closing one."""
+        char = self.__peek()
+        if char == ",":
+            self.__pos += 1
+            return False
+        if char == closing:
+            self.__pos += 1
+            return True
+        raise ValueError(f"Expected ',' or '{closing}' in {self.__file_name}, found {char!r}")
+
+    def __expect(self, char: str):
+        """Read the given character, skipping whitespace."""
+        found = self.__peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in {self.__file_name}, found {found!r}")
+        self.__pos += 1
+
+    def __peek(self) -> str:
+        """Skip whitespace and return the next character, '' at the end of the file."""
+        while True:
+            buffer = self.__buffer
+            pos = self.__pos
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            self.__pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self.__read_more(self.__chunk_size):
+                return ""
+
+    def __decode_value(self):
+        """Decode the JSON value at the current position, reading more of the file as needed."""
+        self.__peek()
+        read_size = self.__chunk_size
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+            except json.JSONDecodeError:
+                if not self.__read_more(read_size):
+                    raise
+                read_size *= 2  # Grows the reads so a long row is not parsed again and again
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.__buffer) and isinstance(value, (int, float)) and self.__read_more(read_size):
+                continue
+            self.__pos = end
+            return value
+
+    def __read_more(self, size: int) -> bool:
+        """
+        Append the next part of the file to the buffer, dropping the consumed text.
+
+        Returns:
+            bool: False at the end of the file.
+        """
+        if self.__eof:
+            return False
+        data = self.__file.read(size)
+        self.__bytes_read += len(data)
+        if not data:
+            self.__eof = True
+        text = self.__text_decoder.decode(data, final=not data)
+        self.__buffer = self.__buffer[self.__pos:] + text
+        self.__pos = 0
+        return bool(data)
+
+    def __report(self, force: bool = False):
+        """Call the progress callback, at most once per PROGRESS_INTERVAL unless forced."""
+        if self.__progress is None:
+            return
+        now = time.perf_counter()
+        if force or now - self.__last_report >= PROGRESS_INTERVAL:
+            self.__last_report = now
+            self.__progress(LoadProgress(self.__rows, self.__bytes_read, self.__total_bytes,
+                                         now - self.__started))
@@ -0,0 +1,425 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from typing import Iterable, Iterator, List, Optional
+
+from cell_types import CELL_CODES, CELL_TYPES, PASSABLE, START, WINS, item_type
+from map_binary import open_binary_map
+from map_stream import MapStreamReader
+from maze import Maze
+
+# A connectivity index file holds the header (magic, version, width, height, number of
+# components), the component label of every cell as little-endian int32, -1 for cells that
+# are not passable, and one flag byte per component, 1 if it holds a cell heroes win on.
+INDEX_MAGIC = b"MAZL"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHIII")
+NO_COMPONENT = -1
+MAX_REPORTED = 20  # Issues of one kind listed in a report, the others are only counted
+
+
+class MapValidationError(ValueError):
+    """A map failed validation."""
+
+    def __init__(self, report: "ValidationReport"):
+        """
+        Initialize a MapValidationError object.
+
+        Args:
+            report (ValidationReport): The report with the errors.
+        """
+        super().__init__("; ".join(report.errors))
+        self.report = report
+
+
+class ConnectivityIndex:
+    """Connected components of the passable cells of a maze.
+
+    Components are labelled by one flood fill over the grid, after which reachability
+    queries are O(1). Moves between cells of a component may still be ruled out by the
+    turn-back rule, so a shared component means reachable ignoring that rule. Fire cells
+    are passable and do not split components. Build the index again if walls change.
+    """
+
+    def __init__(self, width: int, height: int, labels: array, exits: bytearray):
+        """
+        Initialize a ConnectivityIndex object.
+
+        Args:
+            width (int): The width of the maze.
+            height (int): The height of the maze.
+            labels (array): The component of every cell, -1 for cells that are not passable.
+            exits (bytearray): 1 for the components with a cell heroes win on.
+        """
+        self.__width = width
+        self.__height = height
+        self.__labels = labels
+        self.__exits = exits
+
+    @classmethod
+    def build(cls, maze: Maze) -> "ConnectivityIndex":
+        """
+        Labels the components of a maze in one pass.
+
+        Args:
+            maze (Maze): The maze.
+
+        Returns:
+            ConnectivityIndex: The index.
+        """
+        width, height = maze.width, maze.height
+        grid = maze.grid
+        passable = bytes(bool(PASSABLE[code]) if code < len(PASSABLE) else 0 for code in range(256))
+        unlabelled = bytearray(bytes(grid).translate(passable))
+        labels = array("i", [NO_COMPONENT]) * (width * height)
+        exits = bytearray()
+
+        seed = unlabelled.find(1)
+        while seed != -1:
+            label = len(exits)
+            has_exit = False
+            unlabelled[seed] = 0
+            labels[seed] = label
+            queue = deque((seed,))
+            while queue:
+                index = queue.popleft()
+                has_exit = has_exit or WINS[grid[index]]
+                x = index % width
+                for neighbour in (index - width if index >= width else -1,
+                                  index + width if index + width < len(labels) else -1,
+                                  index - 1 if x > 0 else -1,
+                                  index + 1 if x < width - 1 else -1):
+                    if neighbour >= 0 and unlabelled[neighbour]:
+                        unlabelled[neighbour] = 0
+                        labels[neighbour] = label
+                        queue.append(neighbour)
+            exits.append(has_exit)
+            seed = unlabelled.find(1, seed + 1)
+
+        return cls(width, height, labels, exits)
+
+    @property
+    def width(self) -> int:
+        """Get the width of the indexed maze."""
+        return self.__width
+
+    @property
+    def height(self) -> int:
+        """Get the height of the indexed maze."""
+        return self.__height
+
+    @property
+    def count(self) -> int:
+        """Get the number of components."""
+        return len(self.__exits)
+
+    @property
+    def labels(self) -> array:
+        """Get the component of every cell, indexed by y * width + x, -1 for cells that are not passable."""
+        return self.__labels
+
+    @property
+    def exits(self) -> bytearray:
+        """Get 1 for the components with a cell heroes win on, 0 for the others."""
+        return self.__exits
+
+    def label(self, position: tuple) -> int:
+        """
+        Get the component of a cell.
+
+        Args:
+            position (tuple): The position of the cell.
+
+        Returns:
+            int: The component, -1 outside the maze and for cells that are not passable.
+        """
+        x, y = position
+        if not (0 <= x < self.__width and 0 <= y < self.__height):
+            return NO_COMPONENT
+        return self.__labels[y * self.__width + x]
+
+    def connected(self, a: tuple, b: tuple) -> bool:
+        """
+        Check whether two cells are in the same component.
+
+        Args:
+            a (tuple): The position of a cell.
+            b (tuple): The position of another cell.
+
+        Returns:
+            bool: True if both are passable and connected.
+        """
+        label = self.label(a)
+        return label != NO_COMPONENT and label == self.label(b)
+
+    def has_exit(self, position: tuple) -> bool:
+        """
+        Check whether a cell heroes win on can be reached from a cell.
+
+        Args:
+            position (tuple): The position of the cell.
+
+        Returns:
+            bool: True if its component holds a cell such as the end.
+        """
+        label = self.label(position)
+        return label != NO_COMPONENT and bool(self.__exits[label])
+
+    def can_win(self, position: tuple, has_key: bool, key_positions: Iterable[tuple] = ()) -> bool:
+        """
+        Check whether a hero can still win, ignoring the turn-back rule and other heroes.
+
+        Args:
+            position (tuple): The position of the hero.
+            has_key (bool): True if the hero carries a key.
+            key_positions (Iterable[tuple]): The positions of the keys lying in the maze.
+
+        Returns:
+            bool: True if the hero can reach an exit, with a key on the way when it has none.
+        """
+        if not self.has_exit(position):
+            return False
+        return has_key or any(self.connected(position, key) for key in key_positions)
+
+    def component_sizes(self) -> List[int]:
+        """
+        Count the cells of every component.
+
+        Returns:
+            List[int]: The number of cells of each component, indexed by label.
+        """
+        sizes = [0] * len(self.__exits)
+        for label in self.__labels:
+            if label != NO_COMPONENT:
+                sizes[label] += 1
+        return sizes
+
+    def save(self, file_name: str) -> None:
+        """
+        Writes the index to a file.
+
+        Args:
+            file_name (str): The name of the index file.
+        """
+        labels = self.__labels
+        if sys.byteorder != "little":
+            labels = array("i", labels)
+            labels.byteswap()
+        with open(file_name, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.__width, self.__height, len(self.__exits)))
+            f.write(labels.tobytes())
+            f.write(self.__exits)
+
+    @classmethod
+    def load(cls, file_name: str) -> "ConnectivityIndex":
+        """
+        Reads an index written by save.
+
+        Args:
+            file_name (str): The name of the index file.
+
+        Returns:
+            ConnectivityIndex: The index.
+        """
+        with open(file_name, "rb") as f:
+            magic, version, width, height, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"{file_name} is not a connectivity index")
+            if version != INDEX_VERSION:
+                raise ValueError(f"{file_name} has unsupported version {version}")
+            labels = array("i")
+            labels.frombytes(f.read(width * height * labels.itemsize))
+            if sys.byteorder != "little":
+                labels.byteswap()
+            exits = bytearray(f.read(count))
+        if len(labels) != width * height or len(exits) != count:
+            raise ValueError(f"{file_name} is truncated")
+        return cls(width, height, labels, exits)
+
+
+class ValidationReport:
+    """Errors and warnings found in a map, and the connectivity index built to find them."""
+
+    def __init__(self):
+        """Initialize a ValidationReport object with no issues."""
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.index: Optional[ConnectivityIndex] = None
+        self.__counts = {}
+
+    @property
+    def ok(self) -> bool:
+        """Get whether the map has no errors."""
+        return not self.errors
+
+    def error(self, kind: str, message: str) -> None:
+        """
+        Adds an error, only the first MAX_REPORTED errors of a kind are kept.
+
+        Args:
+            kind (str): The kind of the error, used to limit the report size.
+            message (str): The description of the error.
+        """
+        self.__add(self.errors, kind, message)
+
+    def warning(self, kind: str, message: str) -> None:
+        """
+        Adds a warning, only the first MAX_REPORTED warnings of a kind are kept.
+
+        Args:
+            kind (str): The kind of the warning.
+            message (str): The description of the warning.
+        """
+        self.__add(self.warnings, kind, message)
+
+    def raise_for_errors(self) -> None:
+        """
+        Raises the errors of the report.
+
+        Raises:
+            MapValidationError: If the map has errors.
+        """
+        if self.errors:
+            raise MapValidationError(self)
+
+    def to_json(self) -> dict:
+        json_data = {"ok": self.ok, "errors": self.errors, "warnings": self.warnings,
+                     "issues": dict(self.__counts)}
+        if self.index is not None:
+            sizes = self.index.component_sizes()
+            json_data["components"] = len(sizes)
+            json_data["largest_component"] = max(sizes, default=0)
+        return json_data
+
+    def __add(self, issues: List[str], kind: str, message: str) -> None:
+        """Count an issue and keep its message if few of its kind were kept."""
+        count = self.__counts.get(kind, 0)
+        self.__counts[kind] = count + 1
+        if count < MAX_REPORTED:
+            issues.append(message)
+
+
+def check_rows(rows: Iterable[list], report: ValidationReport) -> Iterator[list]:
+    """
+    Passes the rows of a JSON map through, checking that the x and y of every cell match
+    its column and row and that its type is known.
+
+    Wrap the rows given to Maze.load_map_from_json, so the map is checked while it loads.
+
+    Args:
+        rows (Iterable[list]): The rows of cell dictionaries.
+        report (ValidationReport): Receives the issues.
+
+    Yields:
+        list: The rows, with unknown cell types replaced by walls.
+    """
+    for y, row in enumerate(rows):
+        for x, cell in enumerate(row):
+            if cell.get("x", x) != x or cell.get("y", y) != y:
+                report.error("coordinates", f"Cell at column {x}, row {y} says it is at "
+                                            f"({cell.get('x')}, {cell.get('y')})")
+            if cell.get("cell_type") not in CELL_CODES:
+                report.error("cell_type", f"Cell ({x}, {y}) has unknown type {cell.get('cell_type')!r}")
+                cell = dict(cell, cell_type=CELL_TYPES[0])
+                row[x] = cell
+        yield row
+
+
+def validate_map(maze: Maze, items: List[dict], report: Optional[ValidationReport] = None) -> ValidationReport:
+    """
+    Checks that a map can be played and won, and builds its connectivity index.
+
+    The map needs a start, an exit such as the end and a key. Items must lie on passable
+    cells, a key must be reachable from the start and an exit from that key.
+
+    Args:
+        maze (Maze): The maze of the map.
+        items (List[dict]): The items as dictionaries with x, y and name.
+        report (ValidationReport, optional): A report to add to, such as the one given to
+            check_rows while loading.
+
+    Returns:
+        ValidationReport: The report, with the index set.
+    """
+    report = report if report is not None else ValidationReport()
+    index = ConnectivityIndex.build(maze)
+    report.index = index
+
+    starts = maze.find_cells(CELL_TYPES[START])
+    if not starts:
+        report.error("start", "The map has no start cell")
+    elif len(starts) > 1:
+        report.warning("start", f"The map has {len(starts)} start cells, heroes use {starts[0]}")
+
+    if not any(WINS[code] and maze.find_cell(cell_type) for code, cell_type in enumerate(CELL_TYPES)):
+        report.error("exit", "The map has no end cell")
+
+    keys = []
+    for item in items:
+        position = (item["x"], item["y"])
+        if not (0 <= position[0] < maze.width and 0 <= position[1] < maze.height):
+            report.error("item", f"Item {item['name']!r} at {position} is outside the map")
+        elif index.label(position) == NO_COMPONENT:
+            report.error("item", f"Item {item['name']!r} at {position} lies on a {maze.get_cell_type(*position)}")
+        elif item_type(item["name"]).opens_end:
+            keys.append(position)
+
+    if not keys:
+        report.error("key", "The map has no key on a passable cell")
+    elif starts:
+        start = starts[0]
+        reachable_keys = [key for key in keys if index.connected(start, key)]
+        if not reachable_keys:
+            report.error("solvable", f"No key can be reached from the start {start}")
+        elif not any(index.has_exit(key) for key in reachable_keys):
+            report.error("solvable", f"No exit can be reached from the keys reachable from the start {start}")
+    return report
+
+
+def validate_map_file(file_name: str) -> ValidationReport:
+    """
+    Loads and checks a map in the JSON or binary format.
+
+    Args:
+        file_name (str): The name of the map.
+
+    Returns:
+        ValidationReport: The report.
+    """
+    report = ValidationReport()
+    maze = Maze()
+    if os.path.splitext(file_name)[1].lower() == ".json":
+        reader = MapStreamReader(file_name)
+        maze.load_map_from_json(check_rows(reader.rows(), report))
+        items = reader.values().get("items", [])
+    else:
+        binary_map = open_binary_map(file_name)
+        maze.load_grid(binary_map.width, binary_map.height, binary_map.grid)
+        items = binary_map.items
+    return validate_map(maze, items, report)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check that maps can be played and won")
+    parser.add_argument("maps", nargs="+", help="maps in the JSON or binary format")
+    parser.add_argument("--index-dir", help="directory to write the connectivity index of valid maps to")
+    args = parser.parse_args()
+
+    invalid = 0
+    for map_file in args.maps:
+        try:
+            map_report = validate_map_file(map_file)
+        except (OSError, ValueError) as error:
+            invalid += 1
+            print(json.dumps({"map": map_file, "ok": False, "errors": [str(error)]}))
+            continue
+        invalid += not map_report.ok
+        if args.index_dir and map_report.ok:
+            map_report.index.save(os.path.join(args.index_dir, os.path.basename(map_file) + ".index"))
+        print(json.dumps({"map": map_file, **map_report.to_json()}))
+    sys.exit(1 if invalid else 0)
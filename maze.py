@@ -1,19 +1,41 @@
-import json
-from typing import List
+from array import array
+from typing import BinaryIO, Callable, List, Optional
 from cell import Cell
+from cell_types import CELL_CODES, CELL_TYPES, FIRE, PASSAGE
 import random
 
+FIRE_CELLS_COUNT = 4  # Cells set on fire every round
+
+
 class Maze:
     """Represents the maze in the game."""
 
-    def __init__(self):
-        """Initialize the Maze object."""
-        self.__game_map = []  # Represents the game map with cells
+    def __init__(self, fire_cells_count: int = FIRE_CELLS_COUNT, seed: Optional[int] = None):
+        """Initialize the Maze object.
+
+        Args:
+            fire_cells_count (int): The number of cells set on fire every round.
+            seed (int, optional): The seed of the fire cells, random by default.
+        """
+        self.__grid = bytearray()  # Cell type codes, indexed by y * width + x
+        self.__width = 0
+        self.__height = 0
         self.__coord_fire_cells = []  # Stores coordinates of fire cells
+        self.__fire_slots = []  # Places of the fire cells in the passage index before the fire
+        self.__fire_cells_count = fire_cells_count
+        self.__random = random.Random(seed)
+        self.__passages = None  # Grid indexes of passage cells, built on first use
+        self.__passage_slots = None  # Place of every cell in passages by grid index, -1 if not a passage
+        self.__moved_slots = {}  # Grid index to its place when it differs from passage_slots, never shared
+        self.__change_listeners = []  # Called with the grid index of every changed cell
+        self.__version = 0  # Increased whenever cells change, such as fire cells
+        self.__json_rows = None  # Encoded JSON of each row, None for rows changed since encoding
 
     def get_cell(self, x_or_position, y=None):
         """Get the cell at the specified position.
 
+        The cell is created on demand, changing its type updates the maze.
+
         Args:
             x_or_position (int or tuple): The x coordinate of the cell or its position as a tuple.
             y (int, optional): The y coordinate of the cell.
@@ -22,11 +44,119 @@ class Maze:
             Cell: The cell at the specified position.
         """
         if y is None:
-            position = x_or_position
-            return self.__game_map[position[1]][position[0]]
+            x, y = x_or_position[0], x_or_position[1]
         else:
             x = x_or_position
-            return self.__game_map[y][x]
+        return Cell(x, y, self.get_cell_type(x, y), self)
+
+    def get_cell_type(self, x: int, y: int) -> str:
+        """Get the type of the cell at the specified position.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+
+        Returns:
+            str: The type of the cell.
+        """
+        return CELL_TYPES[self.__grid[self.__index(x, y)]]
+
+    def get_cell_code(self, x: int, y: int) -> int:
+        """Get the code of the type of the cell at the specified position.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+
+        Returns:
+            int: The code of the type, see cell_types.
+        """
+        return self.__grid[self.__index(x, y)]
+
+    def set_cell_type(self, x: int, y: int, cell_type: str):
+        """Change the type of the cell at the specified position.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+            cell_type (str): The new type of the cell.
+        """
+        self.set_cell_code(x, y, CELL_CODES[cell_type])
+
+    def set_cell_code(self, x: int, y: int, code: int):
+        """Change the type of the cell at the specified position to the type with a code.
+
+        Args:
+            x (int): The x coordinate of the cell.
+            y (int): The y coordinate of the cell.
+            code (int): The code of the new type.
+        """
+        index = self.__index(x, y)
+        if self.__passages is not None:
+            old_code = self.__grid[index]
+            if old_code == PASSAGE and code != PASSAGE:
+                self.__remove_passage(index)
+            elif code == PASSAGE and old_code != PASSAGE:
+                self.__add_passage(index)
+        self.__grid[index] = code
+        self.__version += 1
+        if self.__json_rows is not None:
+            self.__json_rows[y] = None
+        for listener in self.__change_listeners:
+            listener(index)
+
+    def add_change_listener(self, listener: Callable[[int], None]):
+        """Register a function called with the grid index of every cell whose type changes.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        self.__change_listeners.append(listener)
+
+    def remove_change_listener(self, listener: Callable[[int], None]):
+        """Unregister a function added with add_change_listener.
+
+        Args:
+            listener (callable): The function to remove.
+        """
+        self.__change_listeners.remove(listener)
+
+    def find_cells(self, cell_type: str) -> List[tuple]:
+        """Find all cells of a type.
+
+        Args:
+            cell_type (str): The type of the cells, such as "end".
+
+        Returns:
+            List[tuple]: The positions of the cells, row by row.
+        """
+        positions = []
+        code = bytes((CELL_CODES[cell_type],))
+        index = self.__grid.find(code)
+        while index != -1:
+            positions.append((index % self.__width, index // self.__width))
+            index = self.__grid.find(code, index + 1)
+        return positions
+
+    def find_cell(self, cell_type: str) -> Optional[tuple]:
+        """Find the first cell of a type, scanning rows from the top.
+
+        Args:
+            cell_type (str): The type of the cell, such as "start".
+
+        Returns:
+            tuple: The position of the cell, None if the maze has none.
+        """
+        index = self.__grid.find(bytes((CELL_CODES[cell_type],)))
+        if index == -1:
+            return None
+        return index % self.__width, index // self.__width
+
+    def __index(self, x: int, y: int) -> int:
+        """Get the grid index of a position, raising IndexError outside the maze."""
+        if not (0 <= x < self.__width and 0 <= y < self.__height):
+            raise IndexError(f"Position {(x, y)} is outside the maze")
+        return y * self.__width + x
 
     def load_map_from_json(self, cells):
         """Load the maze map from a JSON file.
@@ -34,73 +164,286 @@ class Maze:
         Args:
             cells (list): A list of dictionaries representing cell data.
         """
-        row_cell_obj = []
-        self.__game_map.clear()
+        grid = bytearray()
+        width = None
+        height = 0
 
         for row_cells_dict in cells:
-            row_cell_obj.clear()
-            for cell in row_cells_dict:
-                row_cell_obj.append(Cell(
-                    cell["x"],
-                    cell["y"],
-                    cell["cell_type"]
-                ))
-            self.__game_map.append(list(row_cell_obj))
+            row = bytes(CELL_CODES[cell["cell_type"]] for cell in row_cells_dict)
+            if width is None:
+                width = len(row)
+            elif len(row) != width:
+                raise ValueError(f"Row {height} has {len(row)} cells, expected {width}")
+            grid += row
+            height += 1
+
+        self.load_grid(width or 0, height, grid)
+
+    def load_grid(self, width: int, height: int, grid, passages: Optional[array] = None,
+                  passage_slots: Optional[array] = None):
+        """Load the maze map from cell type codes.
+
+        Args:
+            width (int): The width of the maze.
+            height (int): The height of the maze.
+            grid: Writable cell type codes indexed by y * width + x, such as a bytearray or
+                a copy-on-write memory map.
+            passages (array, optional): The grid indexes of the passage cells in ascending
+                order, as returned by passage_indexes, to skip the scan on first use.
+            passage_slots (array, optional): The place of every cell in passages, as returned
+                by build_passage_slots, built from passages by default. Passages are copied,
+                the slots are only read, so games loaded from one MapEntry share them.
+        """
+        if len(grid) != width * height:
+            raise ValueError(f"Grid has {len(grid)} cells, expected {width * height}")
+        self.__grid = grid
+        self.__width = width
+        self.__height = height
+        self.__version += 1
+        self.__coord_fire_cells.clear()
+        self.__fire_slots.clear()
+        self.__passages = None
+        self.__passage_slots = None
+        self.__moved_slots.clear()
+        self.__json_rows = None
+        if passages is not None:
+            self.__passages = array("q", passages)
+            if passage_slots is None:
+                self.__passage_slots = build_passage_slots(self.__passages, len(grid))
+            elif len(passage_slots) != len(grid):
+                raise ValueError(f"Passage slots have {len(passage_slots)} cells, expected {len(grid)}")
+            else:
+                self.__passage_slots = passage_slots
+
+    def seed(self, seed: Optional[int]):
+        """Reseed the random choice of fire cells.
+
+        Args:
+            seed (int, optional): The new seed, None for a random one.
+        """
+        self.__random.seed(seed)
+
+    @property
+    def random_state(self) -> tuple:
+        """Get the state of the random choice of fire cells, as returned by random.getstate."""
+        return self.__random.getstate()
+
+    @random_state.setter
+    def random_state(self, state: tuple):
+        self.__random.setstate(state)
+
+    @property
+    def fire_cells_count(self) -> int:
+        """Get the number of cells set on fire every round."""
+        return self.__fire_cells_count
+
+    @fire_cells_count.setter
+    def fire_cells_count(self, fire_cells_count: int):
+        self.__fire_cells_count = fire_cells_count
 
     def init_fire_cells(self):
-        """Initialize random cells as fire cells."""
-        random_passage_cell = random.sample(self.__get_passage_cell(), 4)
-        for cell in random_passage_cell:
-            cell.update_cell = "fire"
-            self.__coord_fire_cells.append(cell.position)
+        """Initialize random passage cells as fire cells.
 
-    def __get_passage_cell(self) -> List[Cell]:
-        """Get a list of passage cells in the maze.
+        Samples from the live index of passage cells, so a round costs O(fire cells) instead
+        of a scan of the whole maze.
+        """
+        passages = self.__get_passages()
+        count = min(self.__fire_cells_count, len(passages))
+        fire_indexes = [passages[slot] for slot in self.__random.sample(range(len(passages)), count)]
+        for index in fire_indexes:
+            x, y = index % self.__width, index // self.__width
+            self.__fire_slots.append(self.__get_slot(index))
+            self.set_cell_code(x, y, FIRE)
+            self.__coord_fire_cells.append((x, y))
+
+    def passage_indexes(self) -> array:
+        """Get the grid indexes of the passage cells in ascending order, without fire cells.
 
         Returns:
-            List[Cell]: A list of passage cells.
+            array: The grid indexes, a new array.
         """
-        passage_cells = []
-        for cell_row in self.__game_map:
-            for cell in cell_row:
-                if cell.cell_type == "passage":
-                    passage_cells.append(cell)
-        return passage_cells
+        passages = array("q")
+        passage_code = bytes((PASSAGE,))
+        index = self.__grid.find(passage_code)
+        while index != -1:
+            passages.append(index)
+            index = self.__grid.find(passage_code, index + 1)
+        return passages
+
+    def __get_passages(self) -> array:
+        """Get the grid indexes of passage cells, scanning the maze once on first use.
+
+        Returns:
+            array: The grid indexes of passage cells, in no particular order.
+        """
+        if self.__passages is None:
+            self.__passages = self.passage_indexes()
+            self.__passage_slots = build_passage_slots(self.__passages, len(self.__grid))
+            self.__moved_slots.clear()
+        return self.__passages
+
+    def __get_slot(self, index: int) -> int:
+        """Get the place of a cell in the passage index, -1 if it is not a passage."""
+        slot = self.__moved_slots.get(index)
+        return slot if slot is not None else self.__passage_slots[index]
+
+    def __set_slot(self, index: int, slot: int):
+        """Record the place of a cell in the passage index, leaving the shared slots untouched.
+
+        Fire moves few cells and putting it out moves them back, so the record stays small.
+        """
+        if self.__passage_slots[index] == slot:
+            self.__moved_slots.pop(index, None)
+        else:
+            self.__moved_slots[index] = slot
+
+    def __add_passage(self, index: int):
+        """Add a cell to the passage index."""
+        self.__set_slot(index, len(self.__passages))
+        self.__passages.append(index)
+
+    def __remove_passage(self, index: int):
+        """Remove a cell from the passage index by moving the last passage into its place."""
+        slot = self.__get_slot(index)
+        self.__set_slot(index, -1)
+        last = self.__passages.pop()
+        if last != index:
+            self.__passages[slot] = last
+            self.__set_slot(last, slot)
+
+    def __restore_passage_slot(self, index: int, slot: int):
+        """Move a passage just added back to the place it had before it was removed."""
+        last = len(self.__passages) - 1
+        if slot < last and self.__passages[last] == index:
+            other = self.__passages[slot]
+            self.__passages[slot] = index
+            self.__set_slot(index, slot)
+            self.__passages[last] = other
+            self.__set_slot(other, last)
 
     def put_out_fire_cell(self):
-        """Remove fire cells from the maze."""
-        for coord in self.__coord_fire_cells:
-            self.get_cell(coord[0], coord[1]).cell_type = "passage"
+        """Remove fire cells from the maze.
+
+        Cells are put out in reverse order and moved back to their old places in the passage
+        index, which undoes the fire exactly. The index then only depends on the grid, so a
+        game restored from a checkpoint samples the same fire cells as the original game.
+        """
+        if len(self.__fire_slots) == len(self.__coord_fire_cells):
+            slots = self.__fire_slots
+        else:
+            slots = [None] * len(self.__coord_fire_cells)
+
+        for (x, y), slot in zip(reversed(self.__coord_fire_cells), reversed(slots)):
+            self.set_cell_code(x, y, PASSAGE)
+            if slot is not None and self.__passages is not None:
+                self.__restore_passage_slot(y * self.__width + x, slot)
 
         self.__coord_fire_cells.clear()
+        self.__fire_slots.clear()
+
+    def set_fire_cells(self, coords: List[tuple]):
+        """Replace the coordinates of fire cells, used when restoring a saved game.
+
+        Args:
+            coords (List[tuple]): The coordinates of the fire cells.
+        """
+        self.__coord_fire_cells = [tuple(coord) for coord in coords]
+        self.__fire_slots.clear()
+
+    @property
+    def game_map(self) -> List[List[Cell]]:
+        """Get the game map as rows of cells, created on demand."""
+        return [[self.get_cell(x, y) for x in range(self.__width)] for y in range(self.__height)]
 
     @property
-    def game_map(self):
-        """Get the game map."""
-        return self.__game_map
+    def grid(self):
+        """Get the cell type codes of the maze, indexed by y * width + x."""
+        return self.__grid
 
     @property
     def coord_fire_cells(self) -> List[tuple]:
         """Get the coordinates of fire cells."""
         return self.__coord_fire_cells
 
+    @property
+    def version(self) -> int:
+        """Get a number that changes whenever a cell of the maze changes."""
+        return self.__version
+
     @property
     def width(self) -> int:
         """Get the width of the maze."""
-        return len(self.__game_map[0])
+        return self.__width
 
     @property
     def height(self) -> int:
         """Get the height of the maze."""
-        return len(self.__game_map)
+        return self.__height
 
     def to_json(self):
         """Convert the maze data to JSON format."""
-        json_map = []
-        for row in self.__game_map:
-            json_row = [cell.to_json() for cell in row]
-            json_map.append(json_row)
-
-        return json.dumps({
-            "game_map": json_map
-        })
+        return b"".join(self.__json_parts()).decode("utf-8")
+
+    def write_json(self, file: BinaryIO):
+        """Write the maze data in JSON format to a binary file, row by row.
+
+        Args:
+            file (BinaryIO): The file to write to.
+        """
+        for part in self.__json_parts():
+            file.write(part)
+
+    def __json_parts(self):
+        """Yield the JSON of the maze in parts, the same text as json.dumps of the cell dicts.
+
+        Encoded rows are kept and only rows with changed cells are encoded again, so saving a
+        large maze again after a round costs O(changed rows).
+        """
+        if self.__json_rows is None:
+            self.__json_rows = [None] * self.__height
+        rows = self.__json_rows
+        names = None  # JSON strings of the cell types by code, encoded once per call
+
+        yield b'{"game_map": ['
+        for y in range(self.__height):
+            row = rows[y]
+            if row is None:
+                if names is None:
+                    import json  # Imported on first use, games started from compiled maps may never save
+
+                    names = [json.dumps(cell_type) for cell_type in CELL_TYPES]
+                row = rows[y] = self.__encode_row(y, names)
+            if y > 0:
+                yield b", "
+            yield row
+        yield b"]}"
+
+    def __encode_row(self, y: int, names: List[str]) -> bytes:
+        """Encode a row as a JSON list of cell dicts.
+
+        Args:
+            y (int): The y coordinate of the row.
+            names (List[str]): The JSON strings of the cell types by code.
+        """
+        start = y * self.__width
+        cells = ", ".join(
+            f'{{"x": {x}, "y": {y}, "object_type": "cell", "cell_type": {names[code]}}}'
+            for x, code in enumerate(self.__grid[start:start + self.__width])
+        )
+        return f"[{cells}]".encode("utf-8")
+
+
+def build_passage_slots(passages: array, size: int) -> array:
+    """Get the place of every cell in a passage index.
+
+    Args:
+        passages (array): The grid indexes of the passage cells.
+        size (int): The number of cells of the maze.
+
+    Returns:
+        array: The place in passages by grid index, -1 for cells that are not passages.
+    """
+    slots = array("q", [-1]) * size
+    for slot, index in enumerate(passages):
+        slots[index] = slot
+    return slots
@@ -0,0 +1,1005 @@
+import json
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+import events
+from cell_types import CELL_BEHAVIOURS, WALL, CellType, item_type
+from events import GameEvent
+from game_object import GameObject
+from instrumentation import (ACTION_SPAN, COLLISION_SPAN, DEATHS, DECIDE_SPAN, FIRE_CLEANUP_SPAN,
+                             FIRE_DAMAGE, FIRE_INIT_SPAN, LOOKUPS, ROUND_SPAN, ROUNDS, WALLS_HIT, Metrics)
+from map_binary import BinaryMap, open_binary_map
+from map_stream import LoadProgress, MapStreamReader
+from map_validator import ConnectivityIndex, ValidationReport, check_rows, validate_map
+from maze import Maze
+from hero import KNIGHT_HEALTH, Hero
+from item import Item
+from spatial_index import SpatialIndex
+
+if TYPE_CHECKING:
+    # Snapshots and map registries are imported on first use, which keeps the startup of
+    # games that never save or share maps short
+    from compiled_map import MapEntry
+    from snapshot import SnapshotState
+
+HERO_ACTIONS = ("l", "r", "d", "u", "a", "h", "p")
+ACTION_NAMES = {"l": "move", "r": "move", "d": "move", "u": "move", "a": "attack", "h": "heal", "p": "pick"}
+DEFAULT_METRICS_INTERVAL = 1.0  # Seconds between two flushes of the metrics
+
+
+class MazeEngine:
+    """Headless game logic of the Maze Game, driven by actions and reporting events."""
+
+    def __init__(self, heroes: Optional[List[Hero]] = None, maze: Optional[Maze] = None,
+                 seed: Optional[int] = None, metrics: Optional[Metrics] = None,
+                 metrics_interval: float = DEFAULT_METRICS_INTERVAL):
+        """
+        Initialize MazeEngine object.
+
+        Args:
+            heroes (List[Hero], optional): The heroes taking part in the game.
+            maze (Maze, optional): The maze to play in, an empty maze by default.
+            seed (int, optional): The seed of the fire cells, used to reseed the maze.
+            metrics (Metrics, optional): Records timings and counters of the rounds, nothing
+                is measured without it.
+            metrics_interval (float): The seconds between two flushes of the metrics, which
+                are also flushed when the game ends.
+        """
+        self.__maze = maze if maze is not None else Maze()
+        if seed is not None:
+            self.__maze.seed(seed)
+        self.__game_objects: Dict[int, GameObject] = {}  # Items by id, in the order they were added
+        self.__objects_index = SpatialIndex()  # Items and heroes by position
+        self.__heroes = []
+        self.__is_end = False
+        self.__round_number = 0
+        self.__damage_causes = {}  # Hero name to the cause of the last damage taken
+        self.__round_events = []
+        self.__event_listeners = []
+        self.__action_listeners = []
+        self.__round_listeners = []
+        self.__snapshot_file = None  # Snapshot file that delta snapshots are appended to
+        self.__snapshot_changes = None  # Grid indexes changed since the last snapshot
+        self.__metrics = metrics
+        self.__metrics_interval = metrics_interval
+        self.__metrics_flushed = time.perf_counter()
+        self.__connectivity = None  # Components of the maze, built on first use
+        self.__decisions = {}  # Actions of the heroes controlled by the decide batch of the round
+
+        for hero in heroes or []:
+            self.add_hero(hero)
+
+    @property
+    def maze(self) -> Maze:
+        """Get the maze."""
+        return self.__maze
+
+    @property
+    def heroes(self) -> List[Hero]:
+        """Get the heroes still in the game, in turn order."""
+        return self.__heroes
+
+    @property
+    def game_objects(self) -> List[GameObject]:
+        """Get the items lying in the maze, in the order they were added."""
+        return list(self.__game_objects.values())
+
+    @property
+    def is_end(self) -> bool:
+        """Get whether a hero has won."""
+        return self.__is_end
+
+    @property
+    def decided_heroes(self) -> List[str]:
+        """Get the names of the heroes whose actions came from the decide batch of the last round."""
+        return list(self.__decisions)
+
+    @property
+    def is_over(self) -> bool:
+        """Get whether the game is finished, won or with every hero eliminated."""
+        return self.__is_end or not self.__heroes
+
+    @property
+    def round_number(self) -> int:
+        """Get the number of the current or last played round."""
+        return self.__round_number
+
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        """Get the metrics of the rounds, None when instrumentation is off."""
+        return self.__metrics
+
+    @metrics.setter
+    def metrics(self, metrics: Optional[Metrics]):
+        self.__metrics = metrics
+
+    def add_hero(self, hero: Hero) -> None:
+        """
+        Adds a hero to the game.
+
+        Args:
+            hero (Hero): The hero to add.
+
+        Raises:
+            ValueError: If a hero with the same name is already in the game.
+        """
+        if hero in self.__heroes:
+            raise ValueError(f"A hero with the name {hero.name} already exists")
+        self.__heroes.append(hero)
+        self.__objects_index.add(hero)
+
+    def add_event_listener(self, listener: Callable[[GameEvent], None]) -> None:
+        """
+        Registers a function called with every event as soon as it happens.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        self.__event_listeners.append(listener)
+
+    def add_action_listener(self, listener: Callable[[Hero, Optional[str]], None]) -> None:
+        """
+        Registers a function called with every action chosen for a hero, None for a skipped
+        turn, before the action is applied.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        self.__action_listeners.append(listener)
+
+    def add_round_listener(self, listener: Callable[[int, List[GameEvent]], None]) -> None:
+        """
+        Registers a function called at the end of every round with its number and events.
+
+        Args:
+            listener (callable): The function to call.
+        """
+        self.__round_listeners.append(listener)
+
+    def load_game_map_from_json(self, file_name: str,
+                                progress: Optional[Callable[[LoadProgress], None]] = None,
+                                validate: bool = False) -> None:
+        """
+        Loads the game map from a JSON file.
+
+        The file is streamed, the maze is built row by row without parsing the whole file at once.
+
+        Args:
+            file_name (str): The name of the JSON file containing the game map.
+            progress (callable, optional): Called with a LoadProgress while the map loads.
+            validate (bool): True to check the cells while they load and the map once loaded.
+
+        Raises:
+            MapValidationError: If validate is True and the map is invalid or cannot be won.
+        """
+        reader = MapStreamReader(file_name, progress)
+        report = ValidationReport() if validate else None
+        self.__maze.load_map_from_json(check_rows(reader.rows(), report) if validate else reader.rows())
+        self.__stop_snapshot_tracking()
+        items = reader.values().get("items", [])
+        self.set_items(items)
+        self.__connectivity = None
+        if validate:
+            self.__validate(items, report)
+
+    def load_game_map_from_binary(self, file_name: str, validate: bool = False) -> None:
+        """
+        Loads the game map from a file in the binary map format.
+
+        Args:
+            file_name (str): The name of the binary file containing the game map.
+            validate (bool): True to check the map once loaded.
+
+        Raises:
+            MapValidationError: If validate is True and the map cannot be won.
+        """
+        self.load_binary_map(open_binary_map(file_name), validate)
+
+    def load_binary_map(self, binary_map: BinaryMap, validate: bool = False) -> None:
+        """
+        Loads the game map from an opened binary map.
+
+        The maze plays on the grid of the binary map, so a map opened once can be loaded by
+        game after game. Fire cells are put out at the end of every round, which leaves the
+        grid as it was.
+
+        Args:
+            binary_map (BinaryMap): The opened map.
+            validate (bool): True to check the map once loaded.
+
+        Raises:
+            MapValidationError: If validate is True and the map cannot be won.
+        """
+        self.__maze.load_grid(binary_map.width, binary_map.height, binary_map.grid)
+        self.__stop_snapshot_tracking()
+        self.set_items(binary_map.items)
+        self.__connectivity = None
+        if validate:
+            self.__validate(binary_map.items)
+
+    def load_map_entry(self, entry: "MapEntry") -> None:
+        """
+        Loads the game map from a map kept by a MapRegistry or read by load_compiled_map.
+
+        The game plays on its own copy of the grid and takes the passage and connectivity
+        indexes of the entry as they are, so nothing is parsed, scanned or validated again.
+
+        Args:
+            entry (MapEntry): The map, validated when it was first loaded.
+        """
+        self.__maze.load_grid(entry.width, entry.height, entry.new_grid(), entry.passages, entry.passage_slots)
+        self.__stop_snapshot_tracking()
+        self.set_items(entry.items)
+        self.__connectivity = entry.connectivity
+
+    def __validate(self, items: List[dict], report: Optional[ValidationReport] = None) -> None:
+        """Check the loaded map and keep the connectivity index built by the check."""
+        report = validate_map(self.__maze, items, report)
+        self.__connectivity = report.index
+        report.raise_for_errors()
+
+    @property
+    def connectivity(self) -> ConnectivityIndex:
+        """Get the connected components of the maze, built on first use after a map is loaded."""
+        if self.__connectivity is None:
+            self.__connectivity = ConnectivityIndex.build(self.__maze)
+        return self.__connectivity
+
+    def can_win(self, hero: Hero) -> bool:
+        """
+        Check whether a hero can still reach the end with a key, ignoring the turn-back rule
+        and the keys carried by other heroes.
+
+        Args:
+            hero (Hero): The hero.
+
+        Returns:
+            bool: False if the hero can no longer win.
+        """
+        has_key = any(item_type(item.name).opens_end for item in hero.pocket)
+        keys = [obj.position for obj in self.__game_objects.values() if item_type(obj.name).opens_end]
+        return self.connectivity.can_win(hero.position, has_key, keys)
+
+    def set_items(self, items: List[dict]) -> None:
+        """
+        Replaces the items of the game.
+
+        Args:
+            items (List[dict]): The items as dictionaries with x, y and name.
+        """
+        for obj in self.__game_objects.values():
+            self.__objects_index.remove(obj)
+        self.__game_objects.clear()
+
+        for item in items:
+            self.__add_game_object(Item(item["x"], item["y"], item["name"]))
+
+    def __add_game_object(self, obj: GameObject):
+        """
+        Add a game object to the game and the position index.
+
+        Args:
+            obj (GameObject): The object to add.
+        """
+        self.__game_objects[id(obj)] = obj
+        self.__objects_index.add(obj)
+
+    def __remove_game_object(self, obj: GameObject):
+        """
+        Remove a game object from the game and the position index.
+
+        Args:
+            obj (GameObject): The object to remove.
+        """
+        del self.__game_objects[id(obj)]
+        self.__objects_index.remove(obj)
+
+    def save_snapshot(self, file_name: str, delta: bool = False) -> None:
+        """
+        Saves the game state to a binary snapshot file.
+
+        A full snapshot overwrites the file. A delta snapshot is appended to the file of the
+        previous snapshot and stores only the cells changed since then, so it can be taken
+        every round without writing the map again.
+
+        Args:
+            file_name (str): The name of the snapshot file.
+            delta (bool): True to append a delta snapshot.
+        """
+        from snapshot import encode_delta, encode_full
+
+        if delta:
+            if self.__snapshot_changes is None or file_name != self.__snapshot_file:
+                raise ValueError(f"A delta snapshot needs a full snapshot in {file_name} first")
+            record = encode_delta(self.__maze, self.__snapshot_changes, self.__heroes,
+                                  self.game_objects, self.__is_end)
+            mode = "ab"
+        else:
+            record = encode_full(self.__maze, self.__heroes, self.game_objects, self.__is_end)
+            mode = "wb"
+
+        with open(file_name, mode) as file:
+            file.write(record)
+        self.__start_snapshot_tracking(file_name)
+
+    def restore_snapshot(self, file_name: str) -> None:
+        """
+        Restores the game state from a snapshot file.
+
+        Args:
+            file_name (str): The name of the snapshot file.
+        """
+        from snapshot import read_snapshots
+
+        self.__load_state(read_snapshots(file_name))
+        self.__start_snapshot_tracking(file_name)
+
+    def checkpoint(self) -> bytes:
+        """
+        Encodes the whole game state between rounds, including the round number and the state
+        of the random fire cells, so a restored game plays on exactly like this one.
+
+        Returns:
+            bytes: The encoded checkpoint.
+        """
+        from snapshot import encode_checkpoint
+
+        version, internal_state, gauss_next = self.__maze.random_state
+        return encode_checkpoint(self.__maze, self.__heroes, self.game_objects, self.__is_end, {
+            "round_number": self.__round_number,
+            "random_state": [version, list(internal_state), gauss_next],
+            "damage_causes": self.__damage_causes,
+        })
+
+    def restore_checkpoint(self, data: bytes) -> None:
+        """
+        Restores the game state from a checkpoint.
+
+        Args:
+            data (bytes): A checkpoint returned by checkpoint.
+        """
+        from snapshot import decode_checkpoint
+
+        state, extras = decode_checkpoint(data)
+        self.__load_state(state)
+        self.__stop_snapshot_tracking()
+        version, internal_state, gauss_next = extras["random_state"]
+        self.__maze.random_state = (version, tuple(internal_state), gauss_next)
+        self.__round_number = extras["round_number"]
+        self.__damage_causes = dict(extras["damage_causes"])
+
+    def __load_state(self, state: "SnapshotState") -> None:
+        """
+        Replaces the maze, heroes and items with a saved state.
+
+        Args:
+            state (SnapshotState): The saved state.
+        """
+        self.__maze.load_grid(state.width, state.height, state.grid)
+        self.__maze.set_fire_cells(state.fire_cells)
+        self.__is_end = state.is_end
+
+        for hero in self.__heroes:
+            self.__objects_index.remove(hero)
+        self.__heroes = []
+        for hero in state.heroes:
+            self.add_hero(hero)
+
+        for obj in self.__game_objects.values():
+            self.__objects_index.remove(obj)
+        self.__game_objects.clear()
+        for item in state.items:
+            self.__add_game_object(item)
+
+    def __start_snapshot_tracking(self, file_name: str) -> None:
+        """
+        Starts collecting the cells changed after a snapshot.
+
+        Args:
+            file_name (str): The name of the snapshot file.
+        """
+        if self.__snapshot_changes is None:
+            self.__snapshot_changes = set()
+            self.__maze.add_change_listener(self.__snapshot_changes.add)
+        else:
+            self.__snapshot_changes.clear()
+        self.__snapshot_file = file_name
+
+    def __stop_snapshot_tracking(self) -> None:
+        """Stops collecting changed cells, a new map needs a full snapshot."""
+        if self.__snapshot_changes is not None:
+            self.__maze.remove_change_listener(self.__snapshot_changes.add)
+        self.__snapshot_changes = None
+        self.__snapshot_file = None
+
+    @staticmethod
+    def __is_in_map(position: tuple, height: int, width: int) -> bool:
+        """
+        Check if a position is within the map boundaries.
+
+        Args:
+            position (tuple): The position to check.
+            height (int): The height of the map.
+            width (int): The width of the map.
+
+        Returns:
+            bool: True if the position is within the map boundaries, False otherwise.
+        """
+        return 0 <= position[0] < width and 0 <= position[1] < height
+
+    @staticmethod
+    def __check_hero_returns(current_direction: str, old_direction: str) -> bool:
+        """
+        Check if the hero is trying to move back in the same direction.
+
+        Args:
+            current_direction (str): The current direction the hero is trying to move.
+            old_direction (str): The previous direction the hero moved.
+
+        Returns:
+            bool: True if the hero is trying to move back in the same direction, False otherwise.
+        """
+        return_direction = {"l": "r", "r": "l", "u": "d", "d": 'u'}
+        if return_direction[current_direction] == old_direction:
+            return True
+        return False
+
+    @staticmethod
+    def __check_win(hero: Hero) -> bool:
+        """
+        Check if the hero has won.
+
+        Args:
+            hero (Hero): The hero to check.
+
+        Returns:
+            bool: True if the hero has won, False otherwise.
+        """
+        for item in hero.pocket:
+            if item_type(item.name).opens_end:
+                return True
+        return False
+
+    def step_round(self, actions: Dict[str, Optional[str]]) -> List[GameEvent]:
+        """
+        Plays a round from a batch of hero actions.
+
+        A hero without an action skips the turn, a rejected action such as healing without
+        medical kits costs the turn.
+
+        Args:
+            actions (Dict[str, str]): The action of each hero by name, one of HERO_ACTIONS.
+
+        Returns:
+            List[GameEvent]: The events of the round.
+        """
+        return self.play_round(lambda hero: actions.get(hero.name))
+
+    def play_round(self, choose_action: Callable[[Hero], Optional[str]],
+                   retry_rejected: bool = False,
+                   decide: Optional[Callable[[List[Hero]], Dict[str, Optional[str]]]] = None) -> List[GameEvent]:
+        """
+        Plays a round, asking for the action of each hero when its turn comes.
+
+        Args:
+            choose_action (callable): Returns the action of a hero, None to skip the turn.
+            retry_rejected (bool): True to ask again after a rejected action instead of
+                ending the turn.
+            decide (callable, optional): Called once per round, after the fire cells are set,
+                with the heroes in turn order. Returns the actions of the heroes it controls
+                by name, such as bots, which are not asked with choose_action and are not
+                asked again after a rejected action.
+
+        Returns:
+            List[GameEvent]: The events of the round.
+        """
+        metrics = self.__metrics
+        round_start = self.__start_round()
+
+        decisions = self.__decisions = {}
+        if decide is not None:
+            if metrics is not None:
+                start = time.perf_counter()
+            decisions = self.__decisions = decide(list(self.__heroes))
+            if metrics is not None:
+                metrics.observe(DECIDE_SPAN, time.perf_counter() - start)
+
+        for hero in list(self.__heroes):
+            self.__emit(events.TURN_STARTED, hero.name, fire_cells=list(self.__maze.coord_fire_cells))
+
+            if self.__check_hero_dead(hero):
+                self.__hero_dead_logic(hero)
+                continue
+
+            while True:
+                decided = hero.name in decisions
+                action = decisions[hero.name] if decided else choose_action(hero)
+                for listener in self.__action_listeners:
+                    listener(hero, action)
+                if action is None:
+                    self.__emit(events.TURN_SKIPPED, hero.name)
+                    break
+                if self.__hero_action(hero, action) or not retry_rejected or decided:
+                    break
+
+            if self.__check_hero_dead(hero):
+                self.__hero_dead_logic(hero)
+
+            self.__emit(events.TURN_ENDED, hero.name)
+
+        return self.__finish_round(round_start)
+
+    def step_round_vectorized(self, moves: Dict[str, Optional[str]]) -> List[GameEvent]:
+        """
+        Plays a round from a batch of hero moves, resolving the moves of every hero at once.
+
+        The round gives the heroes, the maze and the events of step_round with the same moves,
+        since a move never depends on the moves of the other heroes. Needs NumPy, see
+        vector_round.
+
+        Args:
+            moves (Dict[str, str]): The move of each hero by name, one of "l", "r", "u" and "d".
+                A hero without a move skips the turn.
+
+        Returns:
+            List[GameEvent]: The events of the round.
+
+        Raises:
+            ValueError: If an action is not a move, such as attacking or picking an item.
+        """
+        from vector_round import DIRECTION_CODES, DIRECTIONS, DX, DY, SCARED, HeroArrays, VectorMaze
+
+        for name, action in moves.items():
+            if action is not None and action not in DIRECTIONS[1:]:
+                raise ValueError(f"{action!r} of {name} is not a move, play it with step_round")
+
+        round_start = self.__start_round()
+        heroes = list(self.__heroes)
+        arrays = HeroArrays.from_heroes(heroes)
+        directions = [DIRECTION_CODES[moves.get(hero.name) or ""] for hero in heroes]
+        outcomes, _ = VectorMaze(self.__maze, self.game_objects).resolve_moves(arrays, directions)
+
+        # The events are emitted in turn order, so meetings and dropped items are seen as in step_round
+        for i, hero in enumerate(heroes):
+            self.__emit(events.TURN_STARTED, hero.name, fire_cells=list(self.__maze.coord_fire_cells))
+
+            if self.__check_hero_dead(hero):
+                self.__hero_dead_logic(hero)
+                continue
+
+            action = moves.get(hero.name)
+            for listener in self.__action_listeners:
+                listener(hero, action)
+            if action is None:
+                self.__emit(events.TURN_SKIPPED, hero.name)
+            else:
+                direction = directions[i]
+                target = (hero.x + int(DX[direction]), hero.y + int(DY[direction]))
+                # Stepping on the target first keeps the order of the heroes met as in step_round
+                hero.position = target
+                hero.position = (int(arrays.x[i]), int(arrays.y[i]))
+                if outcomes[i] == SCARED:
+                    self.__hero_scared_logic(hero)
+                elif self.__hero_cell_logic(hero, self.__get_cell(target)):
+                    hero.old_direction = DIRECTIONS[arrays.old_direction[i]]
+                    self.__collide(hero)
+
+            if self.__check_hero_dead(hero):
+                self.__hero_dead_logic(hero)
+
+            self.__emit(events.TURN_ENDED, hero.name)
+
+        return self.__finish_round(round_start)
+
+    def __start_round(self) -> Optional[float]:
+        """
+        Starts a round and sets its fire cells.
+
+        Returns:
+            float: The time the round started at, None without metrics.
+        """
+        metrics = self.__metrics
+        round_start = time.perf_counter() if metrics is not None else None
+
+        self.__round_events = []
+        self.__round_number += 1
+        self.__emit(events.ROUND_STARTED, round=self.__round_number)
+
+        if metrics is not None:
+            start = time.perf_counter()
+        self.__maze.init_fire_cells()
+        if metrics is not None:
+            metrics.observe(FIRE_INIT_SPAN, time.perf_counter() - start)
+        return round_start
+
+    def __finish_round(self, round_start: Optional[float]) -> List[GameEvent]:
+        """
+        Puts out the fire cells of a round and reports the end of the round.
+
+        Args:
+            round_start (float, optional): The time the round started at, as returned by
+                __start_round.
+
+        Returns:
+            List[GameEvent]: The events of the round.
+        """
+        metrics = self.__metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        self.__maze.put_out_fire_cell()
+        if metrics is not None:
+            metrics.observe(FIRE_CLEANUP_SPAN, time.perf_counter() - start)
+
+        if self.__is_end:
+            self.__emit(events.GAME_OVER)
+        elif len(self.__heroes) == 0:
+            self.__emit(events.ALL_ELIMINATED)
+
+        if metrics is not None:
+            metrics.increment(ROUNDS)
+            now = time.perf_counter()
+            metrics.observe(ROUND_SPAN, now - round_start)
+            if self.is_over or now - self.__metrics_flushed >= self.__metrics_interval:
+                self.__metrics_flushed = now
+                metrics.flush()
+
+        for listener in self.__round_listeners:
+            listener(self.__round_number, self.__round_events)
+        return self.__round_events
+
+    def __emit(self, kind: str, hero: Optional[str] = None, **data) -> None:
+        """
+        Records an event of the current round and passes it to the listeners.
+
+        Args:
+            kind (str): The kind of the event.
+            hero (str, optional): The name of the hero the event is about.
+            **data: The details of the event.
+        """
+        event = GameEvent(kind, hero, **data)
+        self.__round_events.append(event)
+        for listener in self.__event_listeners:
+            listener(event)
+
+    def __hero_action(self, hero: Hero, action: str) -> bool:
+        """
+        Apply an action of a hero.
+
+        Args:
+            hero (Hero): The hero.
+            action (str): The action, one of HERO_ACTIONS.
+
+        Returns:
+            bool: True if the action was carried out, False if it was rejected.
+        """
+        if self.__metrics is None:
+            return self.__apply_action(hero, action)
+
+        start = time.perf_counter()
+        carried_out = self.__apply_action(hero, action)
+        self.__metrics.observe(ACTION_SPAN, time.perf_counter() - start, action=ACTION_NAMES.get(action, "invalid"))
+        return carried_out
+
+    def __apply_action(self, hero: Hero, action: str) -> bool:
+        """
+        Carry out an action of a hero.
+
+        Args:
+            hero (Hero): The hero.
+            action (str): The action, one of HERO_ACTIONS.
+
+        Returns:
+            bool: True if the action was carried out, False if it was rejected.
+        """
+        match action:
+            case "l" | "r" | "d" | "u":
+                self.__hero_move_logic(hero, action)
+                return True
+
+            case "h":
+                return self.__hero_heal_logic(hero)
+
+            case "a":
+                return self.__hero_attack_logic(hero)
+
+            case "p":
+                return self.__hero_pick_item_logic(hero)
+
+            case _:
+                self.__emit(events.INVALID_ACTION, hero.name, action=action)
+                return False
+
+    def __get_cell(self, position: tuple) -> CellType:
+        """
+        Get the type of cell at a given position.
+
+        Args:
+            position (tuple): The position to check.
+
+        Returns:
+            CellType: The type of cell at the given position, walls outside the map.
+        """
+        if not self.__is_in_map(position, self.__maze.height, self.__maze.width):
+            return CELL_BEHAVIOURS[WALL]
+        return CELL_BEHAVIOURS[self.__maze.get_cell_code(position[0], position[1])]
+
+    def objects_at(self, position: tuple) -> List[GameObject]:
+        """
+        Get the items and heroes at a position.
+
+        Args:
+            position (tuple): The position to look up.
+
+        Returns:
+            List[GameObject]: The objects at the position.
+        """
+        if self.__metrics is not None:
+            self.__metrics.increment(LOOKUPS)
+        return list(self.__objects_index.get(position))
+
+    def __get_game_object(self, hero: Hero) -> List[GameObject]:
+        """
+        Get game objects at hero's position.
+
+        Args:
+            hero (Hero): The hero.
+
+        Returns:
+            List[GameObject]: A list of GameObjects at the hero's position.
+        """
+        if self.__metrics is not None:
+            self.__metrics.increment(LOOKUPS)
+        return [obj for obj in self.__objects_index.get(hero.position) if obj is not hero]
+
+    def __collider_with_game_objects(self, hero: Hero):
+        """
+        Handle collisions with game objects.
+
+        Args:
+            hero (Hero): The hero.
+        """
+        for obj in self.__get_game_object(hero):
+            match obj.object_type:
+                case "hero":
+                    self.__emit(events.HERO_MET, hero.name, other=obj.name)
+                case "item":
+                    if item_type(obj.name).heals:
+                        hero.health = KNIGHT_HEALTH
+                        self.__emit(events.HEART_FOUND, hero.name, health=hero.health)
+                    else:
+                        self.__emit(events.ITEM_FOUND, hero.name, item=obj.name)
+
+    @staticmethod
+    def __check_hero_dead(hero: Hero):
+        """
+        Check if the hero is dead.
+
+        Args:
+            hero (Hero): The hero.
+
+        Returns:
+            bool: True if the hero is dead, False otherwise.
+        """
+        if hero.health <= 0:
+            return True
+        else:
+            return False
+
+    def __remove_dead_heroes(self, hero):
+        """
+        Remove dead heroes from the game.
+
+        Args:
+            hero: The hero to remove.
+        """
+        self.__heroes.remove(hero)
+        self.__objects_index.remove(hero)
+
+    def __hero_move_logic(self, hero: Hero, direction: str):
+        """
+        Handle hero's movement logic.
+
+        Args:
+            hero (Hero): The hero.
+            direction (str): The direction in which the hero wants to move.
+        """
+        old_cell = self.__get_cell(hero.position)
+        old_position = hero.position
+        hero.move(direction)
+
+        if self.__check_hero_returns(direction, hero.old_direction) and not old_cell.turn_back:
+            self.__hero_scared_logic(hero)
+            return
+
+        current_cell = self.__get_cell(hero.position)
+
+        if not current_cell.passable:
+            hero.position = old_position
+
+        if not self.__hero_cell_logic(hero, current_cell):
+            return
+
+        if not current_cell.turn_back and hero.position != old_position and not old_cell.turn_back:
+            hero.old_direction = direction
+
+        self.__collide(hero)
+
+    def __hero_scared_logic(self, hero: Hero):
+        """
+        Handle a hero turning back, which scares it to death.
+
+        Args:
+            hero (Hero): The hero.
+        """
+        hero.die()
+        self.__damage_causes[hero.name] = "scared"
+        self.__emit(events.SCARED, hero.name)
+
+    def __hero_cell_logic(self, hero: Hero, current_cell: CellType) -> bool:
+        """
+        Handle the damage and the end of the cell a hero moved to or bumped into.
+
+        Args:
+            hero (Hero): The hero, already on its new position.
+            current_cell (CellType): The type of the cell the hero moved to.
+
+        Returns:
+            bool: False if the golem killed the hero, True if the move goes on.
+        """
+        if current_cell.damage:
+            # The cause of the damage is the name of the cell type, such as "wall" or "fire"
+            hero.get_damage(current_cell.damage)
+            self.__damage_causes[hero.name] = current_cell.name
+            if not current_cell.passable:
+                if self.__metrics is not None:
+                    self.__metrics.increment(WALLS_HIT)
+                self.__emit(events.HIT_WALL, hero.name, health=hero.health)
+            else:
+                if self.__metrics is not None:
+                    self.__metrics.increment(FIRE_DAMAGE)
+                self.__emit(events.ON_FIRE, hero.name, health=hero.health)
+
+        if current_cell.wins:
+            if self.__check_win(hero):
+                self.__emit(events.WON, hero.name)
+                self.__is_end = True
+            else:
+                hero.die()
+                self.__damage_causes[hero.name] = "golem"
+                self.__emit(events.KILLED_BY_GOLEM, hero.name)
+                return False
+
+        self.__emit(events.HERO_MOVED, hero.name, position=hero.position)
+        return True
+
+    def __collide(self, hero: Hero):
+        """
+        Handle the collisions of a hero that moved, timed with the metrics.
+
+        Args:
+            hero (Hero): The hero.
+        """
+        if self.__metrics is None:
+            self.__collider_with_game_objects(hero)
+        else:
+            start = time.perf_counter()
+            self.__collider_with_game_objects(hero)
+            self.__metrics.observe(COLLISION_SPAN, time.perf_counter() - start)
+
+    def __hero_heal_logic(self, hero: Hero) -> bool:
+        """
+        Handle hero's healing logic.
+
+        Args:
+            hero (Hero): The hero.
+
+        Returns:
+            bool: True if the hero successfully healed, False otherwise.
+        """
+        if hero.count_medical_kit > 0:
+            hero.heal()
+            self.__emit(events.HEALED, hero.name, health=hero.health, medical_kits=hero.count_medical_kit)
+            return True
+        else:
+            self.__emit(events.NO_MEDICAL_KITS, hero.name)
+            return False
+
+    def __hero_attack_logic(self, hero: Hero) -> bool:
+        """
+        Handle hero's attack logic.
+
+        Args:
+            hero (Hero): The hero.
+
+        Returns:
+            bool: True if the hero successfully attacked, False otherwise.
+        """
+        game_object_on_hero_position = self.__get_game_object(hero)
+        count_damages_heros = 0
+        for obj in game_object_on_hero_position:
+            if obj.object_type == "hero":
+                hero.attack(obj)
+                self.__damage_causes[obj.name] = "attacked"
+                self.__emit(events.ATTACKED, hero.name, target=obj.name, health=obj.health)
+                count_damages_heros += 1
+
+        if count_damages_heros > 0:
+            return True
+        else:
+            self.__emit(events.NOTHING_TO_ATTACK, hero.name)
+            return False
+
+    def __hero_pick_item_logic(self, hero: Hero) -> bool:
+        """
+        Handle hero's item pick logic.
+
+        Args:
+            hero (Hero): The hero.
+
+        Returns:
+            bool: True if the hero successfully picked an item, False otherwise.
+        """
+        game_object_on_hero_position = self.__get_game_object(hero)
+        count_pick_obj = 0
+        for obj in game_object_on_hero_position:
+            if obj.object_type == "item":
+                if item_type(obj.name).pickable:
+                    self.__remove_game_object(obj)
+                    hero.pick_item(obj)
+                    count_pick_obj += 1
+                    self.__emit(events.ITEM_PICKED, hero.name, item=obj.name)
+
+        if count_pick_obj > 0:
+            return True
+        else:
+            self.__emit(events.NOTHING_TO_PICK, hero.name)
+            return False
+
+    def __hero_dead_logic(self, hero: Hero):
+        """
+        Handle dead hero logic.
+
+        Args:
+            hero (Hero): The hero who died.
+        """
+        cause = self.__damage_causes.pop(hero.name, None)
+        if self.__metrics is not None:
+            self.__metrics.increment(DEATHS, cause=cause or "unknown")
+        self.__emit(events.HERO_ELIMINATED, hero.name, cause=cause)
+        for item in hero.pocket:
+            item.position = hero.position
+            self.__emit(events.ITEM_DROPPED, hero.name, item=item.name, position=item.position)
+            self.__add_game_object(item)
+        self.__remove_dead_heroes(hero)
+
+    def save_json(self, file_name: str = "JSON/save.json") -> None:
+        """
+        Saves the game state to a JSON file.
+
+        Args:
+            file_name (str): The name of the JSON file.
+        """
+        with open(file_name, 'wb') as file:
+            file.write(b"[")
+            self.__maze.write_json(file)
+            file.write(b",")
+            file.write(self.__save_object_to_json("heroes", self.__heroes).encode("utf-8") + b",")
+            file.write(self.__save_object_to_json("items", self.game_objects).encode("utf-8") + b"]")
+
+    def __save_object_to_json(self, obj_collection_name, objects):
+        """
+        Save a collection of objects to JSON format.
+
+        Args:
+            obj_collection_name (str): The name of the object collection.
+            objects: The collection of objects to be saved.
+
+        Returns:
+            str: The JSON string representing the object collection.
+        """
+        json_obj = []
+        for obj in objects:
+            json_obj.append(obj.to_json())
+        return json.dumps({
+            obj_collection_name: json_obj
+        })
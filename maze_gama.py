@@ -1,420 +1,201 @@
-import json
-from typing import List
+from typing import TYPE_CHECKING, Callable, List, Optional
 
-from game_object import GameObject
-from maze import Maze
+from event_sinks import ConsoleSink, EventStream
+from map_stream import LoadProgress
+from maze_engine import HERO_ACTIONS, MazeEngine
 from hero import Hero
-from item import Item
 
+if TYPE_CHECKING:
+    # Bots, replays and map registries are imported on first use, which keeps the startup of
+    # games that do not use them short
+    from compiled_map import MapEntry
+    from policies import Policy, PolicyController
+    from replay import ReplayRecorder
 
-def print_line(len_line: int) -> None:
-    """
-    Prints a line of dashes.
-
-    Args:
-        len_line (int): The length of the line to be printed.
-    """
-    print("-" * len_line)
+START_POSITION = (0, 3)  # Where the heroes entered by the players start
 
 
 class MazeGame:
-    """Class representing the Maze Game."""
-
-    def __init__(self):
-        """Initialize MazeGame object."""
-        self.__maze = Maze()
-        self.__game_objects = []
-        self.__is_end = False
-        self.__heroes = self.__set_heroes(0, 3)
+    """Class representing the Maze Game, played in the console."""
 
-    def load_game_map_from_json(self, file_name: str) -> None:
+    def __init__(self, heroes: Optional[List[Hero]] = None, sinks: Optional[List] = None):
         """
-        Loads the game map from a JSON file.
+        Initialize MazeGame object without asking the players anything.
 
         Args:
-            file_name (str): The name of the JSON file containing the game map.
+            heroes (List[Hero], optional): The heroes taking part in the game. Without heroes
+                the players are asked for them when the game starts.
+            sinks (List, optional): The sinks of the game events, the console by default.
         """
-        with open(file_name, "r") as f:
-            json_data = json.load(f)
+        self.__engine = MazeEngine(heroes)
+        self.__events = EventStream([ConsoleSink()] if sinks is None else sinks)
+        self.__events.attach(self.__engine)
+        self.__bots: Optional["PolicyController"] = None  # Created when the first policy is set
 
-        self.__maze.load_map_from_json(json_data["game_map"])
-        self.__game_objects.clear()
+    @property
+    def engine(self) -> MazeEngine:
+        """Get the engine running the game logic."""
+        return self.__engine
 
-        for item in json_data["items"]:
-            self.__game_objects.append(Item(item["x"], item["y"], item["name"]))
+    @property
+    def events(self) -> EventStream:
+        """Get the stream passing the game events to the sinks."""
+        return self.__events
 
-    @staticmethod
-    def __set_heroes(start_x: int, start_y: int) -> List[Hero]:
+    def load_game_map_from_json(self, file_name: str,
+                                progress: Optional[Callable[[LoadProgress], None]] = None) -> None:
         """
-        Set up heroes.
+        Loads the game map from a JSON file, rejecting maps that cannot be won.
 
         Args:
-            start_x (int): The starting x-coordinate for the heroes.
-            start_y (int): The starting y-coordinate for the heroes.
+            file_name (str): The name of the JSON file containing the game map.
+            progress (callable, optional): Called with a LoadProgress while the map loads.
 
-        Returns:
-            List[Hero]: A list of Hero objects.
+        Raises:
+            MapValidationError: If the map is invalid or cannot be won.
         """
-        heroes = []
-        count_heroes = int(input("Enter the number of heroes: "))
-        i = 0
-        while i < count_heroes:
-            hero_name = input(f"Enter the name of hero {i + 1} : ")
-            hero = Hero(start_x, start_y, hero_name)
-            if hero in heroes:
-                print("A hero with this name already exists")
-            else:
-                heroes.append(hero)
-                i += 1
+        self.__engine.load_game_map_from_json(file_name, progress, validate=True)
 
-        return heroes
-
-    @staticmethod
-    def __is_in_map(position: tuple, height: int, width: int) -> bool:
+    def load_game_map_from_binary(self, file_name: str) -> None:
         """
-        Check if a position is within the map boundaries.
+        Loads the game map from a file in the binary map format, rejecting maps that cannot be won.
 
         Args:
-            position (tuple): The position to check.
-            height (int): The height of the map.
-            width (int): The width of the map.
+            file_name (str): The name of the binary file containing the game map.
 
-        Returns:
-            bool: True if the position is within the map boundaries, False otherwise.
+        Raises:
+            MapValidationError: If the map cannot be won.
         """
-        return 0 <= position[0] < width and 0 <= position[1] < height
+        self.__engine.load_game_map_from_binary(file_name, validate=True)
 
-    @staticmethod
-    def __check_hero_returns(current_direction: str, old_direction: str) -> bool:
+    def load_map_entry(self, entry: "MapEntry") -> None:
         """
-        Check if the hero is trying to move back in the same direction.
+        Loads the game map from a map kept by a MapRegistry or read by load_compiled_map,
+        both validated when the map was first loaded.
 
         Args:
-            current_direction (str): The current direction the hero is trying to move.
-            old_direction (str): The previous direction the hero moved.
-
-        Returns:
-            bool: True if the hero is trying to move back in the same direction, False otherwise.
+            entry (MapEntry): The map.
         """
-        return_direction = {"l": "r", "r": "l", "u": "d", "d": 'u'}
-        if return_direction[current_direction] == old_direction:
-            return True
-        return False
+        self.__engine.load_map_entry(entry)
 
-    @staticmethod
-    def __check_win(hero: Hero) -> bool:
+    def save_snapshot(self, file_name: str, delta: bool = False) -> None:
         """
-        Check if the hero has won.
+        Saves the game state to a binary snapshot file.
 
         Args:
-            hero (Hero): The hero to check.
-
-        Returns:
-            bool: True if the hero has won, False otherwise.
+            file_name (str): The name of the snapshot file.
+            delta (bool): True to append a delta snapshot.
         """
-        key = Item(2, 1, "key")
-        if key in hero.pocket:
-            return True
-        else:
-            return False
-
-    def start(self):
-        """Start the game."""
-        count_round = 1
-        while True:
-            print(f"\n\n{'-' * 10}ROUND - {count_round}{'-' * 10}")
-            self.__round()
-
-            if self.__is_end:
-                print("***Game Over***")
-                break
-
-            elif len(self.__heroes) == 0:
-                print("All heroes have been eliminated from the game")
-                break
-
-            count_round += 1
+        self.__engine.save_snapshot(file_name, delta)
 
-    def __get_cell(self, position: tuple) -> str:
+    def restore_snapshot(self, file_name: str) -> None:
         """
-        Get the type of cell at a given position.
+        Restores the game state from a snapshot file.
 
         Args:
-            position (tuple): The position to check.
-
-        Returns:
-            str: The type of cell at the given position.
+            file_name (str): The name of the snapshot file.
         """
-        if not self.__is_in_map(position, self.__maze.height, self.__maze.width):
-            cell_type = "wall"
-        else:
-            cell_type = self.__maze.get_cell(position).cell_type
-        return cell_type
+        self.__engine.restore_snapshot(file_name)
 
-    def __get_game_object(self, hero: Hero) -> List[GameObject]:
+    def record_replay(self, log_file: str, map_file: Optional[str] = None,
+                      seed: Optional[int] = None) -> "ReplayRecorder":
         """
-        Get game objects at hero's position.
+        Records the actions of the players to a replay log, call it before start.
 
         Args:
-            hero (Hero): The hero.
+            log_file (str): The name of the replay log.
+            map_file (str, optional): The name of the loaded map, kept in the log.
+            seed (int, optional): The seed of the fire cells, random by default.
 
         Returns:
-            List[GameObject]: A list of GameObjects at the hero's position.
+            ReplayRecorder: The recorder, closed when the game is over.
         """
-        object_on_hero_position = []
-        for obj in self.__game_objects + self.__heroes:
-            if obj.position == hero.position and obj != hero:
-                object_on_hero_position.append(obj)
-        return object_on_hero_position
+        from replay import ReplayRecorder
 
-    def __collider_with_game_objects(self, hero: Hero):
-        """
-        Handle collision with game objects.
+        return ReplayRecorder(self.__engine, log_file, map_file, seed, retry_rejected=True)
 
-        Args:
-            hero (Hero): The hero.
+    def add_hero(self, hero: Hero) -> None:
         """
-        for obj in self.__get_game_object(hero):
-            if obj.position == hero.position and obj != hero:
-                match obj.object_type:
-                    case "hero":
-                        print(f"Hero {obj.name} at this position")
-                    case "item":
-                        if obj.name == "heart":
-                            hero.health = 5
-                            print(f"Hero stepped on a green heart and regained health| Current health: "
-                                  f"{hero.health}")
-                        else:
-                            print(f"Object '{obj.name}' at this position ")
-
-    def __player_action(self, hero: Hero):
-        """
-        Handle player's action.
-
-        Args:
-            hero (Hero): The hero.
-        """
-        while True:
-            action = input("Enter hero's action (l,r,d,u,a,h,p): ")
-            match action:
-                case "l" | "r" | "d" | "u":
-                    self.__hero_move_logic(hero, action)
-                    break
-
-                case "h":
-                    if self.__hero_heal_logic(hero):
-                        break
-
-                case "a":
-                    if self.__hero_attack_logic(hero):
-                        break
-
-                case "p":
-                    if self.__hero_pick_item_logic(hero):
-                        break
-                case _:
-                    print("Invalid input")
-
-    @staticmethod
-    def __check_hero_dead(hero: Hero):
-        """
-        Check if the hero is dead.
+        Adds a hero to the game.
 
         Args:
-            hero (Hero): The hero.
-
-        Returns:
-            bool: True if the hero is dead, False otherwise.
-        """
-        if hero.health <= 0:
-            return True
-        else:
-            return False
-
-    def __remove_dead_heroes(self, hero):
-        """
-        Remove dead heroes from the game.
+            hero (Hero): The hero to add.
 
-        Args:
-            hero: The hero to remove.
+        Raises:
+            ValueError: If a hero with the same name is already in the game.
         """
-        self.__heroes.remove(hero)
-
-    def __round(self):
-        """Start a new round."""
-        self.__maze.init_fire_cells()
-
-        for hero in self.__heroes:
-            print()
-            print_line(30)
-            print(f"Burning cells {self.__maze.coord_fire_cells}")
-            print(f"Hero {hero.name} is moving ")
-
-            if self.__check_hero_dead(hero):
-                print("Hero has 0 health points and is eliminated")
-                self.__hero_dead_logic(hero)
-                continue
-
-            else:
-                self.__player_action(hero)
-
-            if self.__check_hero_dead(hero):
-                print("Hero has 0 health points and is eliminated")
-                self.__hero_dead_logic(hero)
+        self.__engine.add_hero(hero)
 
-            print_line(30)
+    def ask_heroes(self) -> None:
+        """Asks the players for the number and names of the heroes and adds them to the game."""
+        for hero in self.__set_heroes(*START_POSITION):
+            self.__engine.add_hero(hero)
 
-        self.__maze.put_out_fire_cell()
-
-    def __hero_move_logic(self, hero: Hero, direction: str):
+    def set_policy(self, hero_name: str, policy: Optional["Policy"]) -> None:
         """
-        Handle hero's movement logic.
+        Lets a policy play a hero instead of a player, all bots decide once per round.
 
         Args:
-            hero (Hero): The hero.
-            direction (str): The direction in which the hero wants to move.
-        """
-        old_cell_type = self.__get_cell(hero.position)
-        old_position = hero.position
-        hero.move(direction)
-
-        if self.__check_hero_returns(direction, hero.old_direction) and old_cell_type != "extra_passage":
-            print(f"{hero.name} got scared and ran away")
-            hero.die()
-            return
-
-        current_cell_type = self.__get_cell(hero.position)
-
-        match current_cell_type:
-            case "wall":
-                hero.get_damage(1)
-                hero.position = old_position
-                print(f"{hero.name} hit the wall, -1 health| Current health: {hero.health}")
-
-            case "fire":
-                hero.get_damage(1)
-                print(f"{hero.name} is on fire, -1 health| Current health: {hero.health}")
-
-            case "end":
-                if self.__check_win(hero):
-                    print(f"{hero.name} reached the end and won!!!")
-                    self.__is_end = True
-                else:
-                    print(f"{hero.name} killed by the golem because he didn't have the key")
-
-        print(f"Position of {hero.name} is {hero.position}")
-
-        if current_cell_type != "extra_passage" and hero.position != old_position and old_cell_type != "extra_passage":
-            hero.old_direction = direction
-
-        self.__collider_with_game_objects(hero)
-
-    def __hero_heal_logic(self, hero: Hero) -> bool:
+            hero_name (str): The name of the hero.
+            policy (Policy, optional): The policy, None to give the hero back to its player.
         """
-        Handle hero's healing logic.
-
-        Args:
-            hero (Hero): The hero.
+        if self.__bots is None:
+            if policy is None:
+                return
+            from policies import PolicyController
 
-        Returns:
-            bool: True if the hero successfully healed, False otherwise.
-        """
-        if hero.count_medical_kit > 0:
-            hero.heal()
-            print(
-                f"{hero.name} healed| Current health {hero.health} | Medical kits left: "
-                f"{hero.count_medical_kit}")
-            return True
+            self.__bots = PolicyController(self.__engine)
+        if policy is None:
+            self.__bots.release(hero_name)
         else:
-            print(f"{hero.name} has no medical kits")
-            return False
+            self.__bots.assign(hero_name, policy)
 
-    def __hero_attack_logic(self, hero: Hero) -> bool:
+    @staticmethod
+    def __set_heroes(start_x: int, start_y: int) -> List[Hero]:
         """
-        Handle hero's attack logic.
+        Set up heroes.
 
         Args:
-            hero (Hero): The hero.
+            start_x (int): The starting x-coordinate for the heroes.
+            start_y (int): The starting y-coordinate for the heroes.
 
         Returns:
-            bool: True if the hero successfully attacked, False otherwise.
+            List[Hero]: A list of Hero objects.
         """
-        game_object_on_hero_position = self.__get_game_object(hero)
-        count_damages_heros = 0
-        for obj in game_object_on_hero_position:
-            if obj.object_type == "hero":
-                hero.attack(obj)
-                print(f"Hero {hero.name} attacked hero {obj.name}, now his health is {obj.health}")
-                count_damages_heros += 1
-
-        if count_damages_heros > 0:
-            return True
-        else:
-            print("There is no one to attack at this position")
-            return False
+        heroes = []
+        count_heroes = int(input("Enter the number of heroes: "))
+        i = 0
+        while i < count_heroes:
+            hero_name = input(f"Enter the name of hero {i + 1} : ")
+            hero = Hero(start_x, start_y, hero_name)
+            if hero in heroes:
+                print("A hero with this name already exists")
+            else:
+                heroes.append(hero)
+                i += 1
 
-    def __hero_pick_item_logic(self, hero: Hero) -> bool:
+        return heroes
+
+    def __player_action(self, hero: Hero) -> str:
         """
-        Handle hero's item pick logic.
+        Ask the player for the action of a hero.
 
         Args:
             hero (Hero): The hero.
 
         Returns:
-            bool: True if the hero successfully picked an item, False otherwise.
-        """
-        game_object_on_hero_position = self.__get_game_object(hero)
-        count_pick_obj = 0
-        for obj in game_object_on_hero_position:
-            if obj.object_type == "item":
-                if obj.name == "key":
-                    hero.pick_item(obj)
-                    self.__game_objects.remove(obj)
-                    count_pick_obj += 1
-                    print(f"Hero picked up {obj.name}")
-
-        if count_pick_obj > 0:
-            return True
-        else:
-            print("There is nothing to pick up at this position")
-            return False
-
-    def __hero_dead_logic(self, hero: Hero):
-        """
-        Handle dead hero logic.
-
-        Args:
-            hero (Hero): The hero who died.
+            str: The action entered by the player.
         """
-        for item in hero.pocket:
-            item.position = hero.position
-            print(f"Object '{item.name}' dropped at position {item.position}")
-            self.__game_objects.append(item)
-        self.__remove_dead_heroes(hero)
-
-    def __save_json(self):
-        """Save game state to a JSON file."""
-        json_str_game_data = "["
-        json_str_game_data += self.__maze.to_json() + ","
-        json_str_game_data += self.__save_object_to_json("heroes", self.__heroes) + ","
-        json_str_game_data += self.__save_object_to_json("items", self.__game_objects) + "]"
-        with open("JSON/save.json", 'w') as file:
-            file.write(json_str_game_data)
-
-    def __save_object_to_json(self, obj_collection_name, objects):
-        """
-        Save a collection of objects to JSON format.
-
-        Args:
-            obj_collection_name (str): The name of the object collection.
-            objects: The collection of objects to be saved.
+        self.__events.flush()
+        return input(f"Enter hero's action ({','.join(HERO_ACTIONS)}): ")
 
-        Returns:
-            str: The JSON string representing the object collection.
-        """
-        json_obj = []
-        for obj in objects:
-            json_obj.append(obj.to_json())
-        return json.dumps({
-            obj_collection_name: json_obj
-        })
+    def start(self):
+        """Start the game, asking the players for heroes if the game has none."""
+        if not self.__engine.heroes:
+            self.ask_heroes()
+        while not self.__engine.is_over:
+            if self.__bots is None:
+                self.__engine.play_round(self.__player_action, retry_rejected=True)
+            else:
+                self.__bots.play_round(self.__player_action, retry_rejected=True)
+        self.__events.close()
@@ -0,0 +1,366 @@
+import heapq
+import struct
+import sys
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cell_types import CELL_BEHAVIOURS, DAMAGE, PASSABLE, TURN_BACK, WINS
+from item import Item
+from maze import Maze
+
+# Direction codes of the search states, 0 is a hero that has not moved yet
+DIRECTIONS = ("", "l", "r", "u", "d")
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+MOVES = (1, 2, 3, 4)
+DX = (0, -1, 1, 0, 0)
+DY = (0, 0, 0, -1, 1)
+OPPOSITE = (0, 2, 1, 4, 3)
+
+# A distance field file holds the header (magic, version, width, height, number of targets),
+# the targets as pairs of uint32 and the distance of every state as little-endian int32.
+FIELD_MAGIC = b"MAZD"
+FIELD_VERSION = 1
+FIELD_HEADER = struct.Struct("<4sHIII")
+TARGET = struct.Struct("<II")
+
+
+class DistanceField:
+    """Number of moves to the nearest target from every search state of a maze."""
+
+    def __init__(self, pathfinder: "PathFinder", targets: Tuple[tuple, ...], distances: array):
+        """
+        Initialize a DistanceField object.
+
+        Args:
+            pathfinder (PathFinder): The pathfinder that computed the field.
+            targets (Tuple[tuple, ...]): The target positions.
+            distances (array): The distance of every state, -1 where no target is reachable.
+        """
+        self.__pathfinder = pathfinder
+        self.__targets = targets
+        self.__target_cells = {y * pathfinder.width + x for x, y in targets}
+        self.__distances = distances
+
+    @property
+    def targets(self) -> Tuple[tuple, ...]:
+        """Get the target positions."""
+        return self.__targets
+
+    @property
+    def distances(self) -> array:
+        """Get the distances indexed by (y * width + x) * 5 + direction code."""
+        return self.__distances
+
+    def save(self, file_name: str) -> None:
+        """
+        Writes the field to a file, read back by PathFinder.load_field.
+
+        Args:
+            file_name (str): The name of the field file.
+        """
+        distances = self.__distances
+        if sys.byteorder != "little":
+            distances = array("i", distances)
+            distances.byteswap()
+        pathfinder = self.__pathfinder
+        with open(file_name, "wb") as f:
+            f.write(FIELD_HEADER.pack(FIELD_MAGIC, FIELD_VERSION, pathfinder.width, pathfinder.height,
+                                      len(self.__targets)))
+            f.write(b"".join(TARGET.pack(x, y) for x, y in self.__targets))
+            f.write(distances.tobytes())
+
+    def distance(self, position: tuple, old_direction: str = "") -> int:
+        """
+        Get the number of moves to the nearest target.
+
+        Args:
+            position (tuple): The position of the hero.
+            old_direction (str): The last direction the hero moved in.
+
+        Returns:
+            int: The number of moves, -1 if no target is reachable.
+        """
+        state = self.__pathfinder.state(position, old_direction)
+        return -1 if state is None else self.__distances[state]
+
+    def next_move(self, position: tuple, old_direction: str = "") -> Optional[str]:
+        """
+        Get the move that gets a hero closest to a target.
+
+        Args:
+            position (tuple): The position of the hero.
+            old_direction (str): The last direction the hero moved in.
+
+        Returns:
+            str: The direction to move in, None on a target or when no target is reachable.
+        """
+        state = self.__pathfinder.state(position, old_direction)
+        if state is None or self.__distances[state] <= 0:
+            return None
+
+        distances = self.__distances
+        for move, next_state in self.__pathfinder.successors(state, self.__target_cells):
+            if distances[next_state] == distances[state] - 1:
+                return DIRECTIONS[move]
+        return None
+
+
+class PathFinder:
+    """Shortest paths and cached distance fields over a maze with the movement rules of the game.
+
+    A search state is a cell together with the last counted direction, because a hero may
+    not turn back unless it stands on a cell that allows it, such as an extra passage. Cells
+    that are not passable are never entered, winning cells such as the end are entered only as
+    targets and damaging passable cells such as fire are avoided unless avoid_fire is False.
+    """
+
+    def __init__(self, maze: Maze, avoid_fire: bool = True):
+        """
+        Initialize a PathFinder object.
+
+        Args:
+            maze (Maze): The maze to search.
+            avoid_fire (bool): True to never step on fire cells.
+        """
+        self.__maze = maze
+        self.__avoid_fire = avoid_fire
+        self.__fields: Dict[Tuple[tuple, ...], DistanceField] = {}
+        self.__fields_grid = None
+        self.__fields_version = None
+
+    @property
+    def width(self) -> int:
+        """Get the width of the searched maze."""
+        return self.__maze.width
+
+    @property
+    def height(self) -> int:
+        """Get the height of the searched maze."""
+        return self.__maze.height
+
+    def state(self, position: tuple, old_direction: str = "") -> Optional[int]:
+        """
+        Get the search state of a hero.
+
+        Args:
+            position (tuple): The position of the hero.
+            old_direction (str): The last direction the hero moved in.
+
+        Returns:
+            int: The state, None for positions outside the maze.
+        """
+        x, y = position
+        if not (0 <= x < self.__maze.width and 0 <= y < self.__maze.height):
+            return None
+        return (y * self.__maze.width + x) * 5 + DIRECTION_CODES[old_direction]
+
+    def successors(self, state: int, targets=()) -> Iterable[Tuple[int, int]]:
+        """
+        Yield the moves allowed from a state and the states they lead to.
+
+        Args:
+            state (int): The state.
+            targets: Cell indexes of targets, which may be entered even if they are end or
+                fire cells.
+
+        Yields:
+            Tuple[int, int]: The direction code of the move and the next state.
+        """
+        grid = self.__maze.grid
+        width = self.__maze.width
+        height = self.__maze.height
+        cell, old_direction = divmod(state, 5)
+        from_extra = TURN_BACK[grid[cell]]
+        x, y = cell % width, cell // width
+
+        for move in MOVES:
+            if not from_extra and OPPOSITE[move] == old_direction:
+                continue
+            next_x, next_y = x + DX[move], y + DY[move]
+            if not (0 <= next_x < width and 0 <= next_y < height):
+                continue
+            next_cell = next_y * width + next_x
+            code = grid[next_cell]
+            if not PASSABLE[code]:
+                continue
+            if (WINS[code] or (DAMAGE[code] and self.__avoid_fire)) and next_cell not in targets:
+                continue
+            direction = old_direction if from_extra or TURN_BACK[code] else move
+            yield move, next_cell * 5 + direction
+
+    def find_path(self, start: tuple, goal: tuple, old_direction: str = "") -> Optional[List[str]]:
+        """
+        Find a shortest path with A* and the Manhattan distance.
+
+        Args:
+            start (tuple): The position of the hero.
+            goal (tuple): The position to reach.
+            old_direction (str): The last direction the hero moved in.
+
+        Returns:
+            List[str]: The directions to move in, None if the goal cannot be reached.
+        """
+        start_state = self.state(start, old_direction)
+        if start_state is None or self.state(goal) is None:
+            return None
+        width = self.__maze.width
+        goal_cell = goal[1] * width + goal[0]
+        targets = {goal_cell}
+
+        came_from = {start_state: None}
+        costs = {start_state: 0}
+        queue = [(abs(start[0] - goal[0]) + abs(start[1] - goal[1]), start_state)]
+        while queue:
+            _, state = heapq.heappop(queue)
+            if state // 5 == goal_cell:
+                return self.__rebuild_path(came_from, state)
+            cost = costs[state] + 1
+            for move, next_state in self.successors(state, targets):
+                if cost < costs.get(next_state, cost + 1):
+                    costs[next_state] = cost
+                    came_from[next_state] = (state, move)
+                    next_cell = next_state // 5
+                    estimate = abs(next_cell % width - goal[0]) + abs(next_cell // width - goal[1])
+                    heapq.heappush(queue, (cost + estimate, next_state))
+        return None
+
+    @staticmethod
+    def __rebuild_path(came_from: dict, state: int) -> List[str]:
+        """Follow the search links back to the start."""
+        path = []
+        while came_from[state] is not None:
+            state, move = came_from[state]
+            path.append(DIRECTIONS[move])
+        path.reverse()
+        return path
+
+    def distance_field(self, targets: Iterable[tuple]) -> DistanceField:
+        """
+        Get the distance field to a set of target positions.
+
+        Fields are cached until a cell of the maze changes, for example when fire cells are
+        set or put out.
+
+        Args:
+            targets (Iterable[tuple]): The target positions.
+
+        Returns:
+            DistanceField: The distance field.
+        """
+        targets = tuple(sorted(set(targets)))
+        self.__check_fields()
+        field = self.__fields.get(targets)
+        if field is None:
+            field = DistanceField(self, targets, self.__compute_distances(targets))
+            self.__fields[targets] = field
+        return field
+
+    def load_field(self, file_name: str) -> DistanceField:
+        """
+        Reads a field written by DistanceField.save and caches it like a computed field.
+
+        The field must have been computed on a maze with the same cells as this one.
+
+        Args:
+            file_name (str): The name of the field file.
+
+        Returns:
+            DistanceField: The distance field.
+
+        Raises:
+            ValueError: If the file is not a distance field of a maze of this size.
+        """
+        with open(file_name, "rb") as f:
+            magic, version, width, height, count = FIELD_HEADER.unpack(f.read(FIELD_HEADER.size))
+            if magic != FIELD_MAGIC:
+                raise ValueError(f"{file_name} is not a distance field")
+            if version != FIELD_VERSION:
+                raise ValueError(f"{file_name} has unsupported version {version}")
+            if (width, height) != (self.__maze.width, self.__maze.height):
+                raise ValueError(f"{file_name} is a field of a {width}x{height} maze")
+            targets = tuple(TARGET.iter_unpack(f.read(count * TARGET.size)))
+            distances = array("i")
+            distances.frombytes(f.read(width * height * 5 * distances.itemsize))
+            if sys.byteorder != "little":
+                distances.byteswap()
+        if len(targets) != count or len(distances) != width * height * 5:
+            raise ValueError(f"{file_name} is truncated")
+
+        self.__check_fields()
+        field = DistanceField(self, targets, distances)
+        self.__fields[targets] = field
+        return field
+
+    def field_to_end(self) -> DistanceField:
+        """Get the distance field to the cells heroes win on, such as the end."""
+        exits = [cell_type.name for cell_type in CELL_BEHAVIOURS if cell_type.wins]
+        return self.distance_field(position for name in exits for position in self.__maze.find_cells(name))
+
+    def field_to_items(self, items: Iterable[Item], name: str = "key") -> DistanceField:
+        """
+        Get the distance field to the items with a name.
+
+        Args:
+            items (Iterable[Item]): The items lying in the maze.
+            name (str): The name of the items to reach.
+
+        Returns:
+            DistanceField: The distance field.
+        """
+        return self.distance_field(item.position for item in items if item.name == name)
+
+    def __check_fields(self) -> None:
+        """Drop the cached fields if a cell of the maze changed since they were computed."""
+        if self.__fields_grid is not self.__maze.grid or self.__fields_version != self.__maze.version:
+            self.__fields.clear()
+            self.__fields_grid = self.__maze.grid
+            self.__fields_version = self.__maze.version
+
+    def __compute_distances(self, targets: Tuple[tuple, ...]) -> array:
+        """Run a breadth-first search backwards from the targets over all states."""
+        grid = self.__maze.grid
+        width = self.__maze.width
+        height = self.__maze.height
+        avoid_fire = self.__avoid_fire
+        distances = array("i", [-1]) * (width * height * 5)
+
+        queue = deque()
+        for x, y in targets:
+            if 0 <= x < width and 0 <= y < height and PASSABLE[grid[y * width + x]]:
+                for direction in range(5):
+                    distances[(y * width + x) * 5 + direction] = 0
+                    queue.append((y * width + x) * 5 + direction)
+
+        while queue:
+            state = queue.popleft()
+            cell, direction = divmod(state, 5)
+            to_extra = TURN_BACK[grid[cell]]
+            distance = distances[state] + 1
+            x, y = cell % width, cell // width
+
+            for move in MOVES:
+                previous_x, previous_y = x - DX[move], y - DY[move]
+                if not (0 <= previous_x < width and 0 <= previous_y < height):
+                    continue
+                previous_cell = previous_y * width + previous_x
+                code = grid[previous_cell]
+                if not PASSABLE[code] or WINS[code] or (DAMAGE[code] and avoid_fire):
+                    continue
+
+                if to_extra or TURN_BACK[code]:
+                    # The direction is not counted, the hero keeps its old one
+                    if not TURN_BACK[code] and OPPOSITE[move] == direction:
+                        continue
+                    previous_directions = (direction,)
+                elif direction != move:
+                    continue
+                else:
+                    previous_directions = [old for old in range(5) if old != OPPOSITE[move]]
+
+                for old in previous_directions:
+                    previous_state = previous_cell * 5 + old
+                    if distances[previous_state] == -1:
+                        distances[previous_state] = distance
+                        queue.append(previous_state)
+        return distances
@@ -0,0 +1,314 @@
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from cell_types import CELL_BEHAVIOURS, DAMAGE, KEY, PASSABLE, PASSAGE, TURN_BACK, item_type
+from hero import Hero
+from maze import Maze
+from maze_engine import HERO_ACTIONS, MazeEngine
+from pathfinding import PathFinder
+
+MOVES = ("l", "r", "u", "d")
+STEPS = {"l": (-1, 0), "r": (1, 0), "u": (0, -1), "d": (0, 1)}
+OPPOSITE = {"l": "r", "r": "l", "u": "d", "d": "u"}
+HEAL_BELOW = 2  # Health at which the planner heals or looks for a heart
+POLICIES = ("random", "greedy", "planner")
+
+
+class Policy(ABC):
+    """Chooses the actions of the heroes it controls, all of them in one call per round."""
+
+    @abstractmethod
+    def decide(self, engine: MazeEngine, heroes: List[Hero]) -> Dict[str, Optional[str]]:
+        """
+        Chooses the actions of heroes for the current round.
+
+        Called after the fire cells of the round are set, before the first turn. Heroes act
+        in turn order, so the state may change between the decision and the turn of a hero.
+
+        Args:
+            engine (MazeEngine): The engine of the game.
+            heroes (List[Hero]): The heroes controlled by the policy, in turn order.
+
+        Returns:
+            Dict[str, str]: The action of each hero by name, None to skip the turn.
+        """
+
+
+class RandomPolicy(Policy):
+    """Picks random actions, for load generation."""
+
+    def __init__(self, seed: Optional[int] = None, actions: tuple = HERO_ACTIONS):
+        """
+        Initialize a RandomPolicy object.
+
+        Args:
+            seed (int, optional): The seed of the actions.
+            actions (tuple): The actions to choose from.
+        """
+        self.__rng = random.Random(seed)
+        self.__actions = actions
+
+    def decide(self, engine: MazeEngine, heroes: List[Hero]) -> Dict[str, Optional[str]]:
+        choice = self.__rng.choice
+        return {hero.name: choice(self.__actions) for hero in heroes}
+
+
+class ScriptedPolicy(Policy):
+    """Plays fixed actions, a hero whose script ran out skips its turns."""
+
+    def __init__(self, scripts: Dict[str, List[Optional[str]]]):
+        """
+        Initialize a ScriptedPolicy object.
+
+        Args:
+            scripts (Dict[str, List[str]]): The actions of each hero by name, one per round.
+        """
+        self.__scripts = {name: iter(actions) for name, actions in scripts.items()}
+
+    def decide(self, engine: MazeEngine, heroes: List[Hero]) -> Dict[str, Optional[str]]:
+        return {hero.name: next(self.__scripts.get(hero.name, iter(())), None) for hero in heroes}
+
+
+class GreedyPolicy(Policy):
+    """Steps toward the nearest key, or the nearest exit once carrying one, without planning.
+
+    Each hero takes the move that most reduces the straight distance to its target, never
+    into a wall or back the way it came, and through fire only when nothing else is left.
+    Heroes get stuck behind walls, which makes the policy a cheap baseline.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        Initialize a GreedyPolicy object.
+
+        Args:
+            seed (int, optional): The seed breaking ties between moves.
+        """
+        self.__rng = random.Random(seed)
+        self.__exits = None
+        self.__exits_grid = None
+
+    def decide(self, engine: MazeEngine, heroes: List[Hero]) -> Dict[str, Optional[str]]:
+        maze = engine.maze
+        keys = [item.position for item in engine.game_objects if item_type(item.name).opens_end]
+        exits = self.__find_exits(engine)
+        decisions = {}
+        for hero in heroes:
+            has_key = any(item_type(item.name).opens_end for item in hero.pocket)
+            if not has_key and hero.position in keys:
+                decisions[hero.name] = "p"
+                continue
+            targets = exits if has_key else keys
+            if not targets:
+                decisions[hero.name] = None
+                continue
+
+            x, y = hero.position
+            turn_back = TURN_BACK[maze.get_cell_code(x, y)]
+            best = None
+            for move in MOVES:
+                if not turn_back and OPPOSITE[move] == hero.old_direction:
+                    continue
+                next_x, next_y = x + STEPS[move][0], y + STEPS[move][1]
+                if not (0 <= next_x < maze.width and 0 <= next_y < maze.height):
+                    continue
+                code = maze.get_cell_code(next_x, next_y)
+                if not PASSABLE[code]:
+                    continue
+                distance = min(abs(next_x - target_x) + abs(next_y - target_y) for target_x, target_y in targets)
+                score = (DAMAGE[code] > 0, distance, self.__rng.random())
+                if best is None or score < best[0]:
+                    best = (score, move)
+            decisions[hero.name] = best[1] if best is not None else None
+        return decisions
+
+    def __find_exits(self, engine: MazeEngine) -> List[tuple]:
+        """Get the cells heroes win on, scanning the maze again only after a new map is loaded."""
+        _require_grid(self, engine.maze)
+        grid = engine.maze.grid
+        if self.__exits is None or self.__exits_grid is not grid:
+            self.__exits = [position for cell_type in CELL_BEHAVIOURS if cell_type.wins
+                            for position in engine.maze.find_cells(cell_type.name)]
+            self.__exits_grid = grid
+        return self.__exits
+
+
+class PlannerPolicy(Policy):
+    """Follows shortest paths that obey the turn-back rule and keep out of fire.
+
+    Heroes without a key walk to the nearest key and pick it up, then walk to the nearest
+    exit. Below HEAL_BELOW health they heal, or walk to a heart when out of medical kits.
+    Paths come from distance fields shared by every hero of the policy and searched on a
+    copy of the maze without its fire, so they stay cached while the fire moves and a game
+    costs one search per set of targets however many heroes and rounds there are. A hero
+    whose next step is on fire waits for the fire to move.
+    """
+
+    def __init__(self, avoid_fire: bool = True, pathfinder: Optional[PathFinder] = None):
+        """
+        Initialize a PlannerPolicy object.
+
+        Args:
+            avoid_fire (bool): True to wait instead of stepping on fire cells.
+            pathfinder (PathFinder, optional): A pathfinder over the played map without fire,
+                such as MapEntry.pathfinder, shared by games on the same map. Built from the
+                maze of the game by default.
+        """
+        self.__avoid_fire = avoid_fire
+        self.__pathfinder = pathfinder
+        self.__shared = pathfinder is not None
+        self.__grid = None
+
+    def decide(self, engine: MazeEngine, heroes: List[Hero]) -> Dict[str, Optional[str]]:
+        maze = engine.maze
+        pathfinder = self.__get_pathfinder(maze)
+
+        items = engine.game_objects
+        keys = {item.position for item in items if item_type(item.name).opens_end}
+        hearts = [item for item in items if item_type(item.name).heals]
+        decisions = {}
+        for hero in heroes:
+            has_key = any(item_type(item.name).opens_end for item in hero.pocket)
+            if not has_key and hero.position in keys:
+                decisions[hero.name] = "p"
+                continue
+
+            if hero.health <= HEAL_BELOW:
+                if hero.count_medical_kit > 0:
+                    decisions[hero.name] = "h"
+                    continue
+                if hearts:
+                    move = pathfinder.distance_field(heart.position for heart in hearts).next_move(
+                        hero.position, hero.old_direction)
+                    if move is not None:
+                        decisions[hero.name] = self.__step(maze, hero, move)
+                        continue
+
+            field = pathfinder.field_to_end() if has_key else pathfinder.field_to_items(items, KEY.name)
+            decisions[hero.name] = self.__step(maze, hero, field.next_move(hero.position, hero.old_direction))
+        return decisions
+
+    def __step(self, maze: Maze, hero: Hero, move: Optional[str]) -> Optional[str]:
+        """Keep a planned move, or wait if it steps on fire."""
+        if move is None or not self.__avoid_fire:
+            return move
+        x, y = hero.x + STEPS[move][0], hero.y + STEPS[move][1]
+        return None if DAMAGE[maze.get_cell_code(x, y)] else move
+
+    def __get_pathfinder(self, maze: Maze) -> PathFinder:
+        """Get a pathfinder over a copy of the maze without fire, made again after a new map is loaded."""
+        if self.__shared:
+            return self.__pathfinder
+        _require_grid(self, maze)
+        if self.__grid is not maze.grid:
+            grid = bytearray(maze.grid)
+            for x, y in maze.coord_fire_cells:
+                grid[y * maze.width + x] = PASSAGE
+            static_maze = Maze()
+            static_maze.load_grid(maze.width, maze.height, grid)
+            self.__pathfinder = PathFinder(static_maze, avoid_fire=False)
+            self.__grid = maze.grid
+        return self.__pathfinder
+
+
+class PolicyController:
+    """Assigns policies to the heroes of a game and batches their decisions."""
+
+    def __init__(self, engine: MazeEngine):
+        """
+        Initialize a PolicyController object with no bots.
+
+        Args:
+            engine (MazeEngine): The engine of the game.
+        """
+        self.__engine = engine
+        self.__policies: Dict[str, Policy] = {}
+
+    def assign(self, hero_name: str, policy: Policy) -> None:
+        """
+        Lets a policy control a hero.
+
+        Args:
+            hero_name (str): The name of the hero.
+            policy (Policy): The policy, one policy may control many heroes.
+        """
+        self.__policies[hero_name] = policy
+
+    def release(self, hero_name: str) -> None:
+        """
+        Gives the control of a hero back to its player.
+
+        Args:
+            hero_name (str): The name of the hero.
+        """
+        self.__policies.pop(hero_name, None)
+
+    def is_bot(self, hero_name: str) -> bool:
+        """Get whether a policy controls a hero."""
+        return hero_name in self.__policies
+
+    def decide(self, heroes: List[Hero]) -> Dict[str, Optional[str]]:
+        """
+        Asks every policy once for the actions of its heroes, in the form MazeEngine.play_round
+        takes as decide.
+
+        Args:
+            heroes (List[Hero]): The heroes in the game, in turn order.
+
+        Returns:
+            Dict[str, str]: The actions of the heroes controlled by a policy.
+        """
+        groups: Dict[int, tuple] = {}
+        for hero in heroes:
+            policy = self.__policies.get(hero.name)
+            if policy is not None:
+                groups.setdefault(id(policy), (policy, []))[1].append(hero)
+
+        decisions = {}
+        for policy, policy_heroes in groups.values():
+            decisions.update(policy.decide(self.__engine, policy_heroes))
+        return decisions
+
+    def play_round(self, choose_action=None, retry_rejected: bool = False):
+        """
+        Plays a round, with the policies deciding for the bots.
+
+        Args:
+            choose_action (callable, optional): Returns the action of a hero without a policy,
+                its heroes skip their turns by default.
+            retry_rejected (bool): True to ask choose_action again after a rejected action.
+
+        Returns:
+            List[GameEvent]: The events of the round.
+        """
+        return self.__engine.play_round(choose_action or (lambda hero: None), retry_rejected, self.decide)
+
+
+def make_policy(name: str, seed: Optional[int] = None) -> Policy:
+    """
+    Creates a built-in policy by name.
+
+    Args:
+        name (str): One of POLICIES.
+        seed (int, optional): The seed of the random choices of the policy.
+
+    Returns:
+        Policy: The policy.
+    """
+    match name:
+        case "random":
+            return RandomPolicy(seed)
+        case "greedy":
+            return GreedyPolicy(seed)
+        case "planner":
+            return PlannerPolicy()
+        case _:
+            raise ValueError(f"Unknown policy {name!r}, expected one of {POLICIES}")
+
+
+def _require_grid(policy: Policy, maze) -> None:
+    """Raise a clear error when a policy that scans the whole grid plays on a maze without one."""
+    if not isinstance(maze, Maze):
+        raise TypeError(f"{type(policy).__name__} needs a Maze holding the whole grid, "
+                        f"not a {type(maze).__name__}")
@@ -0,0 +1,345 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import struct
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+import events
+from compiled_map import COMPILED_EXTENSION, load_compiled_map
+from hero import Hero
+from item import Item
+from maze import Maze
+from maze_engine import MazeEngine
+
+# A replay log is a JSON lines file. The first line is the header, with the seed, the hash of
+# the map and the heroes and items at the start, then every round adds a line with the actions
+# chosen for the heroes in turn order, the names of the heroes decided by a batch policy, when
+# there were any, and a checksum of the heroes after the round. Checkpoints
+# of the whole game go to a separate file of records: round number (u32), offset of the log
+# line after the round (u64), length (u32) and the checkpoint of MazeEngine.
+LOG_VERSION = 1
+CHECKPOINT = struct.Struct("<IQI")
+CHECKPOINT_SUFFIX = ".checkpoints"
+DEFAULT_CHECKPOINT_INTERVAL = 100  # Rounds between checkpoints
+
+
+class ReplayMismatchError(ValueError):
+    """A replayed game differs from the recorded one."""
+
+
+def map_hash(maze: Maze) -> str:
+    """
+    Hashes the size and cells of a maze.
+
+    Args:
+        maze (Maze): The maze, without fire cells.
+
+    Returns:
+        str: The SHA-256 hash as hexadecimal.
+    """
+    digest = hashlib.sha256(struct.pack("<II", maze.width, maze.height))
+    digest.update(maze.grid)
+    return digest.hexdigest()
+
+
+def heroes_checksum(engine: MazeEngine) -> int:
+    """
+    Computes a checksum of the heroes and the end of the game, to detect diverging replays.
+
+    Args:
+        engine (MazeEngine): The engine.
+
+    Returns:
+        int: The CRC-32 checksum.
+    """
+    state = [engine.is_end] + [
+        [hero.name, hero.x, hero.y, hero.health, hero.count_medical_kit, hero.old_direction,
+         [item.name for item in hero.pocket]]
+        for hero in engine.heroes
+    ]
+    return zlib.crc32(json.dumps(state).encode("utf-8"))
+
+
+def checkpoint_file_name(log_file: str) -> str:
+    """Get the name of the checkpoint file of a replay log."""
+    return log_file + CHECKPOINT_SUFFIX
+
+
+class ReplayRecorder:
+    """Writes the actions of a game to an append-only replay log while it is played."""
+
+    def __init__(self, engine: MazeEngine, log_file: str, map_file: Optional[str] = None,
+                 seed: Optional[int] = None, retry_rejected: bool = False,
+                 checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Initialize a ReplayRecorder object and write the header of the log.
+
+        Create it after loading the map and adding the heroes, before the first round. The
+        maze is reseeded, so the fire cells can be replayed.
+
+        Args:
+            engine (MazeEngine): The engine playing the game.
+            log_file (str): The name of the log file, replaced if it exists.
+            map_file (str, optional): The name of the map, used by replays that are not given one.
+            seed (int, optional): The seed of the fire cells, random by default.
+            retry_rejected (bool): True if the game asks again after a rejected action, as
+                the console game does.
+            checkpoint_interval (int): The number of rounds between checkpoints, 0 for none.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        engine.maze.seed(seed)
+
+        self.__engine = engine
+        self.__checkpoint_interval = checkpoint_interval
+        self.__actions = []
+        self.__log = open(log_file, "wb")
+        self.__checkpoints = open(checkpoint_file_name(log_file), "wb") if checkpoint_interval > 0 else None
+
+        self.__write_line({
+            "version": LOG_VERSION,
+            "seed": seed,
+            "map": map_file,
+            "map_hash": map_hash(engine.maze),
+            "fire_cells_count": engine.maze.fire_cells_count,
+            "retry_rejected": retry_rejected,
+            "heroes": [
+                {"name": hero.name, "x": hero.x, "y": hero.y, "health": hero.health,
+                 "medical_kits": hero.count_medical_kit, "old_direction": hero.old_direction,
+                 "pocket": [item.to_json() for item in hero.pocket]}
+                for hero in engine.heroes
+            ],
+            "items": [{"x": item.x, "y": item.y, "name": item.name} for item in engine.game_objects],
+        })
+
+        engine.add_action_listener(self.__on_action)
+        engine.add_round_listener(self.__on_round)
+
+    def close(self) -> None:
+        """Close the log and checkpoint files."""
+        self.__log.close()
+        if self.__checkpoints is not None:
+            self.__checkpoints.close()
+
+    def __on_action(self, hero: Hero, action: Optional[str]) -> None:
+        """Collect an action of the current round."""
+        self.__actions.append([hero.name, action])
+
+    def __on_round(self, round_number: int, round_events: List[events.GameEvent]) -> None:
+        """Append the actions of a finished round to the log, with a checkpoint when due."""
+        line = {"round": round_number, "actions": self.__actions}
+        decided = self.__engine.decided_heroes
+        if decided:
+            line["decided"] = decided  # Their rejected actions were not asked again
+        line["checksum"] = heroes_checksum(self.__engine)
+        self.__write_line(line)
+        self.__actions = []
+
+        if self.__checkpoints is not None and round_number % self.__checkpoint_interval == 0:
+            data = self.__engine.checkpoint()
+            self.__checkpoints.write(CHECKPOINT.pack(round_number, self.__log.tell(), len(data)))
+            self.__checkpoints.write(data)
+            self.__checkpoints.flush()
+
+        if self.__engine.is_over:
+            self.close()
+
+    def __write_line(self, value: dict) -> None:
+        """Append a JSON line to the log and flush it, so a crash keeps every finished round."""
+        self.__log.write(json.dumps(value, separators=(",", ":")).encode("utf-8") + b"\n")
+        self.__log.flush()
+
+
+class Replayer:
+    """Plays a recorded game again headlessly, as fast as the engine goes."""
+
+    def __init__(self, log_file: str, map_file: Optional[str] = None, verify: bool = True):
+        """
+        Initialize a Replayer object, with the game at its recorded start.
+
+        Args:
+            log_file (str): The name of the replay log.
+            map_file (str, optional): The map in the JSON, binary or compiled format, the map
+                named in the log by default.
+            verify (bool): True to check every round against the recorded checksum.
+
+        Raises:
+            ReplayMismatchError: If the map differs from the recorded one.
+        """
+        self.__log_file = log_file
+        self.__verify = verify
+        with open(log_file, "rb") as log:
+            self.__header = json.loads(log.readline())
+            self.__start_offset = log.tell()
+        if self.__header["version"] != LOG_VERSION:
+            raise ValueError(f"{log_file} has unsupported version {self.__header['version']}")
+
+        self.__map_file = map_file or self.__header["map"]
+        if self.__map_file is None:
+            raise ValueError(f"{log_file} names no map, pass map_file")
+        self.__engine = None
+        self.__offset = self.__start_offset
+        self.reset()
+
+    @property
+    def header(self) -> dict:
+        """Get the header of the log."""
+        return self.__header
+
+    @property
+    def engine(self) -> MazeEngine:
+        """Get the engine holding the replayed game."""
+        return self.__engine
+
+    @property
+    def round_number(self) -> int:
+        """Get the number of the last replayed round."""
+        return self.__engine.round_number
+
+    def reset(self) -> None:
+        """Go back to the start of the recorded game."""
+        header = self.__header
+        engine = MazeEngine(maze=Maze(header["fire_cells_count"]))
+        extension = os.path.splitext(self.__map_file)[1].lower()
+        if extension == ".json":
+            engine.load_game_map_from_json(self.__map_file)
+        elif extension == COMPILED_EXTENSION:
+            engine.load_map_entry(load_compiled_map(self.__map_file))
+        else:
+            engine.load_game_map_from_binary(self.__map_file)
+        if map_hash(engine.maze) != header["map_hash"]:
+            raise ReplayMismatchError(f"{self.__map_file} is not the map of {self.__log_file}")
+
+        engine.maze.seed(header["seed"])
+        engine.set_items(header["items"])
+        for hero_data in header["heroes"]:
+            hero = Hero(hero_data["x"], hero_data["y"], hero_data["name"])
+            hero.health = hero_data["health"]
+            hero.count_medical_kit = hero_data["medical_kits"]
+            hero.old_direction = hero_data["old_direction"]
+            for item in hero_data["pocket"]:
+                hero.add_item_in_pocket(Item(item["x"], item["y"], item["name"]))
+            engine.add_hero(hero)
+
+        self.__engine = engine
+        self.__offset = self.__start_offset
+
+    def rounds(self) -> Iterator[List[events.GameEvent]]:
+        """
+        Replay the remaining rounds of the log.
+
+        Yields:
+            List[GameEvent]: The events of each round.
+        """
+        with open(self.__log_file, "rb") as log:
+            log.seek(self.__offset)
+            for line in log:
+                self.__offset += len(line)
+                yield self.__play(json.loads(line))
+
+    def run(self) -> MazeEngine:
+        """
+        Replay every remaining round.
+
+        Returns:
+            MazeEngine: The engine after the last round.
+        """
+        for _ in self.rounds():
+            pass
+        return self.__engine
+
+    def seek(self, round_number: int) -> MazeEngine:
+        """
+        Go to the end of a round, restoring the nearest checkpoint before it and replaying
+        only the rounds after the checkpoint.
+
+        Args:
+            round_number (int): The round to go to, 0 for the start of the game.
+
+        Returns:
+            MazeEngine: The engine at the end of the round.
+        """
+        checkpoint = self.__find_checkpoint(round_number)
+        if checkpoint is not None and (checkpoint[0] > self.round_number or round_number < self.round_number):
+            self.__engine.restore_checkpoint(checkpoint[2])
+            self.__offset = checkpoint[1]
+        elif round_number < self.round_number:
+            self.reset()
+
+        if self.round_number < round_number:
+            for _ in self.rounds():
+                if self.round_number >= round_number:
+                    break
+        return self.__engine
+
+    def __play(self, record: dict) -> List[events.GameEvent]:
+        """Play a recorded round and check it against its checksum."""
+        decided = set(record.get("decided", ()))
+        actions = iter([name, action] for name, action in record["actions"] if name not in decided)
+        decisions = {name: action for name, action in record["actions"] if name in decided}
+
+        def choose_action(hero: Hero) -> Optional[str]:
+            name, action = next(actions, (None, None))
+            if name != hero.name:
+                raise ReplayMismatchError(
+                    f"Round {record['round']} expected an action of {name}, {hero.name} is playing")
+            return action
+
+        round_events = self.__engine.play_round(choose_action, self.__header["retry_rejected"],
+                                                (lambda heroes: decisions) if decided else None)
+        if self.__verify:
+            if self.__engine.round_number != record["round"]:
+                raise ReplayMismatchError(f"Replayed round {self.__engine.round_number}, "
+                                          f"the log has round {record['round']}")
+            if heroes_checksum(self.__engine) != record["checksum"]:
+                raise ReplayMismatchError(f"Round {record['round']} differs from the recorded game")
+        return round_events
+
+    def __find_checkpoint(self, round_number: int) -> Optional[Tuple[int, int, bytes]]:
+        """Find the last checkpoint at or before a round, reading only the record headers."""
+        file_name = checkpoint_file_name(self.__log_file)
+        if not os.path.exists(file_name):
+            return None
+
+        found = None
+        with open(file_name, "rb") as f:
+            while header := f.read(CHECKPOINT.size):
+                if len(header) < CHECKPOINT.size:
+                    break  # A checkpoint cut short by a crash
+                checkpoint_round, offset, length = CHECKPOINT.unpack(header)
+                if checkpoint_round > round_number:
+                    break
+                found = (checkpoint_round, offset, f.tell(), length)
+                f.seek(length, os.SEEK_CUR)
+
+            if found is None:
+                return None
+            checkpoint_round, offset, position, length = found
+            f.seek(position)
+            data = f.read(length)
+            if len(data) < length:
+                return None
+        return checkpoint_round, offset, data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a recorded game headlessly")
+    parser.add_argument("log_file", help="replay log")
+    parser.add_argument("--map", help="map of the game, the one named in the log by default")
+    parser.add_argument("--round", type=int, default=None, help="stop at the end of this round")
+    parser.add_argument("--no-verify", action="store_true", help="skip the checksums of the rounds")
+    args = parser.parse_args()
+
+    replayer = Replayer(args.log_file, args.map, not args.no_verify)
+    replayed = replayer.run() if args.round is None else replayer.seek(args.round)
+    print(json.dumps({
+        "round": replayed.round_number,
+        "is_end": replayed.is_end,
+        "heroes": [
+            {"name": hero.name, "position": hero.position, "health": hero.health}
+            for hero in replayed.heroes
+        ],
+    }, indent=2))
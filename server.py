@@ -0,0 +1,566 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import events
+from hero import Hero
+from instrumentation import JsonLinesSink, Metrics, PrometheusSink
+from map_binary import open_binary_map
+from maze_engine import HERO_ACTIONS, MazeEngine
+from visibility import VisibilityTracker
+
+# The protocol is JSON lines in both directions. Clients send objects with an "op":
+#   {"op": "join", "session": "s1", "hero": "alice"}   join or create a session
+#   {"op": "start", "session": "s1"}                   start the rounds of a session
+#   {"op": "action", "session": "s1", "action": "l"}   act in the current round
+#   {"op": "stats"}                                    get the server statistics
+# The server sends objects with a "type": joined, started, round (asking for actions),
+# events (the events of a round), view (the cells a hero sees, when views are enabled),
+# game_over, stats and error.
+DEFAULT_TURN_TIMEOUT = 30.0  # Seconds a round waits for actions before skipping the missing heroes
+DEFAULT_MAX_SESSIONS = 10_000
+DEFAULT_OUTBOX_SIZE = 256  # Messages queued for a client before it is dropped as too slow
+DEFAULT_METRICS_INTERVAL = 10.0
+MAX_MESSAGE_SIZE = 64 * 1024
+LISTEN_BACKLOG = 4096  # Pending connections, the asyncio default of 100 drops bursts of clients
+
+# Server counters, next to the counters of the engines
+CONNECTIONS = "connections_total"
+MESSAGES_IN = "messages_received_total"
+MESSAGES_OUT = "messages_sent_total"
+SLOW_CLIENTS = "slow_clients_dropped_total"
+SESSIONS = "sessions_started_total"
+TURN_TIMEOUTS = "turn_timeouts_total"
+WAIT_SPAN = "round_wait_seconds"
+
+
+class ClientConnection:
+    """A connected client with a bounded queue of outgoing messages.
+
+    A separate task writes the queue to the socket, so a slow client never blocks a session.
+    A client whose queue is full is disconnected.
+    """
+
+    def __init__(self, server: "GameServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 outbox_size: int):
+        """
+        Initialize a ClientConnection object.
+
+        Args:
+            server (GameServer): The server.
+            reader (asyncio.StreamReader): The incoming stream.
+            writer (asyncio.StreamWriter): The outgoing stream.
+            outbox_size (int): The number of messages queued before the client is dropped.
+        """
+        self.__server = server
+        self.__reader = reader
+        self.__writer = writer
+        self.__outbox = asyncio.Queue(outbox_size)
+        self.__closed = False
+        self.sessions: Dict[str, str] = {}  # Session name to the name of the hero of this client
+
+    @property
+    def closed(self) -> bool:
+        """Get whether the connection is closed."""
+        return self.__closed
+
+    def send(self, message: dict) -> None:
+        """
+        Queue a message without waiting.
+
+        Args:
+            message (dict): The message.
+        """
+        if self.__closed:
+            return
+        try:
+            self.__outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            self.__server.count(SLOW_CLIENTS)
+            self.close()
+
+    def close(self) -> None:
+        """Close the connection, messages still queued are dropped."""
+        if not self.__closed:
+            self.__closed = True
+            self.__writer.close()
+
+    async def run(self) -> None:
+        """Read the messages of the client until it disconnects."""
+        write_task = asyncio.create_task(self.__write_loop())
+        try:
+            while not self.__closed:
+                try:
+                    line = await self.__reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    self.send({"type": "error", "message": "Message too long"})
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                self.__server.count(MESSAGES_IN)
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    self.send({"type": "error", "message": "Invalid JSON"})
+                    continue
+                if not isinstance(message, dict):
+                    self.send({"type": "error", "message": "Message must be a JSON object"})
+                    continue
+                self.__server.handle_message(self, message)
+        finally:
+            self.__server.disconnect(self)
+            if not self.__closed:
+                await self.__outbox.put(None)  # Lets the write loop send what is queued
+                await write_task
+            else:
+                write_task.cancel()
+            self.close()
+
+    async def __write_loop(self) -> None:
+        """Write queued messages to the socket, waiting for the socket to drain."""
+        try:
+            while True:
+                message = await self.__outbox.get()
+                if message is None:
+                    break
+                self.__writer.write(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+                self.__server.count(MESSAGES_OUT)
+                await self.__writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+class GameSession:
+    """A game hosted by the server, with the heroes of several clients."""
+
+    def __init__(self, server: "GameServer", name: str, engine: MazeEngine, turn_timeout: float,
+                 view_radius: Optional[int] = None):
+        """
+        Initialize a GameSession object.
+
+        Args:
+            server (GameServer): The server.
+            name (str): The name of the session.
+            engine (MazeEngine): The engine of the game, with its map loaded.
+            turn_timeout (float): The seconds a round waits for actions.
+            view_radius (int, optional): The sight radius of the heroes, every round sends
+                each client the cells its heroes see. No views are sent without it.
+        """
+        self.__server = server
+        self.__name = name
+        self.__engine = engine
+        self.__turn_timeout = turn_timeout
+        self.__view_radius = view_radius
+        self.__visibility = None
+        self.__clients: Dict[str, ClientConnection] = {}  # Hero name to its client
+        self.__actions: Dict[str, str] = {}
+        self.__all_acted = asyncio.Event()
+        self.__task = None
+        self.__started_at = None
+        self.__actions_received = 0
+        self.__timeouts = 0
+
+    @property
+    def name(self) -> str:
+        """Get the name of the session."""
+        return self.__name
+
+    @property
+    def engine(self) -> MazeEngine:
+        """Get the engine of the game."""
+        return self.__engine
+
+    @property
+    def started(self) -> bool:
+        """Get whether the rounds have started."""
+        return self.__task is not None
+
+    @property
+    def clients(self) -> List[ClientConnection]:
+        """Get the connected clients of the session."""
+        return list(set(self.__clients.values()))
+
+    def join(self, client: ClientConnection, hero_name: str) -> None:
+        """
+        Add the hero of a client on the start cell.
+
+        Args:
+            client (ClientConnection): The client.
+            hero_name (str): The name of the hero.
+
+        Raises:
+            ValueError: If the game has started or the name is taken.
+        """
+        if self.started:
+            raise ValueError(f"Session {self.__name} has already started")
+        start = self.__engine.maze.find_cell("start") or (0, 0)
+        self.__engine.add_hero(Hero(start[0], start[1], hero_name))
+        self.__clients[hero_name] = client
+
+    def start(self) -> None:
+        """
+        Start playing rounds in a task of the event loop.
+
+        Raises:
+            ValueError: If the game has started or has no heroes.
+        """
+        if self.started:
+            raise ValueError(f"Session {self.__name} has already started")
+        if not self.__engine.heroes:
+            raise ValueError(f"Session {self.__name} has no heroes")
+        self.__started_at = time.monotonic()
+        if self.__view_radius is not None:
+            self.__visibility = VisibilityTracker(self.__engine, self.__view_radius)
+        self.__task = asyncio.create_task(self.__play())
+
+    def act(self, hero_name: str, action: str) -> None:
+        """
+        Set the action of a hero for the current round, replacing an earlier one.
+
+        Args:
+            hero_name (str): The name of the hero.
+            action (str): The action, one of HERO_ACTIONS.
+
+        Raises:
+            ValueError: If the action is unknown or the game is not running.
+        """
+        if action not in HERO_ACTIONS:
+            raise ValueError(f"Unknown action {action!r}, expected one of {HERO_ACTIONS}")
+        if not self.started:
+            raise ValueError(f"Session {self.__name} has not started")
+        self.__actions[hero_name] = action
+        self.__actions_received += 1
+        if self.__waiting_for() <= self.__actions.keys():
+            self.__all_acted.set()
+
+    def leave(self, hero_name: str) -> None:
+        """
+        Detach a disconnected client, its hero skips its turns from now on.
+
+        Args:
+            hero_name (str): The name of the hero.
+        """
+        self.__clients.pop(hero_name, None)
+        if self.__waiting_for() <= self.__actions.keys():
+            self.__all_acted.set()
+
+    def cancel(self) -> None:
+        """Stop playing rounds."""
+        if self.__task is not None and self.__task is not asyncio.current_task():
+            self.__task.cancel()
+
+    def stats(self) -> dict:
+        """Get the statistics of the session."""
+        return {
+            "session": self.__name,
+            "started": self.started,
+            "round": self.__engine.round_number,
+            "heroes": len(self.__engine.heroes),
+            "clients": len(self.__clients),
+            "actions_received": self.__actions_received,
+            "turn_timeouts": self.__timeouts,
+            "seconds": time.monotonic() - self.__started_at if self.__started_at is not None else 0.0,
+        }
+
+    def __waiting_for(self) -> set:
+        """Get the names of the heroes in the game with a connected client."""
+        return {hero.name for hero in self.__engine.heroes if hero.name in self.__clients}
+
+    def __broadcast(self, message: dict) -> None:
+        """Queue a message to every client of the session."""
+        for client in self.clients:
+            client.send(message)
+
+    def __send_views(self) -> None:
+        """Queue to every client the cells seen by its heroes still in the game."""
+        for hero in self.__engine.heroes:
+            client = self.__clients.get(hero.name)
+            if client is not None:
+                client.send({"type": "view", "session": self.__name, "round": self.__engine.round_number,
+                             **self.__visibility.to_json(hero.name)})
+
+    async def __play(self) -> None:
+        """Play rounds until the game is over or every client has left."""
+        engine = self.__engine
+        winner = None
+        try:
+            while not engine.is_over and self.__clients:
+                self.__actions = {}
+                self.__all_acted.clear()
+                if self.__visibility is not None:
+                    self.__send_views()
+                self.__broadcast({"type": "round", "session": self.__name, "round": engine.round_number + 1,
+                                  "heroes": [hero.name for hero in engine.heroes]})
+
+                wait_start = time.perf_counter()
+                if self.__waiting_for():
+                    try:
+                        await asyncio.wait_for(self.__all_acted.wait(), self.__turn_timeout)
+                    except asyncio.TimeoutError:
+                        missing = len(self.__waiting_for() - self.__actions.keys())
+                        self.__timeouts += missing
+                        self.__server.count(TURN_TIMEOUTS, missing)
+                self.__server.observe(WAIT_SPAN, time.perf_counter() - wait_start)
+
+                round_events = engine.step_round(self.__actions)
+                winner = next((event.hero for event in round_events if event.kind == events.WON), winner)
+                self.__broadcast({"type": "events", "session": self.__name, "round": engine.round_number,
+                                  "events": [event.to_json() for event in round_events]})
+                await asyncio.sleep(0)  # Let other sessions run between rounds
+
+            self.__broadcast({"type": "game_over", "session": self.__name, "round": engine.round_number,
+                              "winner": winner})
+        finally:
+            self.__server.end_session(self)
+
+
+class GameServer:
+    """Hosts many game sessions in one asyncio event loop."""
+
+    def __init__(self, map_file: str, turn_timeout: float = DEFAULT_TURN_TIMEOUT,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS, outbox_size: int = DEFAULT_OUTBOX_SIZE,
+                 metrics: Optional[Metrics] = None, metrics_sink=None,
+                 metrics_interval: float = DEFAULT_METRICS_INTERVAL, view_radius: Optional[int] = None):
+        """
+        Initialize a GameServer object, loading the map every session plays on.
+
+        Args:
+            map_file (str): The map in the JSON or binary format.
+            turn_timeout (float): The seconds a round waits for actions.
+            max_sessions (int): The number of sessions hosted at once.
+            outbox_size (int): The number of messages queued for a client before it is dropped.
+            metrics (Metrics, optional): Shared by the server and the engines of the sessions.
+                Give it no sink, the server passes it to metrics_sink every metrics_interval.
+            metrics_sink (optional): Receives the metrics, such as a PrometheusSink.
+            metrics_interval (float): The seconds between two writes of the metrics.
+            view_radius (int, optional): The sight radius of the heroes, to send every client
+                only the cells its heroes see before each round.
+        """
+        if os.path.splitext(map_file)[1].lower() == ".json":
+            template = MazeEngine()
+            template.load_game_map_from_json(map_file)
+            self.__width, self.__height = template.maze.width, template.maze.height
+            self.__grid = bytes(template.maze.grid)
+            self.__items = [{"x": item.x, "y": item.y, "name": item.name} for item in template.game_objects]
+        else:
+            binary_map = open_binary_map(map_file)
+            self.__width, self.__height = binary_map.width, binary_map.height
+            self.__grid = bytes(binary_map.grid)
+            self.__items = binary_map.items
+
+        self.__turn_timeout = turn_timeout
+        self.__max_sessions = max_sessions
+        self.__outbox_size = outbox_size
+        self.__metrics = metrics
+        self.__metrics_sink = metrics_sink
+        self.__metrics_interval = metrics_interval
+        self.__view_radius = view_radius
+        self.__sessions: Dict[str, GameSession] = {}
+        self.__clients: List[ClientConnection] = []
+
+    @property
+    def sessions(self) -> Dict[str, GameSession]:
+        """Get the sessions by name."""
+        return self.__sessions
+
+    @property
+    def metrics(self) -> Optional[Metrics]:
+        """Get the metrics, None when they are off."""
+        return self.__metrics
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Increase a server counter when metrics are on.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int): The increase.
+        """
+        if self.__metrics is not None:
+            self.__metrics.increment(name, amount)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Add a duration to a server histogram when metrics are on.
+
+        Args:
+            name (str): The name of the histogram.
+            seconds (float): The duration.
+        """
+        if self.__metrics is not None:
+            self.__metrics.observe(name, seconds)
+
+    def stats(self) -> dict:
+        """Get the statistics of the server and its sessions."""
+        return {
+            "clients": len(self.__clients),
+            "sessions": len(self.__sessions),
+            "running_sessions": sum(session.started for session in self.__sessions.values()),
+            "session_stats": [session.stats() for session in self.__sessions.values()],
+        }
+
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        """
+        Start listening on a TCP port.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port, 0 for any free port.
+
+        Returns:
+            asyncio.AbstractServer: The listening server.
+        """
+        self.__start_metrics()
+        return await asyncio.start_server(self.__handle_client, host, port, limit=MAX_MESSAGE_SIZE,
+                                          backlog=LISTEN_BACKLOG)
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        """
+        Start listening on a Unix socket.
+
+        Args:
+            path (str): The path of the socket.
+
+        Returns:
+            asyncio.AbstractServer: The listening server.
+        """
+        self.__start_metrics()
+        return await asyncio.start_unix_server(self.__handle_client, path, limit=MAX_MESSAGE_SIZE,
+                                               backlog=LISTEN_BACKLOG)
+
+    def handle_message(self, client: ClientConnection, message: dict) -> None:
+        """
+        Handle a message of a client.
+
+        Args:
+            client (ClientConnection): The client.
+            message (dict): The decoded message.
+        """
+        try:
+            match message.get("op"):
+                case "join":
+                    self.__join(client, str(message["session"]), str(message["hero"]))
+                case "start":
+                    self.__session_of(client, message).start()
+                    client.send({"type": "started", "session": message["session"]})
+                case "action":
+                    session = self.__session_of(client, message)
+                    session.act(client.sessions[session.name], message["action"])
+                case "stats":
+                    client.send({"type": "stats", **self.stats()})
+                case op:
+                    raise ValueError(f"Unknown op {op!r}")
+        except (KeyError, ValueError) as error:
+            client.send({"type": "error", "message": str(error)})
+
+    def disconnect(self, client: ClientConnection) -> None:
+        """
+        Remove a client from the server and its sessions.
+
+        Args:
+            client (ClientConnection): The client.
+        """
+        if client in self.__clients:
+            self.__clients.remove(client)
+        for session_name, hero_name in client.sessions.items():
+            session = self.__sessions.get(session_name)
+            if session is not None:
+                session.leave(hero_name)
+                if not session.started and not session.clients:
+                    self.end_session(session)
+        client.sessions.clear()
+
+    def end_session(self, session: GameSession) -> None:
+        """
+        Remove a finished or abandoned session.
+
+        Args:
+            session (GameSession): The session.
+        """
+        if self.__sessions.get(session.name) is session:
+            del self.__sessions[session.name]
+            for client in session.clients:
+                client.sessions.pop(session.name, None)
+            session.cancel()
+
+    async def __handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve a client until it disconnects."""
+        client = ClientConnection(self, reader, writer, self.__outbox_size)
+        self.__clients.append(client)
+        self.count(CONNECTIONS)
+        await client.run()
+
+    def __join(self, client: ClientConnection, session_name: str, hero_name: str) -> None:
+        """Add the hero of a client to a session, creating the session if needed."""
+        if session_name in client.sessions:
+            raise ValueError(f"Already playing in session {session_name}")
+        session = self.__sessions.get(session_name)
+        if session is None:
+            if len(self.__sessions) >= self.__max_sessions:
+                raise ValueError("The server hosts too many sessions")
+            engine = MazeEngine(metrics=self.__metrics)
+            engine.maze.load_grid(self.__width, self.__height, bytearray(self.__grid))
+            engine.set_items(self.__items)
+            session = GameSession(self, session_name, engine, self.__turn_timeout, self.__view_radius)
+            self.__sessions[session_name] = session
+            self.count(SESSIONS)
+        session.join(client, hero_name)
+        client.sessions[session_name] = hero_name
+        client.send({"type": "joined", "session": session_name, "hero": hero_name})
+
+    def __session_of(self, client: ClientConnection, message: dict) -> GameSession:
+        """Get the session a message is about, which the client must have joined."""
+        session_name = str(message["session"])
+        session = self.__sessions.get(session_name)
+        if session is None or session_name not in client.sessions:
+            raise ValueError(f"Not playing in session {session_name}")
+        return session
+
+    def __start_metrics(self) -> None:
+        """Start writing the metrics to the sink periodically."""
+        if self.__metrics is not None and self.__metrics_sink is not None:
+            asyncio.create_task(self.__write_metrics())
+
+    async def __write_metrics(self) -> None:
+        """Write the metrics to the sink every metrics_interval seconds."""
+        while True:
+            await asyncio.sleep(self.__metrics_interval)
+            self.__metrics_sink.write(self.__metrics)
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the server until it is interrupted."""
+    sink = None
+    if args.prometheus:
+        sink = PrometheusSink(args.prometheus)
+    elif args.metrics_jsonl:
+        sink = JsonLinesSink(args.metrics_jsonl)
+    server = GameServer(args.map_file, args.turn_timeout, args.max_sessions,
+                        metrics=Metrics() if sink is not None else None, metrics_sink=sink,
+                        view_radius=args.view_radius)
+    if args.unix:
+        listener = await server.serve_unix(args.unix)
+    else:
+        listener = await server.serve_tcp(args.host, args.port)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Host Maze Game sessions over JSON lines")
+    parser.add_argument("map_file", help="map in the JSON or binary format")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--turn-timeout", type=float, default=DEFAULT_TURN_TIMEOUT)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--view-radius", type=int, default=None,
+                        help="send each client the cells its heroes see within this radius")
+    parser.add_argument("--prometheus", help="Prometheus text file to write the metrics to")
+    parser.add_argument("--metrics-jsonl", help="JSON lines file to append the metrics to")
+    asyncio.run(_serve(parser.parse_args()))
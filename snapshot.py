@@ -0,0 +1,260 @@
+import json
+import struct
+import zlib
+from typing import Iterable, List, Tuple
+
+from cell_types import CELL_TYPES
+from hero import Hero
+from item import Item
+from map_binary import POSITION as ITEM_POSITION, pack_name, translation_table
+from maze import Maze
+
+# A snapshot file is a sequence of records: kind (u8), payload length (u32) and the
+# zlib-compressed payload. A FULL record holds the whole game, a DELTA record holds the cells
+# changed since the previous record and the current heroes, items and fire cells.
+FULL = 1
+DELTA = 2
+RECORD = struct.Struct("<BI")
+SIZE = struct.Struct("<II")
+POSITION = struct.Struct("<II")
+CHANGE = struct.Struct("<QB")
+HERO = struct.Struct("<iiii")  # Heroes scared off the map may stand outside it
+COUNT = struct.Struct("<I")
+COMPRESSION_LEVEL = 1
+
+
+class SnapshotState:
+    """The game state read back from a snapshot file."""
+
+    def __init__(self, width: int, height: int, grid: bytearray, fire_cells: List[tuple],
+                 heroes: List[Hero], items: List[Item], is_end: bool):
+        """
+        Initialize a SnapshotState object.
+
+        Args:
+            width (int): The width of the maze.
+            height (int): The height of the maze.
+            grid (bytearray): The cell type codes of the maze.
+            fire_cells (List[tuple]): The coordinates of the fire cells.
+            heroes (List[Hero]): The heroes in the game.
+            items (List[Item]): The items lying in the maze.
+            is_end (bool): True if the game has ended.
+        """
+        self.width = width
+        self.height = height
+        self.grid = grid
+        self.fire_cells = fire_cells
+        self.heroes = heroes
+        self.items = items
+        self.is_end = is_end
+
+
+def encode_full(maze: Maze, heroes: List[Hero], items: List[Item], is_end: bool) -> bytes:
+    """
+    Encodes a record with the whole game state.
+
+    Args:
+        maze (Maze): The maze.
+        heroes (List[Hero]): The heroes in the game.
+        items (List[Item]): The items lying in the maze.
+        is_end (bool): True if the game has ended.
+
+    Returns:
+        bytes: The encoded record.
+    """
+    parts = [bytes((is_end,)), SIZE.pack(maze.width, maze.height), bytes((len(CELL_TYPES),))]
+    parts.extend(pack_name(cell_type) for cell_type in CELL_TYPES)
+    parts.append(bytes(maze.grid))
+    _pack_objects(parts, maze, heroes, items)
+    return _record(FULL, parts)
+
+
+def encode_delta(maze: Maze, changed_cells: Iterable[int], heroes: List[Hero], items: List[Item],
+                 is_end: bool) -> bytes:
+    """
+    Encodes a record with the cells changed since the previous record.
+
+    Args:
+        maze (Maze): The maze.
+        changed_cells (Iterable[int]): The grid indexes of the changed cells.
+        heroes (List[Hero]): The heroes in the game.
+        items (List[Item]): The items lying in the maze.
+        is_end (bool): True if the game has ended.
+
+    Returns:
+        bytes: The encoded record.
+    """
+    grid = maze.grid
+    changed_cells = sorted(changed_cells)
+    parts = [bytes((is_end,)), COUNT.pack(len(changed_cells))]
+    parts.extend(CHANGE.pack(index, grid[index]) for index in changed_cells)
+    _pack_objects(parts, maze, heroes, items)
+    return _record(DELTA, parts)
+
+
+def read_snapshots(file_name: str) -> SnapshotState:
+    """
+    Reads a snapshot file, applying every delta record on top of the last full one.
+
+    Args:
+        file_name (str): The name of the snapshot file.
+
+    Returns:
+        SnapshotState: The game state after the last record.
+    """
+    state = None
+    with open(file_name, "rb") as f:
+        while header := f.read(RECORD.size):
+            kind, length = RECORD.unpack(header)
+            payload = memoryview(zlib.decompress(f.read(length)))
+            if kind == FULL:
+                state = _read_full(payload)
+            elif kind == DELTA:
+                if state is None:
+                    raise ValueError(f"{file_name} starts with a delta snapshot")
+                _read_delta(payload, state)
+            else:
+                raise ValueError(f"{file_name} has an unknown snapshot record {kind}")
+
+    if state is None:
+        raise ValueError(f"{file_name} holds no snapshot")
+    return state
+
+
+def encode_checkpoint(maze: Maze, heroes: List[Hero], items: List[Item], is_end: bool,
+                      extras: dict) -> bytes:
+    """
+    Encodes the whole game state with extra JSON data, such as the round number.
+
+    Args:
+        maze (Maze): The maze.
+        heroes (List[Hero]): The heroes in the game.
+        items (List[Item]): The items lying in the maze.
+        is_end (bool): True if the game has ended.
+        extras (dict): Data kept next to the game state, must be JSON serializable.
+
+    Returns:
+        bytes: The encoded checkpoint, the JSON data followed by a FULL record.
+    """
+    extras_data = json.dumps(extras).encode("utf-8")
+    return COUNT.pack(len(extras_data)) + extras_data + encode_full(maze, heroes, items, is_end)
+
+
+def decode_checkpoint(data: bytes) -> Tuple[SnapshotState, dict]:
+    """
+    Decodes a checkpoint written by encode_checkpoint.
+
+    Args:
+        data (bytes): The encoded checkpoint.
+
+    Returns:
+        Tuple[SnapshotState, dict]: The game state and the extra data.
+    """
+    extras_length = COUNT.unpack_from(data)[0]
+    extras = json.loads(data[COUNT.size:COUNT.size + extras_length])
+    kind, length = RECORD.unpack_from(data, COUNT.size + extras_length)
+    if kind != FULL:
+        raise ValueError(f"A checkpoint holds a full snapshot, found record {kind}")
+    start = COUNT.size + extras_length + RECORD.size
+    return _read_full(memoryview(zlib.decompress(data[start:start + length]))), extras
+
+
+def _record(kind: int, parts: List[bytes]) -> bytes:
+    """Compress a payload and prepend the record header."""
+    payload = zlib.compress(b"".join(parts), COMPRESSION_LEVEL)
+    return RECORD.pack(kind, len(payload)) + payload
+
+
+def _pack_objects(parts: List[bytes], maze: Maze, heroes: List[Hero], items: List[Item]):
+    """Append the fire cells, heroes and items to a payload."""
+    parts.append(COUNT.pack(len(maze.coord_fire_cells)))
+    parts.extend(POSITION.pack(x, y) for x, y in maze.coord_fire_cells)
+
+    parts.append(COUNT.pack(len(heroes)))
+    for hero in heroes:
+        parts.append(HERO.pack(hero.x, hero.y, hero.health, hero.count_medical_kit))
+        parts.append(pack_name(hero.name))
+        parts.append(pack_name(hero.old_direction))
+        _pack_items(parts, hero.pocket)
+
+    _pack_items(parts, items)
+
+
+def _pack_items(parts: List[bytes], items: List[Item]):
+    """Append a list of items to a payload."""
+    parts.append(COUNT.pack(len(items)))
+    for item in items:
+        parts.append(ITEM_POSITION.pack(item.x, item.y))
+        parts.append(pack_name(item.name))
+
+
+class _Reader:
+    """Reads values from a snapshot payload."""
+
+    def __init__(self, payload: memoryview):
+        self.__payload = payload
+        self.__pos = 0
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.__payload, self.__pos)
+        self.__pos += fmt.size
+        return values
+
+    def read(self, size: int) -> memoryview:
+        data = self.__payload[self.__pos:self.__pos + size]
+        self.__pos += size
+        return data
+
+    def name(self) -> str:
+        return bytes(self.read(self.read(1)[0])).decode("utf-8")
+
+    def items(self) -> List[Item]:
+        items = []
+        for _ in range(self.unpack(COUNT)[0]):
+            x, y = self.unpack(ITEM_POSITION)
+            items.append(Item(x, y, self.name()))
+        return items
+
+
+def _read_full(payload: memoryview) -> SnapshotState:
+    """Decode a FULL record."""
+    reader = _Reader(payload)
+    is_end = bool(reader.read(1)[0])
+    width, height = reader.unpack(SIZE)
+    file_types = [reader.name() for _ in range(reader.read(1)[0])]
+    grid = bytearray(reader.read(width * height))
+    if file_types != list(CELL_TYPES[:len(file_types)]):
+        grid = grid.translate(translation_table("The snapshot", file_types))
+
+    state = SnapshotState(width, height, grid, [], [], [], is_end)
+    _read_objects(reader, state)
+    return state
+
+
+def _read_delta(payload: memoryview, state: SnapshotState):
+    """Apply a DELTA record to a state."""
+    reader = _Reader(payload)
+    state.is_end = bool(reader.read(1)[0])
+    grid = state.grid
+    for _ in range(reader.unpack(COUNT)[0]):
+        index, code = reader.unpack(CHANGE)
+        grid[index] = code
+    _read_objects(reader, state)
+
+
+def _read_objects(reader: _Reader, state: SnapshotState):
+    """Read the fire cells, heroes and items of a record into a state."""
+    state.fire_cells = [reader.unpack(POSITION) for _ in range(reader.unpack(COUNT)[0])]
+
+    state.heroes = []
+    for _ in range(reader.unpack(COUNT)[0]):
+        x, y, health, count_medical_kit = reader.unpack(HERO)
+        hero = Hero(x, y, reader.name())
+        hero.old_direction = reader.name()
+        hero.health = health
+        hero.count_medical_kit = count_medical_kit
+        for item in reader.items():
+            hero.add_item_in_pocket(item)
+        state.heroes.append(hero)
+
+    state.items = reader.items()
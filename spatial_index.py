@@ -0,0 +1,70 @@
+from typing import Dict, List, Sequence, Tuple
+
+from game_object import GameObject
+
+
+class SpatialIndex:
+    """Keeps game objects bucketed by their position for constant-time lookups."""
+
+    def __init__(self):
+        """Initialize an empty SpatialIndex."""
+        self.__buckets: Dict[Tuple[int, int], List[GameObject]] = {}
+
+    def add(self, obj: GameObject):
+        """Add an object to the index, its moves are tracked from now on.
+
+        Args:
+            obj (GameObject): The object to add.
+        """
+        self.__buckets.setdefault(obj.position, []).append(obj)
+        obj._index = self
+
+    def remove(self, obj: GameObject):
+        """Remove an object from the index.
+
+        Args:
+            obj (GameObject): The object to remove.
+        """
+        self.__discard(obj, obj.position)
+        obj._index = None
+
+    def move(self, obj: GameObject, old_position: tuple):
+        """Move an object to the bucket of its current position.
+
+        Args:
+            obj (GameObject): The object that moved.
+            old_position (tuple): The position the object moved from.
+        """
+        if old_position != obj.position:
+            self.__discard(obj, old_position)
+            self.__buckets.setdefault(obj.position, []).append(obj)
+
+    def get(self, position: tuple) -> Sequence[GameObject]:
+        """Get the objects at a position.
+
+        Args:
+            position (tuple): The position to look up.
+
+        Returns:
+            Sequence[GameObject]: The objects at the position.
+        """
+        return self.__buckets.get(position, ())
+
+    def clear(self):
+        """Remove all objects from the index."""
+        for bucket in self.__buckets.values():
+            for obj in bucket:
+                obj._index = None
+        self.__buckets.clear()
+
+    def __discard(self, obj: GameObject, position: tuple):
+        """Remove an object from the bucket of a position, compared by identity."""
+        bucket = self.__buckets.get(position)
+        if bucket is None:
+            return
+        for i, other in enumerate(bucket):
+            if other is obj:
+                del bucket[i]
+                break
+        if not bucket:
+            del self.__buckets[position]
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+DEFAULT_MAP = "JSON/game_map.json"
+DEFAULT_RUNS = 10
+DEFAULT_BUDGET_MS = 50.0  # Allowed median time from the first import to a game ready to play
+TOP_IMPORTS = 10
+
+# Each scenario runs in a fresh interpreter, timed from before the first import of the game
+# until a game with one hero has its map loaded. {map} and {compiled} are the map files.
+SCENARIOS = {
+    "import": "import maze_gama",
+    "json": ("from hero import Hero\n"
+             "from maze_gama import MazeGame\n"
+             "game = MazeGame([Hero(0, 3, 'hero')], [])\n"
+             "game.load_game_map_from_json({map!r})"),
+    "registry": ("from hero import Hero\n"
+                 "from map_registry import MapRegistry\n"
+                 "from maze_gama import MazeGame\n"
+                 "game = MazeGame([Hero(0, 3, 'hero')], [])\n"
+                 "game.load_map_entry(MapRegistry({cache_dir!r}).get({map!r}))"),
+    "compiled": ("from hero import Hero\n"
+                 "from compiled_map import load_compiled_map\n"
+                 "from maze_gama import MazeGame\n"
+                 "game = MazeGame([Hero(0, 3, 'hero')], [])\n"
+                 "game.load_map_entry(load_compiled_map({compiled!r}))"),
+}
+BUDGETED_SCENARIO = "compiled"
+
+TIMED = """import time
+start = time.perf_counter()
+{code}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def run_scenario(code: str, runs: int = DEFAULT_RUNS) -> dict:
+    """
+    Runs a startup scenario in fresh interpreters.
+
+    Args:
+        code (str): The code starting the game.
+        runs (int): The number of interpreters to start.
+
+    Returns:
+        dict: The median and minimum milliseconds, and the slowest imports of the last run
+            with their cumulative microseconds, as reported by python -X importtime.
+    """
+    times = []
+    imports = {}
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", TIMED.format(code=code)],
+                                   capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        times.append(float(completed.stdout.split()[-1]))
+        imports = parse_import_times(completed.stderr)
+    slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "imports_us": dict(slowest),
+    }
+
+
+def parse_import_times(output: str) -> Dict[str, int]:
+    """
+    Parses the output of python -X importtime.
+
+    Args:
+        output (str): The standard error of the interpreter.
+
+    Returns:
+        Dict[str, int]: The cumulative microseconds of every top-level import by module name.
+    """
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # Imported by the scenario itself, not by another module
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def run_startup(map_file: str = DEFAULT_MAP, runs: int = DEFAULT_RUNS) -> dict:
+    """
+    Measures the startup of games in every scenario.
+
+    The registry scenario loads from a disk cache written before the runs, as a worker does
+    after the first game on a map. The compiled scenario loads a compiled map of map_file.
+
+    Args:
+        map_file (str): The map to start games on.
+        runs (int): The number of interpreters to start per scenario.
+
+    Returns:
+        dict: The results by scenario.
+    """
+    from compiled_map import compile_map
+    from map_registry import MapRegistry
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        compiled = os.path.join(cache_dir, "map.mazc")
+        compile_map(MapRegistry(cache_dir).get(map_file), compiled)
+        values = {"map": os.path.abspath(map_file), "cache_dir": cache_dir, "compiled": compiled}
+        return {name: run_scenario(code.format(**values), runs) for name, code in SCENARIOS.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure how long the Maze Game takes to start a game")
+    parser.add_argument("--map", default=DEFAULT_MAP, help="map in the JSON or binary format")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"median milliseconds allowed for the {BUDGETED_SCENARIO} scenario")
+    args = parser.parse_args()
+
+    results = run_startup(args.map, args.runs)
+    print(json.dumps(results, indent=2))
+    median = results[BUDGETED_SCENARIO]["median_ms"]
+    if median > args.budget_ms:
+        print(f"OVER BUDGET {BUDGETED_SCENARIO}: {median:.1f} ms > {args.budget_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
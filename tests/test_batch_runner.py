@@ -0,0 +1,42 @@
+import json
+
+import batch_runner
+from batch_runner import MatchSpec, run_batch
+from map_binary import json_to_binary
+
+SCRIPT = {"hero": ["p", "r"]}
+
+
+def write_json_map(path, cell_types):
+    path.write_text(json.dumps({
+        "game_map": [[{"x": x, "y": 0, "object_type": "cell", "cell_type": cell_type}
+                      for x, cell_type in enumerate(cell_types)]],
+        "items": [{"x": 0, "y": 0, "name": "key"}],
+    }))
+    return str(path)
+
+
+def test_each_match_plays_on_its_own_map(tmp_path):
+    winnable = write_json_map(tmp_path / "winnable.json", ["start", "end"])
+    walled = write_json_map(tmp_path / "walled.json", ["start", "wall"])
+
+    batch = run_batch(winnable, [
+        MatchSpec(1, ["hero"], SCRIPT),
+        MatchSpec(2, ["hero"], SCRIPT, map_file=walled),
+        MatchSpec(3, ["hero"], SCRIPT, map_file=winnable),
+    ], processes=2, chunksize=1)
+
+    assert [match.winner for match in batch.matches] == ["hero", None, "hero"]
+
+
+def test_worker_opens_each_map_once(tmp_path, monkeypatch):
+    binary_file = str(tmp_path / "map.mazb")
+    json_to_binary(write_json_map(tmp_path / "map.json", ["start", "end"]), binary_file)
+    monkeypatch.setattr(batch_runner, "_worker_maps", {})
+
+    first = batch_runner._run_match((binary_file, MatchSpec(1, ["hero"], SCRIPT)))
+    binary_map = batch_runner._worker_maps[binary_file]
+    second = batch_runner._run_match((binary_file, MatchSpec(2, ["hero"], SCRIPT)))
+
+    assert (first.winner, second.winner) == ("hero", "hero")
+    assert batch_runner._worker_maps == {binary_file: binary_map}
@@ -0,0 +1,28 @@
+from benchmark import compare, measure_repeats, run_scale
+
+
+def report(**seconds):
+    return {"results": {key: {"seconds": value} for key, value in seconds.items()}}
+
+
+def test_compare_flags_slowdowns_beyond_the_tolerance():
+    regressions = compare(report(fast=0.010, slow=0.013), report(fast=0.010, slow=0.010), tolerance=0.25)
+    assert [regression.key for regression in regressions] == ["slow"]
+
+
+def test_compare_ignores_timings_below_the_noise_floor():
+    assert compare(report(tiny=0.0009), report(tiny=0.0001), min_seconds=0.001) == []
+
+
+def test_measure_repeats_times_every_repeat():
+    calls = []
+    times = measure_repeats(lambda: calls.append("run"), 3, lambda: calls.append("setup"))
+    assert len(times) == 3
+    assert calls == ["setup", "run"] * 3
+
+
+def test_round_results_count_the_rounds_played():
+    results = {result.name: result for result in run_scale("small", repeats=2, rounds=3)}
+    assert 0 < results["rounds"].operations <= 3
+    assert results["hero_moves"].seconds == results["rounds"].seconds
+    assert results["hero_moves"].operations <= 10 * results["rounds"].operations
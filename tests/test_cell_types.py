@@ -0,0 +1,13 @@
+from cell_types import ITEM_TYPES, UNKNOWN_ITEM_TYPE, item_type
+
+
+def test_item_type_of_a_registered_name():
+    assert item_type("key") is ITEM_TYPES["key"]
+    assert item_type("key").opens_end
+
+
+def test_unknown_item_names_share_a_type_without_behaviour():
+    unknown = item_type("rubber duck")
+    assert unknown is item_type("teapot") is UNKNOWN_ITEM_TYPE
+    assert (unknown.pickable, unknown.heals, unknown.opens_end) == (False, False, False)
+    assert "rubber duck" not in ITEM_TYPES
@@ -0,0 +1,72 @@
+import pytest
+
+import chunked_maze
+from cell_types import CELL_CODES, FIRE, PASSAGE
+from chunked_maze import ChunkedMaze, write_chunked_map
+
+CHUNK_SIZE = 4
+
+
+def write_open_map(path, width=16, height=16):
+    grid = bytearray((PASSAGE,)) * (width * height)
+    grid[0] = CELL_CODES["start"]
+    write_chunked_map(str(path), width, height, grid, [{"x": 1, "y": 0, "name": "key"}], CHUNK_SIZE)
+    return str(path)
+
+
+def test_cells_and_items_round_trip(tmp_path):
+    with ChunkedMaze(write_open_map(tmp_path / "map.mazk"), fire_cells_count=0) as maze:
+        assert (maze.width, maze.height) == (16, 16)
+        assert maze.find_cell("start") == (0, 0)
+        assert maze.items == [{"x": 1, "y": 0, "name": "key"}]
+
+
+def test_changes_outlive_eviction_but_not_the_game(tmp_path):
+    file_name = write_open_map(tmp_path / "map.mazk")
+    source = (tmp_path / "map.mazk").read_bytes()
+    budget = CHUNK_SIZE * CHUNK_SIZE
+    with ChunkedMaze(file_name, budget, fire_cells_count=3, seed=1) as maze:
+        maze.set_cell_type(15, 15, "wall")
+        maze.get_cell_code(0, 0)  # Evicts the changed chunk
+        for _ in range(3):
+            maze.init_fire_cells()
+            maze.put_out_fire_cell()
+        assert maze.cache_stats["write_backs"] > 0
+        assert maze.get_cell_type(15, 15) == "wall"
+        assert maze.find_cell("wall") == (15, 15)
+
+    assert (tmp_path / "map.mazk").read_bytes() == source
+    with ChunkedMaze(file_name, fire_cells_count=0) as maze:
+        assert maze.get_cell_type(15, 15) == "passage"
+
+
+def test_fire_depends_on_the_seed_only(tmp_path):
+    file_name = write_open_map(tmp_path / "map.mazk")
+    fire_cells = []
+    for budget, resident in ((CHUNK_SIZE * CHUNK_SIZE, (9, 9)), (16 * 16, (0, 0))):
+        with ChunkedMaze(file_name, budget, fire_cells_count=5, seed=1) as maze:
+            maze.get_cell_code(*resident)
+            maze.init_fire_cells()
+            assert all(maze.get_cell_code(x, y) == FIRE for x, y in maze.coord_fire_cells)
+            fire_cells.append(list(maze.coord_fire_cells))
+
+    assert len(fire_cells[0]) == 5
+    assert fire_cells[0] == fire_cells[1]
+    # Drawn across the whole map, not only around the resident chunk
+    assert any(not (8 <= x < 12 and 8 <= y < 12) for x, y in fire_cells[0])
+
+
+def test_file_is_closed_when_the_header_is_invalid(tmp_path, monkeypatch):
+    path = tmp_path / "map.mazk"
+    path.write_bytes(b"NOPE" + bytes(64))
+    opened = []
+
+    def recording_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(chunked_maze, "open", recording_open, raising=False)
+
+    with pytest.raises(ValueError):
+        ChunkedMaze(str(path))
+    assert opened[0].closed
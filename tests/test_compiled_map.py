@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cell_types import CELL_CODES, CELL_TYPES, ITEM_TYPES
+from compiled_map import CELL_RULE, COMPILED_HEADER, ITEM_RULE, compile_map, load_compiled_map
+from hero import Hero
+from map_registry import MapRegistry
+from maze import Maze
+from maze_engine import MazeEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAP_FILE = os.path.join(ROOT, "JSON", "game_map.json")
+CELL_COUNT_OFFSET = 46  # Of the cell type count in COMPILED_HEADER, the item type count follows
+
+
+@pytest.fixture
+def compiled(tmp_path) -> str:
+    file_name = str(tmp_path / "map.mazc")
+    compile_map(MapRegistry(str(tmp_path / "cache")).get(MAP_FILE), file_name)
+    return file_name
+
+
+def test_compiled_map_round_trip(tmp_path, compiled):
+    expected = MapRegistry(str(tmp_path / "cache")).get(MAP_FILE)
+    entry = load_compiled_map(compiled)
+
+    assert (entry.key, entry.width, entry.height) == (expected.key, expected.width, expected.height)
+    assert entry.grid == expected.grid
+    assert entry.items == expected.items
+    assert list(entry.passages) == list(expected.passages)
+    assert list(entry.passage_slots) == list(expected.passage_slots)
+    assert list(entry.connectivity.labels) == list(expected.connectivity.labels)
+
+
+def test_games_share_the_passage_slots_without_changing_them(compiled):
+    entry = load_compiled_map(compiled)
+    slots = bytes(entry.passage_slots)
+    shared, own = Maze(seed=3), Maze(seed=3)
+    shared.load_grid(entry.width, entry.height, entry.new_grid(), entry.passages, entry.passage_slots)
+    own.load_grid(entry.width, entry.height, entry.new_grid())
+
+    for _ in range(20):
+        shared.init_fire_cells()
+        own.init_fire_cells()
+        assert shared.coord_fire_cells == own.coord_fire_cells
+        shared.put_out_fire_cell()
+        own.put_out_fire_cell()
+
+    assert bytes(entry.passage_slots) == slots
+
+
+def test_two_games_on_one_entry_play_alike(compiled):
+    entry = load_compiled_map(compiled)
+    games = []
+    for _ in range(2):
+        engine = MazeEngine([Hero(0, 3, "hero")], seed=5)
+        engine.load_map_entry(entry)
+        games.append([[event.to_json() for event in engine.step_round({"hero": "r"})] for _ in range(5)])
+    assert games[0] == games[1]
+
+
+@pytest.mark.parametrize("cut", [1, 10, 100, 1000, 5000])
+def test_truncated_compiled_map_is_rejected(compiled, cut):
+    with open(compiled, "rb") as f:
+        data = f.read()
+    with open(compiled, "wb") as f:
+        f.write(data[:max(len(data) - cut, 0)])
+
+    with pytest.raises(ValueError):
+        load_compiled_map(compiled)
+
+
+def test_no_type_is_registered_when_a_rule_differs(compiled):
+    with open(compiled, "rb") as f:
+        data = bytearray(f.read())
+    offset = COMPILED_HEADER.size
+    for _ in CELL_TYPES:
+        offset += 1 + data[offset] + CELL_RULE.size
+    data[offset:offset] = b"\x08new_cell" + CELL_RULE.pack(1, 0, 0, 0)
+    data[CELL_COUNT_OFFSET:CELL_COUNT_OFFSET + 2] = (len(CELL_TYPES) + 1).to_bytes(2, "little")
+    key_rule = data.index(b"\x03key") + 4
+    data[key_rule:key_rule + ITEM_RULE.size] = ITEM_RULE.pack(0, 1, 0)
+    with open(compiled, "wb") as f:
+        f.write(data)
+
+    with pytest.raises(ValueError, match="item type key"):
+        load_compiled_map(compiled)
+    assert "new_cell" not in CELL_CODES
+    assert ITEM_TYPES["key"].pickable
+
+
+def test_main_loads_compiled_maps_without_the_registry():
+    code = "import sys, main; print('map_registry' in sys.modules)"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    assert completed.stdout.strip() == "False"
@@ -0,0 +1,65 @@
+import io
+import json
+
+from event_sinks import ConsoleSink, EventStream, JsonLinesEventSink, RingBufferSink
+from events import GameEvent, format_event
+from hero import Hero
+from maze import Maze
+from maze_engine import MazeEngine
+
+ROWS = [
+    ["passage", "passage", "passage", "end"],
+    ["start", "passage", "wall", "passage"],
+]
+
+
+def play(stream: EventStream) -> list:
+    """Play a few rounds with the stream attached and return the events in the order they happened."""
+    maze = Maze(fire_cells_count=1, seed=2)
+    maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in ROWS])
+    engine = MazeEngine([Hero(0, 1, "first"), Hero(1, 1, "second")], maze)
+    engine.set_items([{"x": 2, "y": 0, "name": "key"}])
+    happened = []
+    engine.add_event_listener(happened.append)
+    stream.attach(engine)
+    for actions in ({"first": "u", "second": "u"}, {"first": "r", "second": "r"}, {"first": "p", "second": "h"}):
+        engine.step_round(actions)
+    return happened
+
+
+def test_sinks_receive_the_events_in_order(tmp_path):
+    ring = RingBufferSink()
+    console = io.StringIO()
+    log_file = str(tmp_path / "events.jsonl")
+    stream = EventStream([ring, ConsoleSink(console), JsonLinesEventSink(log_file)])
+
+    happened = play(stream)
+    stream.close()
+
+    assert ring.events == happened
+    assert console.getvalue() == "".join(format_event(event) + "\n" for event in happened)
+    with open(log_file) as f:
+        assert [json.loads(line) for line in f] == [json.loads(json.dumps(event.to_json())) for event in happened]
+
+
+def test_events_reach_the_sinks_at_the_end_of_each_round():
+    ring = RingBufferSink()
+    stream = EventStream([ring])
+    happened = play(stream)
+
+    assert ring.events == happened
+    stream.emit(GameEvent("custom"))
+    assert ring.events == happened
+    stream.flush()
+    assert [event.kind for event in ring.events] == [event.kind for event in happened] + ["custom"]
+
+
+def test_ring_buffer_keeps_the_latest_events():
+    ring = RingBufferSink(capacity=3)
+    stream = EventStream()
+    stream.add_sink(ring)
+    for number in range(5):
+        stream.emit(GameEvent("tick", number=number))
+    stream.flush()
+
+    assert [event.data["number"] for event in ring.events] == [2, 3, 4]
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from cell_types import CELL_CODES
+from map_binary import binary_to_json, json_to_binary, open_binary_map, write_binary_map
+
+ITEMS = [{"x": 1, "y": 0, "name": "key"}, {"x": 0, "y": 1, "name": "heart"}]
+
+
+def write_json_map(path, rows, items=ITEMS):
+    path.write_text(json.dumps({
+        "game_map": [[{"x": x, "y": y, "object_type": "cell", "cell_type": cell_type}
+                      for x, cell_type in enumerate(row)] for y, row in enumerate(rows)],
+        "items": items,
+    }))
+
+
+def test_binary_map_round_trip(tmp_path):
+    grid = bytes(CELL_CODES[cell_type] for cell_type in ("start", "passage", "wall", "end"))
+    write_binary_map(str(tmp_path / "map.mazb"), 2, 2, grid, ITEMS)
+
+    binary_map = open_binary_map(str(tmp_path / "map.mazb"))
+
+    assert (binary_map.width, binary_map.height) == (2, 2)
+    assert bytes(binary_map.grid) == grid
+    assert binary_map.items == ITEMS
+
+
+def test_json_to_binary_and_back(tmp_path):
+    rows = [["start", "passage", "passage"], ["wall", "extra_passage", "end"]]
+    write_json_map(tmp_path / "map.json", rows)
+
+    json_to_binary(str(tmp_path / "map.json"), str(tmp_path / "map.mazb"))
+    binary_to_json(str(tmp_path / "map.mazb"), str(tmp_path / "back.json"))
+
+    back = json.loads((tmp_path / "back.json").read_text())
+    assert [[cell["cell_type"] for cell in row] for row in back["game_map"]] == rows
+    assert back["items"] == ITEMS
+
+
+@pytest.mark.parametrize("lengths", [(2, 4, 3), (3, 2), (1, 1, 2)])
+def test_json_to_binary_rejects_ragged_rows(tmp_path, lengths):
+    write_json_map(tmp_path / "map.json", [["passage"] * length for length in lengths])
+    with pytest.raises(ValueError):
+        json_to_binary(str(tmp_path / "map.json"), str(tmp_path / "map.mazb"))
+
+
+def test_open_rejects_other_files(tmp_path):
+    (tmp_path / "map.mazb").write_bytes(b"not a map at all, just some bytes")
+    with pytest.raises(ValueError):
+        open_binary_map(str(tmp_path / "map.mazb"))
+
+
+@pytest.mark.parametrize("cut", [1, 5, 10, 40])
+def test_open_rejects_truncated_files(tmp_path, cut):
+    grid = bytes(CELL_CODES[cell_type] for cell_type in ("start", "passage", "wall", "end"))
+    path = tmp_path / "map.mazb"
+    write_binary_map(str(path), 2, 2, grid, ITEMS)
+    path.write_bytes(path.read_bytes()[:-cut])
+
+    with pytest.raises(ValueError):
+        open_binary_map(str(path))
+
+
+def test_items_off_the_map_round_trip(tmp_path):
+    items = [{"x": -1, "y": 0, "name": "key"}, {"x": 2, "y": -3, "name": "heart"}]
+    grid = bytes(CELL_CODES[cell_type] for cell_type in ("start", "passage", "wall", "end"))
+    write_binary_map(str(tmp_path / "map.mazb"), 2, 2, grid, items)
+
+    assert open_binary_map(str(tmp_path / "map.mazb")).items == items
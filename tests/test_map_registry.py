@@ -0,0 +1,44 @@
+import os
+import shutil
+
+import map_registry
+from map_registry import MapRegistry
+
+MAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JSON", "game_map.json")
+
+
+def copy_map(tmp_path) -> str:
+    map_file = str(tmp_path / "maps" / "game_map.json")
+    os.makedirs(os.path.dirname(map_file))
+    shutil.copy(MAP_FILE, map_file)
+    return map_file
+
+
+def test_derived_data_goes_to_the_user_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    map_file = copy_map(tmp_path)
+
+    entry = MapRegistry().get(map_file)
+
+    cache_dir = tmp_path / "cache" / map_registry.CACHE_DIR_NAME
+    assert (cache_dir / f"{entry.key}.mazb").exists()
+    assert os.listdir(tmp_path / "maps") == ["game_map.json"]
+
+
+def test_corrupt_cached_map_is_a_cache_miss(tmp_path):
+    map_file = copy_map(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    expected = MapRegistry(cache_dir).get(map_file)
+    binary_file = os.path.join(cache_dir, f"{expected.key}.mazb")
+
+    for corrupt in (lambda data: data[:-3], lambda data: data[:-len(data) // 3], lambda data: b"MAZB" + data[4:6]):
+        with open(binary_file, "rb") as f:
+            data = f.read()
+        with open(binary_file, "wb") as f:
+            f.write(corrupt(data))
+        os.remove(os.path.join(cache_dir, f"{expected.key}.mazl"))  # Forces the map to be read again
+
+        entry = MapRegistry(cache_dir).get(map_file)
+
+        assert entry.grid == expected.grid
+        assert entry.items == expected.items
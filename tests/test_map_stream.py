@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+import map_stream
+from map_stream import MapStreamReader
+
+MAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JSON", "game_map.json")
+
+
+def recording_open(monkeypatch):
+    opened = []
+
+    def open_and_record(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(map_stream, "open", open_and_record, raising=False)
+    return opened
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, map_stream.READ_CHUNK_SIZE])
+def test_rows_and_values_match_json_load(chunk_size):
+    with open(MAP_FILE, "rb") as f:
+        expected = json.load(f)
+
+    reader = MapStreamReader(MAP_FILE, chunk_size=chunk_size)
+
+    assert list(reader.rows()) == expected["game_map"]
+    assert reader.values() == {"items": expected["items"]}
+
+
+def test_values_before_the_game_map_are_kept(tmp_path):
+    path = tmp_path / "map.json"
+    data = {"items": [{"x": 1, "y": 0, "name": "key"}], "game_map": [[{"cell_type": "start"}], []], "name": "é"}
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+    reader = MapStreamReader(str(path), chunk_size=5)
+
+    assert list(reader.rows()) == data["game_map"]
+    assert reader.values() == {"items": data["items"], "name": "é"}
+
+
+def test_file_is_closed_when_a_row_is_malformed(tmp_path, monkeypatch):
+    path = tmp_path / "map.json"
+    path.write_text('{"game_map": [[{"cell_type": "wall"}], [{"cell_type": }]]}')
+    opened = recording_open(monkeypatch)
+
+    with pytest.raises(ValueError):
+        list(MapStreamReader(str(path)).rows())
+    assert opened[0].closed
+
+
+def test_file_is_closed_when_the_progress_callback_raises(monkeypatch):
+    opened = recording_open(monkeypatch)
+
+    def progress(_):
+        raise RuntimeError("stop")
+
+    monkeypatch.setattr(map_stream, "PROGRESS_INTERVAL", 0.0)
+    with pytest.raises(RuntimeError):
+        list(MapStreamReader(MAP_FILE, progress).rows())
+    assert opened[0].closed
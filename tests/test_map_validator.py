@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from map_validator import MapValidationError, validate_map, validate_map_file
+from maze import Maze
+from maze_engine import MazeEngine
+
+# A wall splits the map, the start is on the left and the end on the right
+ROWS = [
+    ["start", "passage", "wall", "passage", "end"],
+    ["passage", "passage", "wall", "passage", "passage"],
+]
+
+
+def make_maze(rows=ROWS) -> Maze:
+    maze = Maze(fire_cells_count=0)
+    maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in rows])
+    return maze
+
+
+def test_reachable_key_and_end_pass():
+    rows = [row[:2] + ["passage"] + row[3:] for row in ROWS]
+    report = validate_map(make_maze(rows), [{"x": 1, "y": 1, "name": "key"}])
+
+    assert report.ok
+    assert report.index.can_win((0, 0), False, [(1, 1)])
+
+
+def test_unreachable_key_is_rejected():
+    report = validate_map(make_maze(), [{"x": 3, "y": 1, "name": "key"}])
+
+    assert not report.ok
+    assert any("No key can be reached" in error for error in report.errors)
+
+
+def test_unreachable_end_is_rejected():
+    report = validate_map(make_maze(), [{"x": 1, "y": 1, "name": "key"}])
+
+    assert not report.ok
+    assert any("No exit can be reached" in error for error in report.errors)
+
+
+def test_engine_refuses_an_unwinnable_map(tmp_path):
+    path = tmp_path / "map.json"
+    path.write_text(json.dumps({
+        "game_map": [[{"cell_type": cell_type} for cell_type in row] for row in ROWS],
+        "items": [{"x": 1, "y": 1, "name": "key"}],
+    }))
+
+    assert not validate_map_file(str(path)).ok
+    with pytest.raises(MapValidationError):
+        MazeEngine(maze=Maze(fire_cells_count=0)).load_game_map_from_json(str(path), validate=True)
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import maze as maze_module
+from cell_types import CELL_CODES, CELL_TYPES, FIRE, PASSAGE, WALL
+from maze import Maze
+
+ROWS = [
+    ["wall", "passage", "passage", "end"],
+    ["start", "passage", "wall", "extra_passage"],
+]
+
+
+def make_maze(rows=ROWS, seed=0) -> Maze:
+    maze = Maze(seed=seed)
+    maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in rows])
+    return maze
+
+
+def test_grid_stores_one_code_per_cell():
+    maze = make_maze()
+    assert (maze.width, maze.height) == (4, 2)
+    assert isinstance(maze.grid, bytearray)
+    assert bytes(maze.grid) == bytes(CELL_CODES[cell_type] for row in ROWS for cell_type in row)
+    assert maze.get_cell_type(3, 0) == "end"
+    assert maze.get_cell_code(0, 0) == WALL
+
+
+def test_set_cell_type_updates_grid_and_version():
+    maze = make_maze()
+    version = maze.version
+    maze.set_cell_type(1, 0, "wall")
+    assert maze.get_cell_code(1, 0) == WALL
+    assert maze.version > version
+
+
+def test_positions_outside_the_maze_raise_index_error():
+    maze = make_maze()
+    with pytest.raises(IndexError):
+        maze.get_cell_type(4, 0)
+    with pytest.raises(IndexError):
+        maze.get_cell_type(-1, 0)
+
+
+def test_ragged_rows_are_rejected():
+    with pytest.raises(ValueError):
+        make_maze([["wall", "wall"], ["wall"]])
+
+
+def test_fire_cells_are_put_out_exactly():
+    maze = make_maze()
+    before = bytes(maze.grid)
+    maze.fire_cells_count = 2
+    maze.init_fire_cells()
+    assert len(maze.coord_fire_cells) == 2
+    assert all(maze.get_cell_code(x, y) == FIRE for x, y in maze.coord_fire_cells)
+    maze.put_out_fire_cell()
+    assert bytes(maze.grid) == before
+    assert maze.passage_indexes().tolist() == [index for index, code in enumerate(before) if code == PASSAGE]
+
+
+def test_seeded_fire_is_reproducible():
+    first, second = make_maze(seed=7), make_maze(seed=7)
+    for _ in range(5):
+        first.init_fire_cells()
+        second.init_fire_cells()
+        assert first.coord_fire_cells == second.coord_fire_cells
+        first.put_out_fire_cell()
+        second.put_out_fire_cell()
+
+
+def test_to_json_matches_json_dumps():
+    maze = make_maze()
+    expected = {"game_map": [[{"x": x, "y": y, "object_type": "cell", "cell_type": cell_type}
+                              for x, cell_type in enumerate(row)] for y, row in enumerate(ROWS)]}
+    assert json.loads(maze.to_json()) == expected
+
+
+def test_to_json_escapes_cell_type_names(monkeypatch):
+    maze = make_maze()
+    monkeypatch.setattr(maze_module, "CELL_TYPES", CELL_TYPES + ['odd "type" \\ é'])
+    maze.set_cell_code(0, 0, len(CELL_TYPES))
+
+    assert json.loads(maze.to_json())["game_map"][0][0]["cell_type"] == 'odd "type" \\ é'
+
+
+def test_to_json_reencodes_changed_rows():
+    maze = make_maze()
+    maze.to_json()
+    maze.set_cell_type(1, 1, "wall")
+    assert json.loads(maze.to_json())["game_map"][1][1]["cell_type"] == "wall"
@@ -0,0 +1,71 @@
+import events
+from hero import Hero
+from instrumentation import MemorySink, Metrics
+from maze import Maze
+from maze_engine import MazeEngine
+
+ROWS = [
+    ["passage", "passage", "passage", "end"],
+    ["start", "passage", "wall", "passage"],
+]
+
+
+def make_engine(heroes, items) -> MazeEngine:
+    maze = Maze(fire_cells_count=0)
+    maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in ROWS])
+    engine = MazeEngine(heroes, maze)
+    engine.set_items(items)
+    return engine
+
+
+def test_picking_an_item_removes_only_that_item():
+    hero = Hero(1, 0, "hero")
+    items = [{"x": 1, "y": 0, "name": "key"}, {"x": 2, "y": 0, "name": "key"}, {"x": 0, "y": 0, "name": "heart"}]
+    engine = make_engine([hero], items)
+
+    round_events = engine.step_round({"hero": "p"})
+
+    assert [event.kind for event in round_events if event.kind == events.ITEM_PICKED] == [events.ITEM_PICKED]
+    assert [(item.position, item.name) for item in engine.game_objects] == [((2, 0), "key"), ((0, 0), "heart")]
+    assert [item.name for item in hero.pocket] == ["key"]
+    assert engine.objects_at((1, 0)) == [hero]
+
+
+def test_game_objects_is_a_copy():
+    engine = make_engine([], [{"x": 1, "y": 0, "name": "key"}])
+    engine.game_objects.clear()
+    assert len(engine.game_objects) == 1
+
+
+def test_hero_with_key_wins_on_the_end():
+    hero = Hero(2, 0, "hero")
+    engine = make_engine([hero], [{"x": 2, "y": 0, "name": "key"}])
+    engine.step_round({"hero": "p"})
+    round_events = engine.step_round({"hero": "r"})
+    assert events.WON in [event.kind for event in round_events]
+    assert engine.is_over
+
+
+def test_metrics_are_flushed_on_the_interval_and_at_the_end():
+    sink = MemorySink()
+    hero = Hero(0, 1, "hero")
+    engine = make_engine([hero], [{"x": 2, "y": 0, "name": "key"}])
+    engine.metrics = Metrics(sink)
+
+    for action in ("u", "r", "r"):
+        engine.step_round({"hero": action})
+    assert sink.records == []
+
+    engine.step_round({"hero": "p"})
+    engine.step_round({"hero": "r"})
+    assert engine.is_over
+    assert len(sink.records) == 1
+
+
+def test_metrics_interval_of_zero_flushes_every_round():
+    sink = MemorySink()
+    engine = MazeEngine([Hero(0, 1, "hero")], Maze(fire_cells_count=0), metrics=Metrics(sink), metrics_interval=0)
+    engine.maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in ROWS])
+    engine.step_round({"hero": "u"})
+    engine.step_round({"hero": "d"})
+    assert len(sink.records) == 2
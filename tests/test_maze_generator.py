@@ -0,0 +1,38 @@
+import pytest
+
+from map_validator import validate_map
+from maze_generator import ALGORITHMS, generate_maze
+from pathfinding import PathFinder
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+@pytest.mark.parametrize("braid", [0.0, 0.5])
+def test_generated_mazes_can_be_won(algorithm, braid):
+    for seed in range(3):
+        maze, items = generate_maze(12, 9, algorithm, seed=seed, braid=braid, extra_passages=10, hearts=3)
+        assert validate_map(maze, items).ok
+
+        start, end = maze.find_cell("start"), maze.find_cell("end")
+        key = next((item["x"], item["y"]) for item in items if item["name"] == "key")
+        pathfinder = PathFinder(maze)
+        to_key = pathfinder.find_path(start, key)
+        assert to_key
+        assert pathfinder.find_path(key, end, to_key[-1]) is not None
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_a_seed_gives_the_same_maze(algorithm):
+    first, first_items = generate_maze(10, 10, algorithm, seed=7, braid=0.3, extra_passages=5, hearts=2)
+    second, second_items = generate_maze(10, 10, algorithm, seed=7, braid=0.3, extra_passages=5, hearts=2)
+    other, _ = generate_maze(10, 10, algorithm, seed=8, braid=0.3, extra_passages=5, hearts=2)
+
+    assert bytes(first.grid) == bytes(second.grid)
+    assert first_items == second_items
+    assert bytes(first.grid) != bytes(other.grid)
+
+
+def test_small_or_unknown_mazes_are_rejected():
+    with pytest.raises(ValueError):
+        generate_maze(1, 5)
+    with pytest.raises(ValueError):
+        generate_maze(5, 5, "prim")
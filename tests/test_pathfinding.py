@@ -0,0 +1,52 @@
+import pytest
+
+import events
+from hero import Hero
+from item import Item
+from maze import Maze
+from maze_engine import MazeEngine
+from pathfinding import PathFinder
+
+
+def make_maze(turn_cell: str) -> Maze:
+    # The hero starts on the turn cell at (2, 0) after moving right, the end is at (1, 1)
+    rows = [
+        ["wall", "passage", turn_cell, "passage"],
+        ["wall", "end", "wall", "passage"],
+        ["wall", "passage", "passage", "passage"],
+    ]
+    maze = Maze(fire_cells_count=0)
+    maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in rows])
+    return maze
+
+
+@pytest.mark.parametrize("turn_cell, expected", [
+    ("passage", ["r", "d", "d", "l", "l", "u"]),  # Turning back would scare the hero, it goes around
+    ("extra_passage", ["l", "d"]),
+])
+def test_paths_obey_the_turn_back_rule(turn_cell, expected):
+    maze = make_maze(turn_cell)
+    pathfinder = PathFinder(maze)
+
+    path = pathfinder.find_path((2, 0), (1, 1), "r")
+
+    assert path == expected
+    assert pathfinder.field_to_end().distance((2, 0), "r") == len(expected)
+
+    hero = Hero(2, 0, "hero")
+    hero.old_direction = "r"
+    hero.add_item_in_pocket(Item(0, 0, "key"))
+    engine = MazeEngine([hero], maze)
+    kinds = [event.kind for move in path for event in engine.step_round({"hero": move})]
+    assert events.SCARED not in kinds
+    assert events.WON in kinds
+
+
+def test_unreachable_goal_has_no_path():
+    maze = make_maze("passage")
+    maze.set_cell_type(3, 1, "wall")
+    pathfinder = PathFinder(maze)
+
+    assert pathfinder.find_path((2, 0), (1, 1), "r") is None
+    assert pathfinder.field_to_end().distance((2, 0), "r") == -1
+    assert pathfinder.find_path((2, 0), (1, 1)) == ["l", "d"]
@@ -0,0 +1,38 @@
+import pytest
+
+from chunked_maze import ChunkedMaze, write_chunked_map
+from cell_types import CELL_CODES
+from hero import Hero
+from maze_engine import MazeEngine
+from policies import GreedyPolicy, PlannerPolicy, Policy
+
+ROW = ["start", "passage", "passage", "end"]
+
+
+def test_policy_without_decide_cannot_be_created():
+    class Idle(Policy):
+        pass
+
+    with pytest.raises(TypeError):
+        Idle()
+
+
+@pytest.mark.parametrize("policy", [GreedyPolicy(0), PlannerPolicy()])
+def test_whole_grid_policies_reject_a_chunked_maze(tmp_path, policy):
+    file_name = str(tmp_path / "map.mazk")
+    write_chunked_map(file_name, len(ROW), 1, bytes(CELL_CODES[cell_type] for cell_type in ROW),
+                      [{"x": 1, "y": 0, "name": "key"}], chunk_size=4)
+    with ChunkedMaze(file_name, fire_cells_count=0) as maze:
+        hero = Hero(0, 0, "hero")
+        engine = MazeEngine([hero], maze)
+        with pytest.raises(TypeError, match="needs a Maze"):
+            policy.decide(engine, [hero])
+
+
+@pytest.mark.parametrize("policy", [GreedyPolicy(0), PlannerPolicy()])
+def test_policies_walk_to_the_key(policy):
+    engine = MazeEngine([Hero(0, 0, "hero")])
+    engine.maze.fire_cells_count = 0
+    engine.maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in ROW]])
+    engine.set_items([{"x": 1, "y": 0, "name": "key"}])
+    assert policy.decide(engine, engine.heroes) == {"hero": "r"}
@@ -0,0 +1,75 @@
+import os
+import random
+
+import pytest
+
+from compiled_map import COMPILED_EXTENSION, compile_map
+from hero import Hero
+from map_registry import MapRegistry
+from maze import Maze
+from maze_engine import HERO_ACTIONS, MazeEngine
+from replay import ReplayMismatchError, Replayer, ReplayRecorder, heroes_checksum
+
+MAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JSON", "game_map.json")
+ROUNDS = 12
+
+
+def record_game(log_file: str, seed: int = 3) -> list:
+    """Play random actions and return the checksum of the heroes after every round."""
+    engine = MazeEngine(maze=Maze(fire_cells_count=2))
+    engine.load_game_map_from_json(MAP_FILE)
+    start = engine.maze.find_cell("start")
+    for name in ("a", "b", "c"):
+        engine.add_hero(Hero(*start, name))
+    recorder = ReplayRecorder(engine, log_file, MAP_FILE, seed=seed, checkpoint_interval=4)
+    rng = random.Random(seed)
+
+    checksums = [heroes_checksum(engine)]
+    while engine.round_number < ROUNDS and not engine.is_over:
+        engine.play_round(lambda hero: rng.choice(HERO_ACTIONS + (None,)))
+        checksums.append(heroes_checksum(engine))
+    if not engine.is_over:
+        recorder.close()
+    return checksums
+
+
+def test_replay_reproduces_the_recorded_game(tmp_path):
+    log_file = str(tmp_path / "game.log")
+    checksums = record_game(log_file)
+
+    replayer = Replayer(log_file)
+    replayed = [heroes_checksum(replayer.engine)]
+    for _ in replayer.rounds():
+        replayed.append(heroes_checksum(replayer.engine))
+
+    assert replayed == checksums
+
+
+def test_seeking_matches_the_recorded_rounds(tmp_path):
+    log_file = str(tmp_path / "game.log")
+    checksums = record_game(log_file)
+    replayer = Replayer(log_file)
+
+    assert len(checksums) == ROUNDS + 1
+    for round_number in (ROUNDS, 5, 2, 9, 0):
+        assert heroes_checksum(replayer.seek(round_number)) == checksums[round_number]
+        assert replayer.round_number == round_number
+
+
+def test_replay_on_a_compiled_map(tmp_path):
+    log_file = str(tmp_path / "game.log")
+    checksums = record_game(log_file)
+    compiled_file = str(tmp_path / f"game_map{COMPILED_EXTENSION}")
+    compile_map(MapRegistry(cache_dir=str(tmp_path / "cache")).get(MAP_FILE), compiled_file)
+
+    assert heroes_checksum(Replayer(log_file, compiled_file).run()) == checksums[-1]
+
+
+def test_replay_rejects_another_map(tmp_path):
+    log_file = str(tmp_path / "game.log")
+    record_game(log_file)
+    other_map = tmp_path / "other.json"
+    other_map.write_text('{"game_map": [[{"cell_type": "start"}, {"cell_type": "end"}]], "items": []}')
+
+    with pytest.raises(ReplayMismatchError):
+        Replayer(log_file, str(other_map))
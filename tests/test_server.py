@@ -0,0 +1,31 @@
+import asyncio
+import json
+import os
+
+from server import GameServer
+
+MAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JSON", "game_map.json")
+
+
+async def exchange(server: GameServer, lines):
+    listener = await server.serve_tcp(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    replies = []
+    for line in lines:
+        writer.write(line.encode("utf-8") + b"\n")
+        await writer.drain()
+        replies.append(json.loads(await asyncio.wait_for(reader.readline(), 5)))
+    writer.close()
+    listener.close()
+    await listener.wait_closed()
+    return replies
+
+
+def test_non_object_messages_get_an_error_and_keep_the_client():
+    server = GameServer(MAP_FILE)
+
+    replies = asyncio.run(exchange(server, ["[1, 2]", "42", '{"op": "stats"}']))
+
+    assert [reply["type"] for reply in replies] == ["error", "error", "stats"]
+    assert replies[0]["message"] == "Message must be a JSON object"
@@ -0,0 +1,67 @@
+import zlib
+
+import pytest
+
+from hero import Hero
+from item import Item
+from maze import Maze
+from maze_engine import MazeEngine
+from snapshot import RECORD, encode_full, read_snapshots
+
+ROWS = [
+    ["start", "passage", "passage", "end"],
+    ["wall", "passage", "extra_passage", "passage"],
+]
+
+
+def make_engine() -> MazeEngine:
+    maze = Maze(fire_cells_count=0)
+    maze.load_map_from_json([[{"cell_type": cell_type} for cell_type in row] for row in ROWS])
+    hero = Hero(1, 0, "hero")
+    hero.add_item_in_pocket(Item(0, 0, "heart"))
+    engine = MazeEngine([hero], maze)
+    engine.set_items([{"x": 2, "y": 1, "name": "key"}])
+    return engine
+
+
+def describe(engine: MazeEngine) -> tuple:
+    return (bytes(engine.maze.grid),
+            [(hero.name, hero.position, hero.health, [item.name for item in hero.pocket]) for hero in engine.heroes],
+            [(item.name, item.position) for item in engine.game_objects])
+
+
+def test_full_and_delta_snapshots_round_trip(tmp_path):
+    file_name = str(tmp_path / "game.snap")
+    engine = make_engine()
+    engine.save_snapshot(file_name)
+    engine.maze.set_cell_type(1, 1, "wall")
+    engine.step_round({"hero": "r"})
+    engine.save_snapshot(file_name, delta=True)
+
+    restored = MazeEngine()
+    restored.restore_snapshot(file_name)
+
+    assert describe(restored) == describe(engine)
+
+
+def test_items_off_the_map_round_trip(tmp_path):
+    file_name = str(tmp_path / "game.snap")
+    engine = make_engine()
+    engine.set_items([{"x": -1, "y": -3, "name": "key"}])
+    engine.save_snapshot(file_name)
+
+    restored = MazeEngine()
+    restored.restore_snapshot(file_name)
+
+    assert [(item.name, item.position) for item in restored.game_objects] == [("key", (-1, -3))]
+
+
+def test_unknown_cell_types_raise_value_error(tmp_path):
+    engine = make_engine()
+    record = encode_full(engine.maze, engine.heroes, engine.game_objects, False)
+    payload = zlib.decompress(record[RECORD.size:]).replace(b"\x04wall", b"\x04wxll", 1)
+    compressed = zlib.compress(payload)
+    (tmp_path / "game.snap").write_bytes(RECORD.pack(1, len(compressed)) + compressed)
+
+    with pytest.raises(ValueError):
+        read_snapshots(str(tmp_path / "game.snap"))
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from hero import Hero  # noqa: E402
+from item import Item  # noqa: E402
+from maze import Maze  # noqa: E402
+from maze_engine import MazeEngine  # noqa: E402
+from vector_round import DIRECTION_CODES, KILLED_BY_GOLEM, SCARED, WON, HeroArrays, VectorMaze  # noqa: E402
+
+CELLS = {"W": "wall", "P": "passage", "X": "extra_passage", "F": "fire", "E": "end", "S": "start"}
+# Passages on the border lead off the map, extra passages allow turning back
+ROWS = [
+    "PPXPPE",
+    "PWPXFP",
+    "SPPPWP",
+    "PFXPPP",
+    "PPPWPE",
+]
+HEARTS = [{"x": 2, "y": 2, "name": "heart"}, {"x": 4, "y": 3, "name": "heart"}]
+MOVES = ("l", "r", "u", "d", None)
+
+
+def make_engine(seed: int, fire_cells_count: int = 0):
+    rng = random.Random(seed)
+    maze = Maze(fire_cells_count=fire_cells_count, seed=seed)
+    maze.load_map_from_json([[{"cell_type": CELLS[code]} for code in row] for row in ROWS])
+    free = [(x, y) for y, row in enumerate(ROWS) for x, code in enumerate(row) if code in "PXS"]
+    heroes = []
+    for i in range(24):
+        hero = Hero(*rng.choice(free), f"hero{i}")
+        hero.old_direction = rng.choice(("", "l", "r", "u", "d"))
+        if rng.random() < 0.5:
+            hero.pick_item(Item(0, 0, "key"))
+        heroes.append(hero)
+    engine = MazeEngine(heroes, maze)
+    engine.set_items(HEARTS)
+    return engine, heroes
+
+
+def hero_states(heroes):
+    return [(hero.name, hero.position, hero.health, hero.old_direction) for hero in heroes]
+
+
+def event_list(round_events):
+    return [(event.kind, event.hero, event.data) for event in round_events]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_resolve_moves_matches_the_scalar_rounds(seed):
+    engine, heroes = make_engine(seed)
+    vector_maze = VectorMaze(engine.maze, engine.game_objects)
+    arrays = HeroArrays.from_heroes(heroes)
+    rng = random.Random(seed)
+
+    for _ in range(12):
+        moves = {hero.name: rng.choice(MOVES) for hero in heroes}
+        directions = np.array([DIRECTION_CODES[moves[hero.name] or ""] for hero in heroes])
+        outcomes, _ = vector_maze.resolve_moves(arrays, directions)
+        round_events = engine.step_round(moves)
+
+        assert list(zip(arrays.x.tolist(), arrays.y.tolist())) == [hero.position for hero in heroes]
+        assert arrays.health.tolist() == [hero.health for hero in heroes]
+        assert [DIRECTION_CODES[hero.old_direction] for hero in heroes] == arrays.old_direction.tolist()
+        for kind, outcome in (("won", WON), ("killed_by_golem", KILLED_BY_GOLEM), ("scared", SCARED)):
+            names = [event.hero for event in round_events if event.kind == kind]
+            assert names == [heroes[i].name for i in np.flatnonzero(outcomes == outcome)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_rounds_match_the_scalar_rounds(seed):
+    scalar, scalar_heroes = make_engine(seed, fire_cells_count=3)
+    vector, vector_heroes = make_engine(seed, fire_cells_count=3)
+    rng = random.Random(seed)
+
+    for _ in range(12):
+        moves = {hero.name: rng.choice(MOVES) for hero in scalar_heroes}
+        scalar_events = event_list(scalar.step_round(moves))
+        vector_events = event_list(vector.step_round_vectorized(moves))
+
+        assert vector_events == scalar_events
+        assert hero_states(vector_heroes) == hero_states(scalar_heroes)
+        assert [hero.name for hero in vector.heroes] == [hero.name for hero in scalar.heroes]
+        assert vector.is_over == scalar.is_over
+
+
+def test_the_rounds_cover_every_rule():
+    kinds = set()
+    for seed in range(5):
+        engine, heroes = make_engine(seed, fire_cells_count=3)
+        rng = random.Random(seed)
+        for _ in range(12):
+            kinds.update(event.kind for event in engine.step_round_vectorized(
+                {hero.name: rng.choice(MOVES) for hero in heroes}))
+    assert {"hit_wall", "on_fire", "scared", "won", "killed_by_golem", "heart_found"} <= kinds
+
+
+def test_vectorized_round_rejects_actions_that_are_not_moves():
+    engine, heroes = make_engine(0)
+    with pytest.raises(ValueError):
+        engine.step_round_vectorized({heroes[0].name: "p"})
+
+
+def test_turning_back_scares_only_off_extra_passages():
+    engine, _ = make_engine(0)
+    on_passage = Hero(1, 2, "on_passage")  # Passage at (1, 2)
+    on_extra = Hero(2, 0, "on_extra")  # Extra passage at (2, 0)
+    off_map = Hero(0, 3, "off_map")
+    for hero in (on_passage, on_extra):
+        hero.old_direction = "r"
+    arrays = HeroArrays.from_heroes([on_passage, on_extra, off_map])
+
+    outcomes, _ = VectorMaze(engine.maze, []).resolve_moves(arrays, np.array([1, 1, 1]))
+
+    assert outcomes.tolist()[:2] == [SCARED, 1]
+    assert arrays.health.tolist() == [0, on_extra.health, off_map.health - 1]
+    assert (int(arrays.x[2]), int(arrays.y[2])) == (0, 3)
@@ -0,0 +1,49 @@
+import random
+
+from hero import Hero
+from maze_engine import MazeEngine
+from maze_generator import generate_maze
+from visibility import VisibilityTracker, field_of_view
+
+RADIUS = 4
+ROUNDS = 60
+STEPS = {"l": (-1, 0), "r": (1, 0), "u": (0, -1), "d": (0, 1)}
+OPPOSITE = {"l": "r", "r": "l", "u": "d", "d": "u"}
+
+
+def safe_move(maze, hero, rng):
+    """Pick a random move onto a passage that does not turn back, None when there is none."""
+    moves = []
+    for direction, (dx, dy) in STEPS.items():
+        x, y = hero.x + dx, hero.y + dy
+        if (direction != OPPOSITE.get(hero.old_direction) and 0 <= x < maze.width and 0 <= y < maze.height
+                and maze.get_cell_type(x, y) in ("passage", "start")):
+            moves.append(direction)
+    return rng.choice(moves) if moves else None
+
+
+def test_incremental_views_match_a_full_recompute():
+    rng = random.Random(5)
+    maze, items = generate_maze(10, 10, "kruskal", seed=5, braid=1.0)
+    start = maze.find_cell("start")
+    heroes = [Hero(*start, f"hero{i}") for i in range(4)]
+    engine = MazeEngine(heroes, maze)
+    engine.set_items(items)
+    tracker = VisibilityTracker(engine, RADIUS)
+    seen = {hero.name: set(field_of_view(maze, hero.position, RADIUS).positions()) for hero in heroes}
+
+    for _ in range(ROUNDS):
+        engine.step_round({hero.name: safe_move(maze, hero, rng) for hero in engine.heroes})
+        # Opening and closing walls changes what the heroes see
+        x, y = rng.randrange(1, maze.width - 1), rng.randrange(1, maze.height - 1)
+        if maze.get_cell_type(x, y) in ("wall", "passage") and all(hero.position != (x, y) for hero in heroes):
+            maze.set_cell_type(x, y, "passage" if maze.get_cell_type(x, y) == "wall" else "wall")
+
+        for hero in engine.heroes:
+            full = set(field_of_view(maze, hero.position, RADIUS).positions())
+            seen[hero.name] |= full
+            assert set(tracker.view(hero.name).positions()) == full
+            assert set(tracker.explored(hero.name).positions()) == seen[hero.name]
+
+    assert len(engine.heroes) == len(heroes)
+    assert tracker.stats()["views_computed"] < len(heroes) * (ROUNDS + 1)
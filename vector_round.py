@@ -0,0 +1,226 @@
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as error:  # NumPy is an optional dependency, listed in requirements-optional.txt
+    raise ImportError("vector_round needs NumPy, install the packages of requirements-optional.txt") from error
+
+from cell_types import DAMAGE, PASSABLE, TURN_BACK, WALL, WINS, item_type
+from hero import KNIGHT_HEALTH, Hero
+from item import Item
+from maze import Maze
+
+# Direction codes, 0 means the hero does not move this round
+DIRECTIONS = ("", "l", "r", "u", "d")
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+DX = np.array([0, -1, 1, 0, 0], dtype=np.int64)
+DY = np.array([0, 0, 0, -1, 1], dtype=np.int64)
+OPPOSITE = np.array([0, 2, 1, 4, 3], dtype=np.int8)
+
+# Outcomes of a move, matching the events of MazeEngine
+NO_MOVE = 0
+MOVED = 1
+HIT_WALL = 2
+ON_FIRE = 3
+SCARED = 4
+WON = 5
+KILLED_BY_GOLEM = 6
+
+
+class HeroArrays:
+    """Positions, health, last directions and keys of many heroes stored in NumPy arrays."""
+
+    def __init__(self, names: Sequence[str], x: np.ndarray, y: np.ndarray, health: np.ndarray,
+                 old_direction: np.ndarray, has_key: np.ndarray):
+        """
+        Initialize a HeroArrays object.
+
+        Args:
+            names (Sequence[str]): The names of the heroes, in turn order.
+            x (np.ndarray): The x coordinates.
+            y (np.ndarray): The y coordinates.
+            health (np.ndarray): The health points.
+            old_direction (np.ndarray): The direction codes of the last counted moves.
+            has_key (np.ndarray): True for heroes carrying the key.
+        """
+        self.names = list(names)
+        self.x = x
+        self.y = y
+        self.health = health
+        self.old_direction = old_direction
+        self.has_key = has_key
+
+    @classmethod
+    def from_heroes(cls, heroes: List[Hero]) -> "HeroArrays":
+        """
+        Copies the state of hero objects into arrays.
+
+        Args:
+            heroes (List[Hero]): The heroes.
+
+        Returns:
+            HeroArrays: The arrays.
+        """
+        return cls(
+            [hero.name for hero in heroes],
+            np.array([hero.x for hero in heroes], dtype=np.int64),
+            np.array([hero.y for hero in heroes], dtype=np.int64),
+            np.array([hero.health for hero in heroes], dtype=np.int64),
+            np.array([DIRECTION_CODES[hero.old_direction] for hero in heroes], dtype=np.int8),
+            np.array([any(item_type(item.name).opens_end for item in hero.pocket) for hero in heroes],
+                     dtype=bool),
+        )
+
+    @classmethod
+    def spawn(cls, count: int, position: tuple) -> "HeroArrays":
+        """
+        Creates fresh heroes on one position, named by their index.
+
+        Args:
+            count (int): The number of heroes.
+            position (tuple): The starting position.
+
+        Returns:
+            HeroArrays: The arrays.
+        """
+        return cls(
+            [str(i + 1) for i in range(count)],
+            np.full(count, position[0], dtype=np.int64),
+            np.full(count, position[1], dtype=np.int64),
+            np.full(count, KNIGHT_HEALTH, dtype=np.int64),
+            np.zeros(count, dtype=np.int8),
+            np.zeros(count, dtype=bool),
+        )
+
+    def write_to(self, heroes: List[Hero]) -> None:
+        """
+        Copies the arrays back into hero objects, in the same order as from_heroes.
+
+        Args:
+            heroes (List[Hero]): The heroes.
+        """
+        for i, hero in enumerate(heroes):
+            hero.position = (int(self.x[i]), int(self.y[i]))
+            hero.health = int(self.health[i])
+            hero.old_direction = DIRECTIONS[self.old_direction[i]]
+
+    @property
+    def alive(self) -> np.ndarray:
+        """Get a mask of the heroes with health left."""
+        return self.health > 0
+
+
+class VectorMaze:
+    """A NumPy view over the grid of a maze for resolving the moves of many heroes at once."""
+
+    def __init__(self, maze: Maze, items: List[Item]):
+        """
+        Initialize a VectorMaze object.
+
+        The cells share memory with the maze grid, so fire cells are seen as the maze changes.
+        Build a new VectorMaze after loading another map.
+
+        Args:
+            maze (Maze): The maze.
+            items (List[Item]): The items lying in the maze, hearts restore health.
+        """
+        self.__width = maze.width
+        self.__height = maze.height
+        self.__cells = np.frombuffer(maze.grid, dtype=np.uint8)
+        self.__hearts = np.zeros(maze.width * maze.height, dtype=bool)
+        # Behaviour tables of the cell types, indexed by cell code
+        self.__passable = np.array(PASSABLE, dtype=bool)
+        self.__damage = np.array(DAMAGE, dtype=np.int64)
+        self.__turn_back = np.array(TURN_BACK, dtype=bool)
+        self.__wins = np.array(WINS, dtype=bool)
+        for item in items:
+            if item_type(item.name).heals and 0 <= item.x < maze.width and 0 <= item.y < maze.height:
+                self.__hearts[item.y * maze.width + item.x] = True
+
+    def cell_types(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Look up the cell codes of many positions, positions outside the maze are walls.
+
+        Args:
+            x (np.ndarray): The x coordinates.
+            y (np.ndarray): The y coordinates.
+
+        Returns:
+            np.ndarray: The cell type codes.
+        """
+        inside = (x >= 0) & (x < self.__width) & (y >= 0) & (y < self.__height)
+        codes = self.__cells[np.where(inside, y * self.__width + x, 0)]
+        return np.where(inside, codes, WALL)
+
+    def has_heart(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Check many positions for hearts.
+
+        Args:
+            x (np.ndarray): The x coordinates.
+            y (np.ndarray): The y coordinates.
+
+        Returns:
+            np.ndarray: True where a heart lies.
+        """
+        inside = (x >= 0) & (x < self.__width) & (y >= 0) & (y < self.__height)
+        return inside & self.__hearts[np.where(inside, y * self.__width + x, 0)]
+
+    def resolve_moves(self, heroes: HeroArrays, directions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Moves every hero at once with the rules of MazeEngine.
+
+        Heroes without health and heroes with direction code 0 do not move. The outcome of
+        each hero equals the scalar engine for a round in which every hero moves: moves never
+        depend on other heroes, since hearts stay in place and only keys are picked up.
+
+        Args:
+            heroes (HeroArrays): The heroes, updated in place.
+            directions (np.ndarray): The direction code of each hero.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The outcome code of each hero, and a mask of the
+            heroes that regained health on a heart.
+        """
+        directions = np.asarray(directions, dtype=np.int8)
+        active = (heroes.health > 0) & (directions != 0)
+        x, y = heroes.x, heroes.y
+
+        old_turn_back = self.__turn_back[self.cell_types(x, y)]
+        new_x = x + DX[directions]
+        new_y = y + DY[directions]
+
+        scared = active & (OPPOSITE[directions] == heroes.old_direction) & ~old_turn_back
+        moving = active & ~scared
+
+        current_cell = self.cell_types(new_x, new_y)
+        blocked = moving & ~self.__passable[current_cell]
+        damage = np.where(moving, self.__damage[current_cell], 0)
+        wall = blocked & (damage > 0)
+        fire = ~blocked & (damage > 0)
+        end = moving & self.__wins[current_cell]
+        won = end & heroes.has_key
+        golem = end & ~heroes.has_key
+
+        health = heroes.health
+        health -= damage
+        health[scared | golem] = 0
+
+        stepped = scared | (moving & ~blocked)
+        x[stepped] = new_x[stepped]
+        y[stepped] = new_y[stepped]
+
+        counted = moving & ~blocked & ~golem & ~self.__turn_back[current_cell] & ~old_turn_back
+        heroes.old_direction[counted] = directions[counted]
+
+        healed = moving & ~golem & self.has_heart(x, y)
+        health[healed] = KNIGHT_HEALTH
+
+        outcomes = np.zeros(len(directions), dtype=np.int8)
+        outcomes[moving] = MOVED
+        outcomes[wall] = HIT_WALL
+        outcomes[fire] = ON_FIRE
+        outcomes[won] = WON
+        outcomes[golem] = KILLED_BY_GOLEM
+        outcomes[scared] = SCARED
+        return outcomes, healed
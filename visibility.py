@@ -0,0 +1,448 @@
+from typing import Dict, Iterator, List, Optional
+
+import events
+from cell_types import CELL_TYPES, PASSABLE
+from events import GameEvent
+from maze_engine import MazeEngine
+
+DEFAULT_RADIUS = 8  # Tiles a hero sees in every direction
+EXPLORED_CHUNK_SHIFT = 5  # Explored maps are stored in chunks of 32 x 32 tiles
+EXPLORED_CHUNK_SIZE = 1 << EXPLORED_CHUNK_SHIFT
+EXPLORED_CHUNK_BYTES = EXPLORED_CHUNK_SIZE * EXPLORED_CHUNK_SIZE // 8
+
+# Transforms of the eight octants of shadowcasting: xx, xy, yx, yy
+OCTANTS = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+
+class FieldOfView:
+    """Tiles seen from a position, as bitsets over the square around it.
+
+    A view stores two bits per tile of the (2 * radius + 1) squared window: whether the tile
+    is visible and whether it blocked the sight when the view was computed.
+    """
+
+    def __init__(self, center: tuple, radius: int, visible: bytearray, opaque: bytearray):
+        """
+        Initialize a FieldOfView object.
+
+        Args:
+            center (tuple): The position the tiles are seen from.
+            radius (int): The sight radius.
+            visible (bytearray): The visible bits of the window, row by row.
+            opaque (bytearray): The bits of the visible tiles that blocked the sight.
+        """
+        self.__center = center
+        self.__radius = radius
+        self.__visible = visible
+        self.__opaque = opaque
+
+    @property
+    def center(self) -> tuple:
+        """Get the position the tiles are seen from."""
+        return self.__center
+
+    @property
+    def radius(self) -> int:
+        """Get the sight radius."""
+        return self.__radius
+
+    def __contains__(self, position: tuple) -> bool:
+        bit = self.__bit(position)
+        return bit is not None and bool(self.__visible[bit >> 3] & (1 << (bit & 7)))
+
+    def saw_opaque(self, position: tuple) -> Optional[bool]:
+        """
+        Get whether a tile blocked the sight when the view was computed.
+
+        Args:
+            position (tuple): The position of the tile.
+
+        Returns:
+            bool: True if it blocked the sight, None if the tile is not visible.
+        """
+        bit = self.__bit(position)
+        if bit is None or not self.__visible[bit >> 3] & (1 << (bit & 7)):
+            return None
+        return bool(self.__opaque[bit >> 3] & (1 << (bit & 7)))
+
+    def positions(self) -> Iterator[tuple]:
+        """
+        Iterate over the visible tiles.
+
+        Yields:
+            tuple: The positions of the visible tiles, row by row.
+        """
+        radius = self.__radius
+        side = 2 * radius + 1
+        x, y = self.__center
+        visible = self.__visible
+        for byte_number, byte in enumerate(visible):
+            while byte:
+                low = byte & -byte
+                bit = byte_number * 8 + low.bit_length() - 1
+                byte ^= low
+                yield x + bit % side - radius, y + bit // side - radius
+
+    def __len__(self) -> int:
+        return sum(bin(byte).count("1") for byte in self.__visible)
+
+    def __bit(self, position: tuple) -> Optional[int]:
+        """Get the bit of a position in the window, None outside it."""
+        dx = position[0] - self.__center[0] + self.__radius
+        dy = position[1] - self.__center[1] + self.__radius
+        side = 2 * self.__radius + 1
+        if not (0 <= dx < side and 0 <= dy < side):
+            return None
+        return dy * side + dx
+
+
+class ExploredMap:
+    """Tiles a hero has seen, as a sparse bitset of 32 x 32 tile chunks.
+
+    Only chunks with an explored tile take memory, so heroes that keep to a small part of a
+    large map cost a few hundred bytes each.
+    """
+
+    def __init__(self, width: int, height: int):
+        """
+        Initialize an ExploredMap object with nothing explored.
+
+        Args:
+            width (int): The width of the maze.
+            height (int): The height of the maze.
+        """
+        self.__width = width
+        self.__height = height
+        self.__chunks_per_row = (width + EXPLORED_CHUNK_SIZE - 1) >> EXPLORED_CHUNK_SHIFT
+        self.__chunks: Dict[int, bytearray] = {}
+        self.__count = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        """Get the bytes taken by the bitsets of the chunks."""
+        return len(self.__chunks) * EXPLORED_CHUNK_BYTES
+
+    def add(self, position: tuple) -> bool:
+        """
+        Mark a tile as explored.
+
+        Args:
+            position (tuple): The position of the tile.
+
+        Returns:
+            bool: True if the tile was not explored before.
+        """
+        chunk_number, bit = self.__locate(position)
+        chunk = self.__chunks.get(chunk_number)
+        if chunk is None:
+            chunk = self.__chunks[chunk_number] = bytearray(EXPLORED_CHUNK_BYTES)
+        mask = 1 << (bit & 7)
+        if chunk[bit >> 3] & mask:
+            return False
+        chunk[bit >> 3] |= mask
+        self.__count += 1
+        return True
+
+    def add_view(self, view: FieldOfView) -> int:
+        """
+        Mark the visible tiles of a view as explored.
+
+        Args:
+            view (FieldOfView): The view.
+
+        Returns:
+            int: The number of tiles explored for the first time.
+        """
+        added = 0
+        for position in view.positions():
+            added += self.add(position)
+        return added
+
+    def __contains__(self, position: tuple) -> bool:
+        if not (0 <= position[0] < self.__width and 0 <= position[1] < self.__height):
+            return False
+        chunk_number, bit = self.__locate(position)
+        chunk = self.__chunks.get(chunk_number)
+        return chunk is not None and bool(chunk[bit >> 3] & (1 << (bit & 7)))
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def positions(self) -> Iterator[tuple]:
+        """
+        Iterate over the explored tiles.
+
+        Yields:
+            tuple: The positions of the explored tiles, chunk by chunk.
+        """
+        for chunk_number, chunk in self.__chunks.items():
+            chunk_x = (chunk_number % self.__chunks_per_row) << EXPLORED_CHUNK_SHIFT
+            chunk_y = (chunk_number // self.__chunks_per_row) << EXPLORED_CHUNK_SHIFT
+            for byte_number, byte in enumerate(chunk):
+                while byte:
+                    low = byte & -byte
+                    bit = byte_number * 8 + low.bit_length() - 1
+                    byte ^= low
+                    yield chunk_x + (bit & (EXPLORED_CHUNK_SIZE - 1)), chunk_y + (bit >> EXPLORED_CHUNK_SHIFT)
+
+    def __locate(self, position: tuple) -> tuple:
+        """Get the chunk number of a position and its bit in the chunk."""
+        x, y = position
+        chunk_number = (y >> EXPLORED_CHUNK_SHIFT) * self.__chunks_per_row + (x >> EXPLORED_CHUNK_SHIFT)
+        bit = ((y & (EXPLORED_CHUNK_SIZE - 1)) << EXPLORED_CHUNK_SHIFT) | (x & (EXPLORED_CHUNK_SIZE - 1))
+        return chunk_number, bit
+
+
+def field_of_view(maze, position: tuple, radius: int = DEFAULT_RADIUS) -> FieldOfView:
+    """
+    Computes the tiles seen from a position with recursive shadowcasting.
+
+    Only the tiles within the radius are read, so the cost does not depend on the size of
+    the maze. Cells that are not passable, such as walls, block the sight and are seen
+    themselves; tiles outside the maze are never seen.
+
+    Args:
+        maze: The maze, a Maze or a ChunkedMaze.
+        position (tuple): The position to look from.
+        radius (int): The sight radius, tiles farther away in a straight line are not seen.
+
+    Returns:
+        FieldOfView: The view.
+    """
+    center_x, center_y = position
+    width, height = maze.width, maze.height
+    get_cell_code = maze.get_cell_code
+    side = 2 * radius + 1
+    visible = bytearray((side * side + 7) // 8)
+    opaque = bytearray(len(visible))
+    radius_squared = radius * radius
+
+    def is_opaque(x: int, y: int) -> bool:
+        return not (0 <= x < width and 0 <= y < height) or not PASSABLE[get_cell_code(x, y)]
+
+    def mark(x: int, y: int, blocks: bool):
+        if 0 <= x < width and 0 <= y < height:
+            bit = (y - center_y + radius) * side + (x - center_x + radius)
+            visible[bit >> 3] |= 1 << (bit & 7)
+            if blocks:
+                opaque[bit >> 3] |= 1 << (bit & 7)
+
+    def cast_light(row: int, start: float, end: float, xx: int, xy: int, yx: int, yy: int):
+        if start < end:
+            return
+        new_start = start
+        for distance in range(row, radius + 1):
+            blocked = False
+            dy = -distance
+            for dx in range(-distance, 1):
+                left_slope = (dx - 0.5) / (dy + 0.5)
+                right_slope = (dx + 0.5) / (dy - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+                x = center_x + dx * xx + dy * xy
+                y = center_y + dx * yx + dy * yy
+                blocks = is_opaque(x, y)
+                if dx * dx + dy * dy <= radius_squared:
+                    mark(x, y, blocks)
+                if blocked:
+                    if blocks:
+                        new_start = right_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif blocks and distance < radius:
+                    blocked = True
+                    cast_light(distance + 1, start, left_slope, xx, xy, yx, yy)
+                    new_start = right_slope
+            if blocked:
+                break
+
+    mark(center_x, center_y, is_opaque(center_x, center_y))
+    for xx, xy, yx, yy in OCTANTS:
+        cast_light(1, 1.0, 0.0, xx, xy, yx, yy)
+    return FieldOfView((center_x, center_y), radius, visible, opaque)
+
+
+class VisibilityTracker:
+    """Field of view and explored tiles of every hero of a game, kept up to date by events.
+
+    A view is computed again only when its hero moves to another tile, or when a cell it
+    sees starts or stops blocking the sight. Fire cells do not block the sight, so they
+    never cause a new computation. Create the tracker after loading the map.
+    """
+
+    def __init__(self, engine: MazeEngine, radius: int = DEFAULT_RADIUS):
+        """
+        Initialize a VisibilityTracker object and compute the views of the heroes.
+
+        Args:
+            engine (MazeEngine): The engine of the game.
+            radius (int): The sight radius of the heroes.
+        """
+        self.__engine = engine
+        self.__maze = engine.maze
+        self.__radius = radius
+        self.__block_size = max(radius, 1)
+        self.__views: Dict[str, FieldOfView] = {}
+        self.__explored: Dict[str, ExploredMap] = {}
+        self.__blocks: Dict[tuple, set] = {}  # Block of the view centers to the names of their heroes
+        self.__stale = set()  # Heroes whose views saw a cell change its blocking
+        self.__computed = 0
+
+        for hero in engine.heroes:
+            self.__update(hero.name, hero.position)
+        engine.add_event_listener(self.__on_event)
+        engine.add_round_listener(self.__on_round)
+        self.__maze.add_change_listener(self.__on_cell_changed)
+
+    @property
+    def radius(self) -> int:
+        """Get the sight radius of the heroes."""
+        return self.__radius
+
+    def view(self, hero_name: str) -> FieldOfView:
+        """
+        Get the current view of a hero.
+
+        Args:
+            hero_name (str): The name of the hero.
+
+        Returns:
+            FieldOfView: The view.
+
+        Raises:
+            KeyError: If the hero is not in the game.
+        """
+        if hero_name in self.__stale:
+            self.__update(hero_name, self.__views[hero_name].center)
+        return self.__views[hero_name]
+
+    def explored(self, hero_name: str) -> ExploredMap:
+        """
+        Get the tiles a hero has seen since the tracker was created.
+
+        Args:
+            hero_name (str): The name of the hero.
+
+        Returns:
+            ExploredMap: The explored tiles.
+
+        Raises:
+            KeyError: If the hero is not in the game.
+        """
+        return self.__explored[hero_name]
+
+    def refresh(self) -> None:
+        """Compute the views of every hero again, after heroes were added or a game restored."""
+        self.__views.clear()
+        self.__blocks.clear()
+        self.__stale.clear()
+        names = set()
+        for hero in self.__engine.heroes:
+            names.add(hero.name)
+            self.__update(hero.name, hero.position)
+        for name in list(self.__explored):
+            if name not in names:
+                del self.__explored[name]
+
+    def visible_cells(self, hero_name: str) -> List[list]:
+        """
+        Get the cells a hero sees, the only part of the maze a client of the hero needs.
+
+        Args:
+            hero_name (str): The name of the hero.
+
+        Returns:
+            List[list]: The x, y and cell type of every visible tile.
+        """
+        get_cell_code = self.__maze.get_cell_code
+        return [[x, y, CELL_TYPES[get_cell_code(x, y)]] for x, y in self.view(hero_name).positions()]
+
+    def to_json(self, hero_name: str) -> dict:
+        """
+        Get the view of a hero as JSON data.
+
+        Args:
+            hero_name (str): The name of the hero.
+
+        Returns:
+            dict: The hero, its position, the radius and the visible cells.
+        """
+        view = self.view(hero_name)
+        return {
+            "hero": hero_name,
+            "position": list(view.center),
+            "radius": self.__radius,
+            "cells": self.visible_cells(hero_name),
+        }
+
+    def stats(self) -> dict:
+        """Get the number of tracked heroes, computed views and the size of the explored maps."""
+        return {
+            "heroes": len(self.__views),
+            "views_computed": self.__computed,
+            "explored_tiles": sum(len(explored) for explored in self.__explored.values()),
+            "explored_bytes": sum(explored.memory_bytes for explored in self.__explored.values()),
+        }
+
+    def __update(self, hero_name: str, position: tuple) -> None:
+        """Compute the view of a hero and add it to its explored tiles."""
+        old_view = self.__views.get(hero_name)
+        if old_view is not None:
+            self.__blocks[self.__block(old_view.center)].discard(hero_name)
+
+        view = field_of_view(self.__maze, position, self.__radius)
+        self.__views[hero_name] = view
+        self.__blocks.setdefault(self.__block(position), set()).add(hero_name)
+        self.__stale.discard(hero_name)
+        self.__computed += 1
+
+        explored = self.__explored.get(hero_name)
+        if explored is None:
+            explored = self.__explored[hero_name] = ExploredMap(self.__maze.width, self.__maze.height)
+        explored.add_view(view)
+
+    def __forget(self, hero_name: str) -> None:
+        """Stop tracking an eliminated hero."""
+        view = self.__views.pop(hero_name, None)
+        if view is not None:
+            self.__blocks[self.__block(view.center)].discard(hero_name)
+        self.__explored.pop(hero_name, None)
+        self.__stale.discard(hero_name)
+
+    def __block(self, position: tuple) -> tuple:
+        """Get the block of a position, views centered in it see at most the blocks around it."""
+        return position[0] // self.__block_size, position[1] // self.__block_size
+
+    def __on_event(self, event: GameEvent) -> None:
+        """Follow the moves and eliminations of the heroes."""
+        if event.kind == events.HERO_MOVED:
+            view = self.__views.get(event.hero)
+            position = tuple(event.data["position"])
+            if view is None or view.center != position or event.hero in self.__stale:
+                self.__update(event.hero, position)
+        elif event.kind == events.HERO_ELIMINATED:
+            self.__forget(event.hero)
+
+    def __on_round(self, round_number: int, round_events: List[GameEvent]) -> None:
+        """Compute the views that went stale during the round."""
+        for hero_name in list(self.__stale):
+            self.__update(hero_name, self.__views[hero_name].center)
+
+    def __on_cell_changed(self, index: int) -> None:
+        """Mark the views that saw a changed cell as stale if its blocking changed."""
+        width = self.__maze.width
+        position = (index % width, index // width)
+        blocks = not PASSABLE[self.__maze.get_cell_code(position[0], position[1])]
+        block_x, block_y = self.__block(position)
+        for near_x in (block_x - 1, block_x, block_x + 1):
+            for near_y in (block_y - 1, block_y, block_y + 1):
+                for hero_name in self.__blocks.get((near_x, near_y), ()):
+                    saw_opaque = self.__views[hero_name].saw_opaque(position)
+                    if saw_opaque is not None and saw_opaque != blocks:
+                        self.__stale.add(hero_name)